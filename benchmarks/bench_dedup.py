@@ -0,0 +1,82 @@
+"""
+Benchmark of near-duplicate removal over the search result fixture corpus.
+
+Usage:
+    python -m benchmarks.bench_dedup [--copies N] [--repeats N]
+
+The fixture holds the Tavily responses of three paraphrased queries. The corpus is scaled up by
+adding copies of every result with a few words changed, as syndicated and mirrored pages are.
+"""
+import argparse
+import copy
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from langgraph_agent.tools.dedup import dedup_responses
+
+FIXTURE_PATH = Path(__file__).parent / "fixtures" / "search_results.json"
+
+
+def build_corpus(copies: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Load the fixture responses and add `copies` lightly edited mirrors of every result.
+
+    Args:
+        copies (int): Number of mirrored copies per fixture result.
+        seed (int): Seed for the edits.
+    Returns:
+        List[Dict[str, Any]]: Tavily-like responses.
+    """
+    rng = random.Random(seed)
+    with open(FIXTURE_PATH, "r") as f:
+        responses = json.load(f)
+
+    for response in responses:
+        mirrors = []
+        for result in response["results"]:
+            for n in range(copies):
+                words = result["content"].split()
+                # Change roughly one word in forty
+                for _ in range(max(1, len(words) // 40)):
+                    words[rng.randrange(len(words))] = rng.choice(["also", "very", "simply", "then"])
+                mirror = copy.deepcopy(result)
+                mirror["url"] = f"{result['url'].rstrip('/')}/mirror-{n}"
+                mirror["content"] = " ".join(words)
+                mirror["score"] = round(result["score"] - 0.01 * (n + 1), 3)
+                mirrors.append(mirror)
+        response["results"].extend(mirrors)
+    return responses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=2, help="Mirrored copies per fixture result.")
+    parser.add_argument("--repeats", type=int, default=50, help="Number of timed runs.")
+    args = parser.parse_args()
+
+    responses = build_corpus(args.copies)
+    n_results = sum(len(response["results"]) for response in responses)
+
+    # Warm up the shared deduplicator
+    deduped = dedup_responses(responses)
+
+    timings = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        dedup_responses(responses)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    n_kept = sum(len(response["results"]) for response in deduped)
+    print(f"results in:        {n_results}")
+    print(f"results kept:      {n_kept}")
+    print(f"merged sources:    {[len(r['sources']) for response in deduped for r in response['results']]}")
+    print(f"median time (ms):  {statistics.median(timings):.2f}")
+    print(f"p95 time (ms):     {sorted(timings)[int(0.95 * (len(timings) - 1))]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
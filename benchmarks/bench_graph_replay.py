@@ -0,0 +1,69 @@
+"""
+Benchmark of the full search graph against recorded upstream traffic.
+
+Usage:
+    # Record: run the questions against the real Azure OpenAI and Tavily services
+    CASSETTE_MODE=record CASSETTE_PATH=cassettes/bench.jsonl python -m benchmarks.bench_graph_replay
+    # Replay: same questions, no LLM or Tavily traffic
+    python -m benchmarks.bench_graph_replay --cassette cassettes/bench.jsonl [--latency-scale X] [--repeats N]
+
+In replay mode every chat completion and Tavily search is served from the cassette, with the
+recorded payloads and token counts. Responses wait the recorded latency times `--latency-scale`:
+1 reproduces production timing, 0 measures the graph's own overhead. Requests that changed since
+the recording (e.g. an edited prompt) are served the next recording of their endpoint. Secrets are
+still resolved as usual.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+QUESTIONS = [
+    "How to cook eggs in Chinese way",
+    "What is the tallest building in the world?",
+    "Compare the pros and cons of PostgreSQL versus MySQL for analytics",
+]
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    # Imported once the cassette settings are in the environment
+    from gen_utils.cassettes import cassette_stats
+    from graph import run_graph
+
+    latencies: List[float] = []
+    for _ in range(args.repeats):
+        for question in args.questions:
+            started_at = time.perf_counter()
+            result = await run_graph(question, include_usage=True)
+            latencies.append(time.perf_counter() - started_at)
+            usage = result["usage"]
+            print(
+                f"{latencies[-1]:7.3f} s   llm calls {usage['llm']['calls']}   "
+                f"tokens {usage['llm']['input_tokens']}/{usage['llm']['output_tokens']}   "
+                f"tavily queries {usage['tavily']['queries']}   {question}"
+            )
+    latencies.sort()
+    print(
+        f"median {statistics.median(latencies):.3f} s   p95 {latencies[int(0.95 * (len(latencies) - 1))]:.3f} s   "
+        f"cassette {cassette_stats()}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", help="Cassette to replay; without it, CASSETTE_MODE and CASSETTE_PATH apply.")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Factor applied to the recorded latencies.")
+    parser.add_argument("--repeats", type=int, default=1, help="Number of runs over the questions.")
+    parser.add_argument("--questions", nargs="+", default=QUESTIONS, help="Questions to run.")
+    args = parser.parse_args()
+    if args.cassette:
+        os.environ["CASSETTE_MODE"] = "replay"
+        os.environ["CASSETTE_PATH"] = args.cassette
+        os.environ["CASSETTE_LATENCY_SCALE"] = str(args.latency_scale)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
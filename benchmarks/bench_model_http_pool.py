@@ -0,0 +1,148 @@
+"""
+Benchmark of the shared model HTTP client against per-model clients.
+
+Usage:
+    python -m benchmarks.bench_model_http_pool [--requests N] [--concurrency N] [--connect-latency-ms MS]
+
+A local mock OpenAI-compatible server answers chat completions. Every new connection it accepts
+is delayed by `--connect-latency-ms`, standing in for the TCP and TLS handshakes with a remote
+Azure endpoint. Each request is sent by its own AzureChatOpenAI, as when every request or model
+tier initializes its own model, in two set-ups:
+    - per-model: each model has its own HTTP client (the old behaviour),
+    - shared:    every model uses the process-wide pooled client.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from langchain_openai import AzureChatOpenAI
+
+from langgraph_agent.agent_workflows.http_pool import create_model_http_client
+
+COMPLETION = {
+    "id": "chatcmpl-mock",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "mock",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "mock answer"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+}
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately: without TCP_NODELAY, delayed ACKs stall keep-alive responses
+    disable_nagle_algorithm = True
+    connect_latency = 0.0
+
+    def setup(self):
+        # Runs once per accepted connection
+        self.server.connections_accepted += 1
+        time.sleep(self.connect_latency)
+        super().setup()
+
+    def _send_json(self, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._send_json(COMPLETION)
+
+    def do_GET(self):
+        self._send_json({"object": "list", "data": []})
+
+    def log_message(self, *args):
+        pass
+
+
+class MockOpenAIServer:
+    """A mock Azure OpenAI endpoint on a local port, used as a context manager."""
+
+    def __init__(self, connect_latency: float = 0.0):
+        handler = type("Handler", (MockOpenAIHandler,), {"connect_latency": connect_latency})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.connections_accepted = 0
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def connections_accepted(self) -> int:
+        return self.server.connections_accepted
+
+    def __enter__(self) -> "MockOpenAIServer":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_model(endpoint: str, http_async_client: Optional[Any] = None) -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        azure_endpoint=endpoint,
+        openai_api_version="2024-12-01-preview",
+        openai_api_key="mock-key",
+        deployment_name="mock",
+        http_async_client=http_async_client,
+        max_retries=0,
+    )
+
+
+async def run_requests(endpoint: str, n_requests: int, concurrency: int, http_async_client: Optional[Any]) -> List[float]:
+    """Send `n_requests` chat completions, each on its own model, returning their latencies in ms."""
+    # Models are built before timing: only the HTTP traffic is measured
+    models = [make_model(endpoint, http_async_client) for _ in range(n_requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request(model: AzureChatOpenAI) -> float:
+        async with semaphore:
+            started_at = time.perf_counter()
+            await model.ainvoke("hello")
+            return (time.perf_counter() - started_at) * 1000
+
+    return await asyncio.gather(*(one_request(model) for model in models))
+
+
+def report(name: str, latencies: List[float], connections: int) -> None:
+    latencies = sorted(latencies)
+    print(
+        f"{name:<10} median {statistics.median(latencies):7.2f} ms   "
+        f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:7.2f} ms   connections {connections}"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    with MockOpenAIServer(connect_latency=args.connect_latency_ms / 1000) as server:
+        latencies = await run_requests(server.url, args.requests, args.concurrency, None)
+        report("per-model", latencies, server.connections_accepted)
+
+    with MockOpenAIServer(connect_latency=args.connect_latency_ms / 1000) as server:
+        client = create_model_http_client()
+        try:
+            latencies = await run_requests(server.url, args.requests, args.concurrency, client)
+            report("shared", latencies, server.connections_accepted)
+            print(f"pool metrics: {client.pool_metrics()}")
+        finally:
+            await client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Number of chat completions.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at the same time.")
+    parser.add_argument("--connect-latency-ms", type=float, default=30.0, help="Delay of every new connection.")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark of structured output schema building, validation and binding, with and without the registry.
+
+Usage:
+    python -m benchmarks.bench_structured_output [--repeats N]
+
+Uses the ~40 attribute models of `structured_outputs.py`. Binding uses an AzureChatOpenAI client
+built with placeholder credentials; nothing is sent over the network.
+"""
+import argparse
+import time
+import warnings
+from typing import Callable
+
+from langchain_openai import AzureChatOpenAI
+from typing import List
+
+from pydantic import BaseModel, Field, TypeAdapter, create_model
+
+warnings.filterwarnings("ignore")
+
+from langgraph_agent.structured_output import structured_outputs
+from langgraph_agent.structured_output.registry import StructuredOutputRegistry
+
+
+def timed(fn: Callable[[], object], repeats: int) -> float:
+    """Return the mean wall time of `fn` in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20, help="Number of timed runs.")
+    args = parser.parse_args()
+
+    models = [
+        obj for obj in vars(structured_outputs).values()
+        if isinstance(obj, type) and issubclass(obj, BaseModel) and obj.__module__ == structured_outputs.__name__
+    ]
+    chat_model = AzureChatOpenAI(
+        azure_endpoint="https://example.invalid",
+        openai_api_version="2024-12-01-preview",
+        openai_api_key="placeholder",
+        deployment_name="placeholder",
+    )
+    registry = StructuredOutputRegistry()
+    registry.register_module(structured_outputs)
+    sample = {"Biometric Language": "Yes", "explanation": "Section 4.2", "source_pdf_file": None}
+    model = structured_outputs.BiometricLanguage
+
+    def define_output_model():
+        # What execute_search_workflow did on every request before the registry
+        output_model = create_model(
+            "ExampleStructuredOutput",
+            response=(str, Field(description="The response from the search agent")),
+            sources=(List[str], Field(description="The url sources from the search agent")),
+        )
+        return chat_model.with_structured_output(output_model)
+
+    rows = [
+        ("define + bind request model, per call", timed(define_output_model, args.repeats)),
+        ("json schema, per call", timed(lambda: [m.model_json_schema() for m in models], args.repeats)),
+        ("json schema, registry", timed(lambda: [registry.get(m).json_schema for m in models], args.repeats)),
+        ("validator build + validate, per call", timed(lambda: TypeAdapter(model).validate_python(sample), args.repeats)),
+        ("validate, registry", timed(lambda: registry.get("Biometric Language").validate(sample), args.repeats)),
+        ("with_structured_output, per call", timed(lambda: [chat_model.with_structured_output(m) for m in models], args.repeats)),
+        ("with_structured_output, registry", timed(lambda: [registry.bind(chat_model, m, chat_model_key="bench") for m in models], args.repeats)),
+    ]
+    print(f"{len(models)} output models, {args.repeats} repeats")
+    for name, micros in rows:
+        print(f"{name:<40} {micros:>10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
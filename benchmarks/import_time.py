@@ -0,0 +1,84 @@
+"""
+Import-time profile of the service, checked against a startup budget.
+
+Usage:
+    python -m benchmarks.import_time [--module main] [--budget-ms N] [--top N]
+
+The module is imported in a fresh interpreter with `python -X importtime`. The slowest imports
+(cumulative time) are printed, and the command exits with status 1 when the total import time
+exceeds the budget or when a deferred dependency is imported at startup.
+
+The budget defaults to the IMPORT_TIME_BUDGET_MS environment variable (4000 ms if unset).
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+# Dependencies that are slow to import and must only be imported when first used
+DEFERRED_MODULES = [
+    "pandas",
+    "faiss",
+    "snowflake",
+    "phoenix",
+    "google.cloud.storage",
+    "google.cloud.secretmanager",
+    "langchain_google_genai",
+]
+
+
+def profile_imports(module: str) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+    """
+    Import a module in a fresh interpreter with `-X importtime`.
+
+    Args:
+        module (str): The module to import.
+    Returns:
+        Tuple[List[Tuple[str, int, int]], List[str]]: The (module, self us, cumulative us) rows in
+        import order, and the deferred modules that were imported.
+    """
+    check = f"import sys; print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}; {check}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    imported_deferred = [m for m in completed.stdout.strip().split(",") if m]
+    return rows, imported_deferred
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="Module to import.")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "4000")), help="Startup budget.")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to print.")
+    args = parser.parse_args()
+
+    rows, imported_deferred = profile_imports(args.module)
+    total_ms = next(cumulative for name, _, cumulative in rows if name == args.module) / 1000
+
+    print(f"{'cumulative (ms)':>16} {'self (ms)':>10}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[2])[: args.top]:
+        print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {name}")
+    print(f"\nimport {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time exceeds the budget by {total_ms - args.budget_ms:.0f} ms")
+        failed = True
+    if imported_deferred:
+        print(f"FAIL: deferred dependencies imported at startup: {', '.join(imported_deferred)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
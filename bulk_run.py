@@ -0,0 +1,369 @@
+"""
+Run a file of questions through the search workflow.
+
+Usage:
+    python -m bulk_run questions.csv answers.jsonl [--question-column question] [--id-column id]
+        [--concurrency 4] [--chunk-size 100] [--timeout-seconds S] [--limit N] [--no-warmup]
+
+Questions are read as a stream from a .csv, .jsonl or .parquet file (Parquet by record batch), and
+answered with `graph.run_graph`, `--concurrency` at a time. The questions run in this process and
+share the compiled graph, the pooled model and Tavily connections and the local search index.
+
+Answers are written every `--chunk-size` rows: appended to a .jsonl or .csv output, or as a new part
+file of a .parquet output directory. Only the current chunk is held in memory.
+
+The run is resumable. Rows already answered in the output are skipped, so the same command continues
+where an interrupted run stopped. Failed rows are retried, and their new line supersedes the error.
+A throughput and latency summary is printed at the end.
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import logging
+import os
+import statistics
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from gen_utils.log_queue import configure_service_logging, stop_queue_logging
+from graph import run_graph, warm_up
+from langgraph_agent.agent_workflows.http_pool import close_model_http_client
+from langgraph_agent.agent_workflows.sessions import close_session_store
+from langgraph_agent.tools.page_fetch import close_page_fetcher
+from langgraph_agent.tools.tools import close_tavily_client, persist_local_index
+
+# Columns of the output, one row per answered question
+OUTPUT_COLUMNS = (
+    "row", "id", "question", "status", "response", "sources", "unsourced",
+    "seconds", "input_tokens", "output_tokens", "tavily_queries", "error",
+)
+
+
+def read_rows(path: str, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the rows of a .csv, .jsonl or .parquet file as dicts.
+
+    Args:
+        path (str): The input file.
+        batch_size (int): Rows per record batch read from a Parquet file.
+    Raises:
+        ValueError: For other file types.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        # utf-8-sig: spreadsheet exports often start with a byte order mark
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unsupported input file type: {path} (expected .csv, .jsonl or .parquet)")
+
+
+def read_questions(path: str, question_column: str = "question", id_column: Optional[str] = None) -> Iterator[Tuple[int, Optional[str], str]]:
+    """
+    Stream the questions of an input file.
+
+    Args:
+        path (str): The input file.
+        question_column (str): The column holding the questions.
+        id_column (str): An optional column identifying the rows, copied to the output.
+    Yields:
+        Tuple[int, Optional[str], str]: The row number (from 0), its id and its question.
+    Raises:
+        KeyError: If a row has no question column.
+    """
+    for row_number, row in enumerate(read_rows(path)):
+        if question_column not in row:
+            raise KeyError(f"Row {row_number} of {path} has no {question_column!r} column")
+        row_id = row.get(id_column) if id_column else None
+        question = row[question_column]
+        yield row_number, (str(row_id) if row_id is not None else None), ("" if question is None else str(question))
+
+
+class ResultWriter(ABC):
+    """Appends chunks of result rows to an output, and lists the rows it already answered."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    @abstractmethod
+    def read_existing(self) -> Iterator[Dict[str, Any]]:
+        """Stream the rows already in the output."""
+
+    def completed_rows(self) -> Set[int]:
+        """Row numbers answered successfully by earlier runs."""
+        return {int(result["row"]) for result in self.read_existing() if result.get("status") == "ok"}
+
+    @abstractmethod
+    def write(self, results: List[Dict[str, Any]]) -> None:
+        """Append a chunk of results."""
+
+
+def ends_mid_line(path: Path) -> bool:
+    """Whether a file ends with a partial line, left by an interrupted write."""
+    if not path.exists() or path.stat().st_size == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+class JsonlResultWriter(ResultWriter):
+    def read_existing(self) -> Iterator[Dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut by an interrupted write: its row is answered again
+                    continue
+
+    def write(self, results: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            if ends_mid_line(self.path):
+                f.write("\n")
+            f.writelines(json.dumps(result) + "\n" for result in results)
+
+
+class CsvResultWriter(ResultWriter):
+    def read_existing(self) -> Iterator[Dict[str, Any]]:
+        if self.path.exists():
+            yield from read_rows(str(self.path))
+
+    def write(self, results: List[Dict[str, Any]]) -> None:
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            if ends_mid_line(self.path):
+                f.write("\r\n")
+            writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows({**result, "sources": json.dumps(result["sources"])} for result in results)
+
+
+class ParquetResultWriter(ResultWriter):
+    """Writes each chunk as a part file of the output directory, readable as one Parquet dataset."""
+
+    def parts(self) -> List[Path]:
+        return sorted(self.path.glob("part-*.parquet")) if self.path.is_dir() else []
+
+    def read_existing(self) -> Iterator[Dict[str, Any]]:
+        import pyarrow.parquet as pq
+
+        for part in self.parts():
+            yield from pq.read_table(part, columns=["row", "status"]).to_pylist()
+
+    def write(self, results: List[Dict[str, Any]]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("row", pa.int64()), ("id", pa.string()), ("question", pa.string()), ("status", pa.string()),
+            ("response", pa.string()), ("sources", pa.list_(pa.string())), ("unsourced", pa.bool_()),
+            ("seconds", pa.float64()), ("input_tokens", pa.int64()), ("output_tokens", pa.int64()),
+            ("tavily_queries", pa.int64()), ("error", pa.string()),
+        ])
+        self.path.mkdir(parents=True, exist_ok=True)
+        parts = self.parts()
+        number = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+        # Written under a hidden temporary name first: an interrupted write leaves no partial part file
+        part = self.path / f"part-{number:05d}.parquet"
+        temporary = self.path / f".{part.name}.tmp"
+        pq.write_table(pa.Table.from_pylist(results, schema=schema), temporary)
+        os.replace(temporary, part)
+
+
+def result_writer(path: str) -> ResultWriter:
+    """The writer of an output path: .jsonl, .csv, or .parquet (a directory of part files)."""
+    writers = {".jsonl": JsonlResultWriter, ".csv": CsvResultWriter, ".parquet": ParquetResultWriter}
+    suffix = Path(path).suffix.lower()
+    if suffix not in writers:
+        raise ValueError(f"Unsupported output file type: {path} (expected .csv, .jsonl or .parquet)")
+    return writers[suffix](path)
+
+
+async def answer_question(row: int, row_id: Optional[str], question: str, timeout_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Answer one question, turning a failure into an error row.
+
+    Returns:
+        Dict[str, Any]: The output row, see OUTPUT_COLUMNS.
+    """
+    result = {column: None for column in OUTPUT_COLUMNS}
+    result.update(row=row, id=row_id, question=question, sources=[])
+    started_at = time.perf_counter()
+    try:
+        if not question.strip():
+            raise ValueError("empty question")
+        output = await run_graph(question, timeout_seconds=timeout_seconds, include_usage=True)
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}", seconds=round(time.perf_counter() - started_at, 3))
+        return result
+    final_answer, usage = output["final_answer"], output["usage"]
+    result.update(
+        status="ok",
+        response=final_answer.get("response"),
+        sources=list(final_answer.get("sources") or []),
+        unsourced=bool(output.get("unsourced", False)),
+        seconds=round(time.perf_counter() - started_at, 3),
+        input_tokens=usage["llm"]["input_tokens"],
+        output_tokens=usage["llm"]["output_tokens"],
+        tavily_queries=usage["tavily"]["queries"],
+    )
+    return result
+
+
+def summarize(counts: Counter, latencies: List[float], seconds: float) -> Dict[str, Any]:
+    """Throughput and latency of a run, with its row counts and token and Tavily totals."""
+    latencies = sorted(latencies)
+    answered = counts["ok"] + counts["error"]
+    return {
+        "rows": answered + counts["skipped"],
+        "ok": counts["ok"],
+        "errors": counts["error"],
+        "skipped": counts["skipped"],
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(answered / seconds, 3) if seconds > 0 else None,
+        "latency_seconds_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        "latency_seconds_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+        "latency_seconds_max": round(latencies[-1], 3) if latencies else None,
+        "latency_seconds_avg": round(statistics.fmean(latencies), 3) if latencies else None,
+        "input_tokens": counts["input_tokens"],
+        "output_tokens": counts["output_tokens"],
+        "tavily_queries": counts["tavily_queries"],
+    }
+
+
+async def run_bulk(
+    questions: Iterator[Tuple[int, Optional[str], str]],
+    writer: ResultWriter,
+    concurrency: int = 4,
+    chunk_size: int = 100,
+    timeout_seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Answer a stream of questions with bounded concurrency, writing the answers in chunks.
+
+    The questions are read ahead by at most twice `concurrency`, and at most one chunk of answers is
+    buffered: memory does not grow with the input. Rows the output already answered are skipped.
+    The buffered answers are written even when the run fails or is cancelled.
+
+    Args:
+        questions (Iterator): The row numbers, ids and questions, see `read_questions`.
+        writer (ResultWriter): The output.
+        concurrency (int): Questions answered at the same time.
+        chunk_size (int): Answers per write.
+        timeout_seconds (float): Time budget of each question, SEARCH_DEADLINE_SECONDS if omitted.
+    Returns:
+        Dict[str, Any]: The run summary, see `summarize`.
+    """
+    logger = logging.getLogger(__name__)
+    completed = await asyncio.to_thread(writer.completed_rows)
+    pending: asyncio.Queue = asyncio.Queue(maxsize=2 * concurrency)
+    buffer: List[Dict[str, Any]] = []
+    write_lock = asyncio.Lock()
+    counts: Counter = Counter()
+    latencies: List[float] = []
+    started_at = time.perf_counter()
+
+    async def flush() -> None:
+        async with write_lock:
+            chunk = buffer[:]
+            del buffer[:]
+            if chunk:
+                await asyncio.to_thread(writer.write, chunk)
+                logger.info("%d rows answered, %.2f rows/s", counts["ok"] + counts["error"],
+                            (counts["ok"] + counts["error"]) / (time.perf_counter() - started_at))
+
+    async def produce() -> None:
+        iterator = iter(questions)
+        # The input is read in a worker thread: file reads never block the event loop
+        while (item := await asyncio.to_thread(next, iterator, None)) is not None:
+            if item[0] in completed:
+                counts["skipped"] += 1
+                continue
+            await pending.put(item)
+        for _ in range(concurrency):
+            await pending.put(None)
+
+    async def work() -> None:
+        while (item := await pending.get()) is not None:
+            result = await answer_question(*item, timeout_seconds=timeout_seconds)
+            counts[result["status"]] += 1
+            latencies.append(result["seconds"])
+            for counter in ("input_tokens", "output_tokens", "tavily_queries"):
+                counts[counter] += result[counter] or 0
+            buffer.append(result)
+            if len(buffer) >= chunk_size:
+                await flush()
+
+    tasks = [asyncio.ensure_future(produce()), *(asyncio.ensure_future(work()) for _ in range(concurrency))]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # A failure (e.g. an unreadable input row) stops the other workers; their answers are kept
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await flush()
+    return summarize(counts, latencies, time.perf_counter() - started_at)
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    configure_service_logging()
+    try:
+        if not args.no_warmup:
+            await warm_up()
+        questions = read_questions(args.input, args.question_column, args.id_column)
+        if args.limit is not None:
+            questions = itertools.islice(questions, args.limit)
+        return await run_bulk(questions, result_writer(args.output), args.concurrency, args.chunk_size, args.timeout_seconds)
+    finally:
+        # Release the shared clients and keep what the local index learned, as on service shutdown
+        await close_tavily_client()
+        await close_page_fetcher()
+        await close_model_http_client()
+        await close_session_store()
+        persist_local_index()
+        stop_queue_logging()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Questions: a .csv, .jsonl or .parquet file.")
+    parser.add_argument("output", help="Answers: a .jsonl or .csv file, or a .parquet directory, appended to.")
+    parser.add_argument("--question-column", default="question", help="Column holding the questions.")
+    parser.add_argument("--id-column", help="Column identifying the rows, copied to the output.")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BULK_CONCURRENCY", "4")), help="Questions answered at the same time.")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Answers written per chunk.")
+    parser.add_argument("--timeout-seconds", type=float, help="Time budget of each question, SEARCH_DEADLINE_SECONDS by default.")
+    parser.add_argument("--limit", type=int, help="Only read the first N rows of the input.")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip the warm-up of the graph and connections.")
+    args = parser.parse_args()
+    summary = asyncio.run(main_async(args))
+    print(
+        f"{summary['rows']} rows: {summary['ok']} answered, {summary['errors']} failed, {summary['skipped']} already done\n"
+        f"{summary['seconds']:.1f} s, {summary['rows_per_second']} rows/s\n"
+        f"latency p50 {summary['latency_seconds_p50']} s   p95 {summary['latency_seconds_p95']} s   max {summary['latency_seconds_max']} s\n"
+        f"tokens {summary['input_tokens']}/{summary['output_tokens']}   tavily queries {summary['tavily_queries']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
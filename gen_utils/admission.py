@@ -0,0 +1,228 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import statistics
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# Priority classes, most urgent first
+PRIORITIES = ("interactive", "batch")
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed. `retry_after` is a suggested delay in seconds before retrying."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Service overloaded ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    rank: int
+    seq: int
+    priority: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False, default_factory=time.monotonic)
+
+
+class AdmissionController:
+    """
+    Admission control in front of the graph executions.
+
+    At most `max_in_flight` executions run at once. Requests beyond that wait in a bounded priority
+    queue: interactive requests are always admitted before batch ones, and batch requests never hold
+    more than `batch_max_in_flight` slots, so bulk jobs cannot starve interactive users.
+
+    A request is shed with `Overloaded` when the queue is full, when its estimated wait (from the
+    recent execution times) exceeds its class's maximum queue wait, or when it actually waits longer.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_queue: int = 32,
+        max_queue_wait: Optional[Dict[str, float]] = None,
+        batch_max_in_flight: Optional[int] = None,
+        window: int = 1000,
+    ):
+        """
+        Args:
+            max_in_flight (int): Maximum number of executions running at once.
+            max_queue (int): Maximum number of waiting requests, all classes together.
+            max_queue_wait (Dict[str, float]): Maximum queue wait in seconds per priority class.
+            batch_max_in_flight (int): Maximum number of running batch executions, half of
+                `max_in_flight` (at least one) if omitted.
+            window (int): Number of recent wait and execution times kept for the metrics.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_wait = {"interactive": 10.0, "batch": 120.0, **(max_queue_wait or {})}
+        self.batch_max_in_flight = batch_max_in_flight or max(1, max_in_flight // 2)
+        self._in_flight: Counter = Counter()
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._admitted: Counter = Counter()
+        self._rejected: Counter = Counter()
+        self._wait_times: deque = deque(maxlen=window)
+        self._service_times: deque = deque(maxlen=window)
+
+    @asynccontextmanager
+    async def admit(self, priority: str = "interactive") -> AsyncIterator[None]:
+        """
+        Hold an execution slot for the duration of the block.
+
+        Args:
+            priority (str): "interactive" or "batch".
+        Raises:
+            Overloaded: If the request is shed.
+        """
+        await self.acquire(priority)
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_times.append(time.monotonic() - started_at)
+            self.release(priority)
+
+    async def acquire(self, priority: str = "interactive") -> None:
+        """Wait for an execution slot. Prefer `admit`, which always releases it."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority class '{priority}', expected one of {PRIORITIES}.")
+        rank = PRIORITIES.index(priority)
+
+        # Run now if a slot is free and nobody of the same or a higher class is waiting
+        if self._can_run(priority) and self._waiting_ahead(rank) == 0:
+            self._start(priority, waited=0.0)
+            return
+
+        if self.queue_depth >= self.max_queue:
+            self._reject("queue_full", self._retry_after(priority))
+        estimate = self.estimated_wait(priority)
+        if estimate is not None and estimate > self.max_queue_wait[priority]:
+            self._reject("estimated_wait", self._retry_after(priority))
+
+        waiter = _Waiter(rank, next(self._seq), priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        try:
+            await asyncio.wait_for(waiter.future, timeout=self.max_queue_wait[priority])
+        except asyncio.TimeoutError:
+            # The slot may have been granted in the same loop iteration as the timeout: it is ours
+            if waiter.future.done() and not waiter.future.cancelled():
+                return
+            self._reject("queue_timeout", self._retry_after(priority))
+        except asyncio.CancelledError:
+            # The slot may have been granted just before the cancellation
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(priority)
+            else:
+                waiter.future.cancel()
+            raise
+
+    def release(self, priority: str) -> None:
+        """Free an execution slot and hand it to the next eligible waiter."""
+        self._in_flight[priority] -= 1
+        self._dispatch()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self._queue if not waiter.future.done())
+
+    def estimated_wait(self, priority: str) -> Optional[float]:
+        """
+        Estimate the queue wait of a new request from the recent execution times.
+
+        Returns:
+            Optional[float]: The estimate in seconds, None before any execution finished.
+        """
+        if not self._service_times:
+            return None
+        slots = self.max_in_flight if priority == "interactive" else self.batch_max_in_flight
+        ahead = self._waiting_ahead(PRIORITIES.index(priority))
+        return (ahead + 1) * statistics.fmean(self._service_times) / slots
+
+    def _can_run(self, priority: str) -> bool:
+        if sum(self._in_flight.values()) >= self.max_in_flight:
+            return False
+        return priority != "batch" or self._in_flight["batch"] < self.batch_max_in_flight
+
+    def _waiting_ahead(self, rank: int) -> int:
+        return sum(1 for waiter in self._queue if waiter.rank <= rank and not waiter.future.done())
+
+    def _start(self, priority: str, waited: float) -> None:
+        self._in_flight[priority] += 1
+        self._admitted[priority] += 1
+        self._wait_times.append(waited)
+
+    def _dispatch(self) -> None:
+        while self._queue:
+            waiter = self._queue[0]
+            if waiter.future.done():
+                # Cancelled or timed out
+                heapq.heappop(self._queue)
+                continue
+            if not self._can_run(waiter.priority):
+                break
+            heapq.heappop(self._queue)
+            self._start(waiter.priority, waited=time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def _retry_after(self, priority: str) -> int:
+        estimate = self.estimated_wait(priority)
+        return max(1, math.ceil(estimate if estimate is not None else self.max_queue_wait[priority]))
+
+    def _reject(self, reason: str, retry_after: int) -> None:
+        self._rejected[reason] += 1
+        raise Overloaded(reason, retry_after)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the in-flight, queue depth, admission and wait time metrics."""
+        waits = sorted(self._wait_times)
+        depth = Counter(waiter.priority for waiter in self._queue if not waiter.future.done())
+        return {
+            "in_flight": {priority: self._in_flight[priority] for priority in PRIORITIES},
+            "queue_depth": {priority: depth[priority] for priority in PRIORITIES},
+            "admitted_total": {priority: self._admitted[priority] for priority in PRIORITIES},
+            "rejected_total": dict(self._rejected),
+            "queue_wait_seconds": {
+                "p50": round(waits[len(waits) // 2], 3) if waits else None,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else None,
+                "max": round(waits[-1], 3) if waits else None,
+            },
+            "execution_seconds_avg": round(statistics.fmean(self._service_times), 3) if self._service_times else None,
+        }
+
+
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Return the process-wide admission controller.
+
+    Configured with environment variables:
+        - ADMISSION_MAX_IN_FLIGHT: Maximum number of graph executions at once (default 8).
+        - ADMISSION_MAX_QUEUE: Maximum number of waiting requests (default 32).
+        - ADMISSION_BATCH_MAX_IN_FLIGHT: Maximum number of running batch executions (default half).
+        - ADMISSION_MAX_WAIT_INTERACTIVE / ADMISSION_MAX_WAIT_BATCH: Maximum queue wait in seconds
+          (default 10 and 120).
+    """
+    global _admission_controller
+    if _admission_controller is None:
+        batch_max_in_flight = os.getenv("ADMISSION_BATCH_MAX_IN_FLIGHT")
+        _admission_controller = AdmissionController(
+            max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "32")),
+            max_queue_wait={
+                "interactive": float(os.getenv("ADMISSION_MAX_WAIT_INTERACTIVE", "10")),
+                "batch": float(os.getenv("ADMISSION_MAX_WAIT_BATCH", "120")),
+            },
+            batch_max_in_flight=int(batch_max_in_flight) if batch_max_in_flight else None,
+        )
+    return _admission_controller
@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+CASSETTE_MODES = ("off", "record", "replay")
+
+# Response headers kept in a cassette; bodies are stored decoded, so encoding and length are dropped
+KEPT_RESPONSE_HEADERS = ("content-type", "x-request-id", "apim-request-id", "openai-processing-ms")
+
+# Request body fields that must never be written to a cassette
+SECRET_BODY_FIELDS = ("api_key",)
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when no recorded interaction matches a request."""
+
+
+def endpoint_of(request: httpx.Request) -> str:
+    """The method, host and path of a request, e.g. "POST api.tavily.com/search"."""
+    return f"{request.method} {request.url.host}{request.url.path}"
+
+
+def canonical_body(content: bytes) -> Any:
+    """The request body as stored and matched: parsed JSON without secrets, or text."""
+    text = content.decode("utf-8", errors="replace")
+    try:
+        body = json.loads(text)
+    except ValueError:
+        return text
+    if isinstance(body, dict):
+        body = {key: value for key, value in body.items() if key not in SECRET_BODY_FIELDS}
+    return body
+
+
+def request_key(request: httpx.Request, body: Any) -> str:
+    """Key matching a request to its recording: the endpoint, the query string and the body."""
+    data = json.dumps([endpoint_of(request), request.url.query.decode(), body], sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Recorded upstream HTTP interactions, one JSON line each, with their timings.
+
+    In record mode every interaction is appended to the file as it completes. In replay mode
+    requests are matched to the recordings: first by key (endpoint, query and body), consuming
+    identical requests' recordings in order, then, when the request changed (e.g. a new prompt), to
+    the next unused recording of the same endpoint. Replay is deterministic for a given request
+    sequence.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 1.0):
+        """
+        Args:
+            path (str): The cassette file (JSON lines).
+            mode (str): "record" or "replay".
+            latency_scale (float): Factor applied to the recorded latencies in replay mode; 0 serves
+                responses without delay.
+        Raises:
+            ValueError: If the mode is unknown.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.interactions: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, List[int]] = defaultdict(list)
+        self._by_endpoint: Dict[str, List[int]] = defaultdict(list)
+        self._used: set = set()
+        self._key_cursor: Counter = Counter()
+        self._counters: Counter = Counter()
+        self._lock = threading.Lock()
+        if mode == "replay":
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _index(self, interaction: Dict[str, Any]) -> None:
+        index = len(self.interactions)
+        self.interactions.append(interaction)
+        self._by_key[interaction["key"]].append(index)
+        self._by_endpoint[interaction["endpoint"]].append(index)
+
+    def record(self, interaction: Dict[str, Any]) -> None:
+        """Append an interaction to the cassette file."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(interaction) + "\n")
+            self._counters["recorded"] += 1
+
+    def match(self, key: str, endpoint: str) -> Dict[str, Any]:
+        """
+        Find the recording to replay for a request.
+
+        Args:
+            key (str): The request's key, see `request_key`.
+            endpoint (str): The request's endpoint, see `endpoint_of`.
+        Returns:
+            Dict[str, Any]: The recorded interaction.
+        Raises:
+            CassetteMiss: If the cassette holds no recording of the request or its endpoint left.
+        """
+        with self._lock:
+            indexes = self._by_key.get(key)
+            if indexes:
+                # Identical requests replay their recordings in order, then the last one again
+                index = indexes[min(self._key_cursor[key], len(indexes) - 1)]
+                self._key_cursor[key] += 1
+                self._used.add(index)
+                self._counters["exact"] += 1
+                return self.interactions[index]
+            for index in self._by_endpoint.get(endpoint, []):
+                if index not in self._used:
+                    self._used.add(index)
+                    self._counters["fallback"] += 1
+                    return self.interactions[index]
+            self._counters["misses"] += 1
+        raise CassetteMiss(f"No recorded interaction left for {endpoint} in {self.path}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the mode, the number of replayable interactions, and the recorded, exact, fallback and missed counts."""
+        with self._lock:
+            return {"mode": self.mode, "interactions": len(self.interactions), **self._counters}
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    """A recorded body, streamed event by event over the recorded transfer time."""
+
+    def __init__(self, body: bytes, seconds: float):
+        chunks = body.split(b"\n\n")
+        self._chunks = [chunk + b"\n\n" for chunk in chunks[:-1]] + [chunks[-1]]
+        self._delay = seconds / len(self._chunks)
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            if self._delay > 0:
+                await asyncio.sleep(self._delay)
+            if chunk:
+                yield chunk
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport recording upstream interactions to a cassette, or replaying them from it.
+
+    Recording reads each response in full before returning it. Replaying waits the recorded time
+    to the response headers, then streams the body's server-sent events over the recorded transfer
+    time, both scaled by the cassette's `latency_scale`; no network is used.
+    """
+
+    def __init__(self, cassette: Cassette, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Args:
+            cassette (Cassette): The cassette.
+            transport (httpx.AsyncBaseTransport): The real transport, used in record mode.
+        """
+        self.cassette = cassette
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = canonical_body(await request.aread())
+        key, endpoint = request_key(request, body), endpoint_of(request)
+        if self.cassette.mode == "replay":
+            interaction = self.cassette.match(key, endpoint)
+            timing, response = interaction["timing"], interaction["response"]
+            scale = self.cassette.latency_scale
+            if timing["ttfb_seconds"] * scale > 0:
+                await asyncio.sleep(timing["ttfb_seconds"] * scale)
+            return httpx.Response(
+                status_code=response["status"],
+                headers=response["headers"],
+                stream=_ReplayStream(response["body"].encode("utf-8"), (timing["elapsed_seconds"] - timing["ttfb_seconds"]) * scale),
+            )
+
+        started_at = time.perf_counter()
+        upstream = await self._transport.handle_async_request(request)
+        ttfb = time.perf_counter() - started_at
+        # The transport's raw stream: `aread` decodes it and closes the connection's stream
+        response = httpx.Response(upstream.status_code, headers=upstream.headers, stream=upstream.stream, request=request)
+        content = await response.aread()
+        elapsed = time.perf_counter() - started_at
+        headers = {name: value for name, value in response.headers.items() if name.lower() in KEPT_RESPONSE_HEADERS}
+        await asyncio.to_thread(self.cassette.record, {
+            "endpoint": endpoint,
+            "key": key,
+            "request": {"query": request.url.query.decode(), "body": body},
+            "response": {"status": response.status_code, "headers": headers, "body": content.decode("utf-8", errors="replace")},
+            "timing": {"ttfb_seconds": round(ttfb, 6), "elapsed_seconds": round(elapsed, 6)},
+            "recorded_at": time.time(),
+        })
+        return httpx.Response(status_code=response.status_code, headers=headers, content=content, extensions=upstream.extensions)
+
+    async def aclose(self) -> None:
+        if self._transport is not None:
+            await self._transport.aclose()
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    Return the process-wide cassette, or None when cassettes are off.
+
+    Configured with environment variables:
+        - CASSETTE_MODE: "off" (default), "record" or "replay".
+        - CASSETTE_PATH: The cassette file (default ./cassettes/upstream.jsonl).
+        - CASSETTE_LATENCY_SCALE: Factor applied to the recorded latencies in replay mode
+          (default 1, 0 for no delay).
+    """
+    global _cassette
+    mode = os.getenv("CASSETTE_MODE", "off").lower()
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"Unknown CASSETTE_MODE '{mode}', expected one of {CASSETTE_MODES}")
+    if mode == "off":
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(
+                os.getenv("CASSETTE_PATH", "./cassettes/upstream.jsonl"),
+                mode,
+                latency_scale=float(os.getenv("CASSETTE_LATENCY_SCALE", "1")),
+            )
+        return _cassette
+
+
+def cassette_transport(transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """
+    Wrap an upstream client's transport with the process-wide cassette, if cassettes are on.
+
+    Args:
+        transport (httpx.AsyncBaseTransport): The real transport.
+    Returns:
+        httpx.AsyncBaseTransport: The transport to use: a `CassetteTransport`, or `transport`
+        unchanged when CASSETTE_MODE is "off".
+    """
+    cassette = get_cassette()
+    return CassetteTransport(cassette, transport) if cassette is not None else transport
+
+
+def cassette_stats() -> Optional[Dict[str, Any]]:
+    """Return the process-wide cassette's stats, or None if cassettes are off or unused."""
+    return _cassette.stats() if _cassette is not None else None
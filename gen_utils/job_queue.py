@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiosqlite
+
+JOB_COLUMNS = (
+    "id", "question", "thread_id", "timeout_seconds", "status", "result", "error", "attempts",
+    "created_at", "available_at", "started_at", "finished_at", "worker_id", "lease_expires_at",
+)
+
+
+class Retry(Exception):
+    """Raised by a job handler to put the job back in the queue, e.g. when the service is overloaded."""
+
+    def __init__(self, delay: float):
+        super().__init__(f"Retry in {delay}s")
+        self.delay = delay
+
+
+class SearchJobQueue:
+    """
+    Durable queue of search jobs in a SQLite file.
+
+    Jobs go from "queued" to "running" to "succeeded" or "failed". A claimed job holds a lease that
+    its worker renews while it runs; when a worker dies (or the service restarts) the lease expires
+    and the job is claimed again, up to `max_attempts` times. Claims are single atomic statements,
+    so several worker processes on the node can share the file.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, lease_seconds: float = 60.0, max_attempts: int = 3, retention_seconds: float = 7 * 86400):
+        """
+        Args:
+            conn (aiosqlite.Connection): Connection to the queue database.
+            lease_seconds (float): Time a worker may hold a job without renewing its lease.
+            max_attempts (int): Number of claims after which an abandoned job is failed.
+            retention_seconds (float): Age after which finished jobs are deleted.
+        """
+        self.conn = conn
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+
+    @classmethod
+    async def open(cls, db_path: str, **kwargs: Any) -> "SearchJobQueue":
+        """Open (and create if needed) the queue database at `db_path`."""
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = await aiosqlite.connect(db_path)
+        # WAL lets readers and a writer from other processes work concurrently
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA busy_timeout=5000")
+        queue = cls(conn, **kwargs)
+        await queue.setup()
+        return queue
+
+    async def setup(self) -> None:
+        await self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_jobs ("
+            "id TEXT PRIMARY KEY, question TEXT NOT NULL, thread_id TEXT, timeout_seconds REAL, "
+            "status TEXT NOT NULL, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, available_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "worker_id TEXT, lease_expires_at REAL)"
+        )
+        await self.conn.execute("CREATE INDEX IF NOT EXISTS search_jobs_claim ON search_jobs (status, available_at)")
+        await self.conn.commit()
+
+    async def enqueue(self, question: str, thread_id: Optional[str] = None, timeout_seconds: Optional[float] = None) -> str:
+        """
+        Add a search job to the queue.
+
+        Returns:
+            str: The job id.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        await self.conn.execute(
+            "INSERT INTO search_jobs (id, question, thread_id, timeout_seconds, status, created_at, available_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, question, thread_id, timeout_seconds, now, now),
+        )
+        await self.conn.commit()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job, with its result decoded, or None if it does not exist."""
+        async with self.conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM search_jobs WHERE id = ?", (job_id,)) as cursor:
+            row = await cursor.fetchone()
+        return self._as_job(row) if row else None
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim the oldest available job: a queued one, or a running one whose lease expired.
+
+        Returns:
+            Optional[Dict[str, Any]]: The claimed job, or None if there is none.
+        """
+        now = time.time()
+        # Abandoned jobs that used up their attempts are failed rather than claimed again
+        await self.conn.execute(
+            "UPDATE search_jobs SET status = 'failed', error = 'abandoned by its workers', finished_at = ? "
+            "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?",
+            (now, now, self.max_attempts),
+        )
+        async with self.conn.execute(
+            "UPDATE search_jobs SET status = 'running', worker_id = ?, attempts = attempts + 1, "
+            "started_at = ?, lease_expires_at = ? "
+            "WHERE id = (SELECT id FROM search_jobs WHERE (status = 'queued' AND available_at <= ?) "
+            "OR (status = 'running' AND lease_expires_at < ?) ORDER BY created_at LIMIT 1) "
+            f"RETURNING {', '.join(JOB_COLUMNS)}",
+            (worker_id, now, now + self.lease_seconds, now, now),
+        ) as cursor:
+            row = await cursor.fetchone()
+        await self.conn.commit()
+        return self._as_job(row) if row else None
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> None:
+        """Renew the lease of a running job."""
+        await self._update_owned(job_id, worker_id, "lease_expires_at = ?", (time.time() + self.lease_seconds,))
+
+    async def complete(self, job_id: str, worker_id: str, result: Any) -> None:
+        """Store the result of a job."""
+        await self._update_owned(
+            job_id, worker_id, "status = 'succeeded', result = ?, finished_at = ?, lease_expires_at = NULL",
+            (json.dumps(result), time.time()),
+        )
+
+    async def fail(self, job_id: str, worker_id: str, error: str) -> None:
+        """Mark a job as failed."""
+        await self._update_owned(
+            job_id, worker_id, "status = 'failed', error = ?, finished_at = ?, lease_expires_at = NULL",
+            (error, time.time()),
+        )
+
+    async def release(self, job_id: str, worker_id: str, delay: float = 0.0) -> None:
+        """Put a claimed job back in the queue, available after `delay` seconds, without using up an attempt."""
+        await self._update_owned(
+            job_id, worker_id,
+            "status = 'queued', attempts = attempts - 1, available_at = ?, worker_id = NULL, lease_expires_at = NULL",
+            (time.time() + delay,),
+        )
+
+    async def _update_owned(self, job_id: str, worker_id: str, assignments: str, values: tuple) -> None:
+        # Only the worker holding the job may update it: a job re-claimed after a lost lease is not overwritten
+        await self.conn.execute(
+            f"UPDATE search_jobs SET {assignments} WHERE id = ? AND worker_id = ? AND status = 'running'",
+            (*values, job_id, worker_id),
+        )
+        await self.conn.commit()
+
+    async def stats(self) -> Dict[str, int]:
+        """Count the jobs by status."""
+        async with self.conn.execute("SELECT status, COUNT(*) FROM search_jobs GROUP BY status") as cursor:
+            counts = dict(await cursor.fetchall())
+        return {status: counts.get(status, 0) for status in ("queued", "running", "succeeded", "failed")}
+
+    async def cleanup(self) -> int:
+        """Delete the finished jobs older than `retention_seconds`, returning how many were deleted."""
+        cursor = await self.conn.execute(
+            "DELETE FROM search_jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+            (time.time() - self.retention_seconds,),
+        )
+        await self.conn.commit()
+        return cursor.rowcount
+
+    @staticmethod
+    def _as_job(row: tuple) -> Dict[str, Any]:
+        job = dict(zip(JOB_COLUMNS, row))
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    async def aclose(self) -> None:
+        await self.conn.close()
+
+
+class JobWorkerPool:
+    """
+    Pool of asyncio workers running the jobs of a `SearchJobQueue`.
+
+    Each worker claims a job, runs `handler(job)` while renewing the job's lease, and stores the
+    result or the error. A handler raising `Retry` puts the job back in the queue.
+    """
+
+    def __init__(
+        self,
+        queue: SearchJobQueue,
+        handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+        concurrency: int = 2,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Args:
+            queue (SearchJobQueue): The job queue.
+            handler (Callable): Coroutine function running a job and returning its JSON-serializable result.
+            concurrency (int): Number of jobs run at once by this process.
+            poll_interval (float): Seconds between two claims when the queue is empty.
+        """
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work(f"{self.worker_prefix}-{n}")) for n in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Stop the workers. Jobs they were running go back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, worker_id: str) -> None:
+        logger = logging.getLogger(__name__)
+        while True:
+            try:
+                job = await self.queue.claim(worker_id)
+            except Exception as e:
+                logger.warning("Claiming a job failed: %s", e)
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._run(job, worker_id)
+
+    async def _run(self, job: Dict[str, Any], worker_id: str) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"], worker_id))
+        try:
+            result = await self.handler(job)
+        except Retry as e:
+            await self.queue.release(job["id"], worker_id, delay=e.delay)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so it runs after the restart
+            await asyncio.shield(self.queue.release(job["id"], worker_id))
+            raise
+        except Exception as e:
+            logging.getLogger(__name__).exception("Job %s failed", job["id"])
+            await self.queue.fail(job["id"], worker_id, f"{type(e).__name__}: {e}")
+        else:
+            await self.queue.complete(job["id"], worker_id, result)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str, worker_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            await self.queue.heartbeat(job_id, worker_id)
+
+
+_job_queue: Optional[SearchJobQueue] = None
+_job_queue_lock = asyncio.Lock()
+
+
+async def get_job_queue() -> SearchJobQueue:
+    """
+    Return the process-wide job queue, opening it on first use.
+
+    Configured with environment variables:
+        - JOB_DB_PATH: SQLite file of the queue (default ./jobs/jobs.sqlite). Processes sharing the
+          file share the queue.
+        - JOB_LEASE_SECONDS: Time a job stays claimed without a heartbeat from its worker (default 60).
+        - JOB_MAX_ATTEMPTS: Number of claims after which an abandoned job is failed (default 3).
+        - JOB_RETENTION_SECONDS: Age after which finished jobs are deleted (default 7 days).
+    """
+    global _job_queue
+    async with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = await SearchJobQueue.open(
+                os.getenv("JOB_DB_PATH", "./jobs/jobs.sqlite"),
+                lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+                max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+                retention_seconds=float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 86400))),
+            )
+        return _job_queue
+
+
+async def close_job_queue() -> None:
+    """Close the process-wide job queue, if it was opened."""
+    global _job_queue
+    async with _job_queue_lock:
+        if _job_queue is not None:
+            await _job_queue.aclose()
+            _job_queue = None
@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+# Format of the service's log lines, as written by `utils.setup_logger`
+LOG_FORMAT = "[%(asctime)s] [%(levelname)s] %(name)s - %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class Payload:
+    """
+    A large log argument: a message, a state or an answer.
+
+    It is rendered when the record is formatted, on the listener thread, and truncated to
+    `max_chars`. With `as_json` the value is dumped as JSON instead of `str`. The value is read
+    after the logging call returns, so only pass objects that are no longer modified.
+    """
+
+    __slots__ = ("value", "as_json", "max_chars", "sampled")
+
+    def __init__(self, value: Any, as_json: bool = False, max_chars: int = 2000):
+        self.value = value
+        self.as_json = as_json
+        self.max_chars = max_chars
+        self.sampled = True
+
+    def __str__(self) -> str:
+        if not self.sampled:
+            return "<not sampled>"
+        text = json.dumps(self.value, default=str) if self.as_json else str(self.value)
+        if len(text) <= self.max_chars:
+            return text
+        return f"{text[:self.max_chars]}... ({len(text)} chars)"
+
+
+class PayloadSampler(logging.Filter):
+    """
+    Keep the payloads of one record in `every` per message template.
+
+    Records are never dropped: their payload arguments are replaced by "<not sampled>", so the
+    leveled line stays and only the costly rendering is skipped. The first record of each template
+    is sampled.
+    """
+
+    def __init__(self, every: int = 20, max_chars: int = 2000):
+        """
+        Args:
+            every (int): Sampling period of the payloads of a message template; 1 keeps them all.
+            max_chars (int): Characters kept of a sampled payload.
+        """
+        super().__init__()
+        self.every = max(1, every)
+        self.max_chars = max_chars
+        self._seen: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        args = record.args if isinstance(record.args, tuple) else ()
+        payloads = [arg for arg in args if isinstance(arg, Payload)]
+        if payloads:
+            with self._lock:
+                sampled = self._seen[record.msg] % self.every == 0
+                self._seen[record.msg] += 1
+            for payload in payloads:
+                payload.sampled = sampled
+                payload.max_chars = min(payload.max_chars, self.max_chars)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Records with payloads seen, per message template."""
+        with self._lock:
+            return dict(self._seen)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves the formatting to the listener thread.
+
+    `QueueHandler.prepare` formats the message in the logging thread so the record can be pickled;
+    records of this handler stay in the process, so the message and its arguments are formatted by
+    the listener's handlers instead, off the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+# The queued loggers, with their queue handler, former handlers and listener
+_installed: List[Tuple[logging.Logger, LazyQueueHandler, List[logging.Handler], QueueListener]] = []
+_installed_lock = threading.Lock()
+
+
+def install_queue_logging(logger: Optional[logging.Logger] = None, sample_every: Optional[int] = None, max_chars: Optional[int] = None) -> Optional[QueueListener]:
+    """
+    Move a logger's handlers behind a queue, so formatting and log I/O run on a listener thread.
+
+    The logger gets a `LazyQueueHandler` with a `PayloadSampler`; its former handlers are served by
+    a `QueueListener`, which respects their levels. Calling it again on the same logger does nothing.
+
+    Args:
+        logger (logging.Logger): The logger, the root logger if omitted.
+        sample_every (int): Payload sampling period, LOG_PAYLOAD_SAMPLE_EVERY (default 20) if omitted.
+        max_chars (int): Characters kept of a payload, LOG_PAYLOAD_MAX_CHARS (default 2000) if omitted.
+    Returns:
+        Optional[QueueListener]: The started listener, None if the logger was already queued or has no handlers.
+    """
+    logger = logger or logging.getLogger()
+    with _installed_lock:
+        handlers = logger.handlers[:]
+        if not handlers or any(isinstance(handler, LazyQueueHandler) for handler in handlers):
+            return None
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = LazyQueueHandler(log_queue)
+        queue_handler.addFilter(PayloadSampler(
+            every=sample_every if sample_every is not None else int(os.getenv("LOG_PAYLOAD_SAMPLE_EVERY", "20")),
+            max_chars=max_chars if max_chars is not None else int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000")),
+        ))
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+        listener.start()
+        _installed.append((logger, queue_handler, handlers, listener))
+        return listener
+
+
+def effective_handlers(logger: logging.Logger) -> List[logging.Handler]:
+    """The logger's handlers, with the handlers served behind its queue in place of the queue handler."""
+    with _installed_lock:
+        queued = {id(queue_handler): handlers for _, queue_handler, handlers, _ in _installed}
+    return [handler for own in logger.handlers for handler in queued.get(id(own), [own])]
+
+
+def configure_service_logging() -> Optional[QueueListener]:
+    """
+    Set up the service's logging: LOG_LEVEL (default INFO) on the root logger, a stdout handler if
+    the host configured none, and the queue in front of the handlers (see `install_queue_logging`).
+
+    Returns:
+        Optional[QueueListener]: The started listener, None if the root logger was already queued.
+    """
+    root = logging.getLogger()
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+        root.addHandler(handler)
+    return install_queue_logging(root)
+
+
+def stop_queue_logging() -> None:
+    """Flush the queued records, stop the listeners and give the loggers their handlers back, e.g. on shutdown."""
+    with _installed_lock:
+        while _installed:
+            logger, queue_handler, handlers, listener = _installed.pop()
+            logger.removeHandler(queue_handler)
+            listener.stop()
+            for handler in handlers:
+                logger.addHandler(handler)
@@ -2,27 +2,31 @@
 
 import json 
 import os
+import time
 from logging import Logger
 import logging
-import pandas as pd # type: ignore
 from datetime import datetime
-from typing import Dict, Any, Union, Tuple, List
+from typing import Dict, Any, Union, Tuple, List, TYPE_CHECKING
 from dotenv import load_dotenv
-from google.cloud import secretmanager, storage
-from google.api_core.exceptions import NotFound, PermissionDenied
 # from yolo.yolo_utils import yolo_inference_filter
 import subprocess 
 from typing import Set
-from google.cloud.exceptions import GoogleCloudError
-from google.cloud import storage
 from pathlib import Path
+from gen_utils.log_queue import effective_handlers, install_queue_logging
 
-def configure_logging(id:str) -> Logger:
+# pandas and the Google Cloud clients are slow to import: they are imported in the functions using them
+if TYPE_CHECKING:
+    import pandas as pd # type: ignore
+    from google.cloud import storage
+
+def configure_logging(id:str, queued:bool=False) -> Logger:
     """
     Configure logging for parser run.
     
     Args:
         id: Run job id for parser.
+        queued: Write the log file from a listener thread, behind a queue, so logging never blocks
+            the caller (see `gen_utils.log_queue.install_queue_logging`).
     """
     # Get current timestamp
     timestamp = datetime.now().isoformat()
@@ -52,6 +56,10 @@ def configure_logging(id:str) -> Logger:
         file_handler.setFormatter(formatter)
         logger.addHandler(file_handler)
 
+    if queued:
+        install_queue_logging(logging.getLogger())
+        install_queue_logging(logger)
+
     return logger
 
 
@@ -72,13 +80,21 @@ def read_text_file(file_path:str) -> str:
     return output_string
 
 
-def retrieve_secret(secret_name: str, project_id: str) -> dict:
+# Secrets already retrieved, keyed by (project_id, secret_name), with the time they were fetched
+_secret_cache: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+
+
+def retrieve_secret(secret_name: str, project_id: str, refresh: bool = False) -> dict:
     """
     Retrieve a secret from GCP Secret Manager and parse it as a dictionary, loading it in as environment variables.
 
+    Secrets are cached for SECRET_CACHE_TTL_SECONDS (default 3600) so requests do not call Secret
+    Manager again once the secret has been resolved, e.g. during the start-up warm-up.
+
     Args:
         secret_name (str): The name of the secret.
         project_id (str): The GCP project ID.
+        refresh (bool): Fetch the secret even if it is cached.
 
     Returns:
         dict: A dictionary containing the secret's key-value pairs.
@@ -86,18 +102,26 @@ def retrieve_secret(secret_name: str, project_id: str) -> dict:
     # Get logger
     logger = logging.getLogger(__name__)
 
-    # Create a Secret Manager client
-    client = secretmanager.SecretManagerServiceClient()
+    cached = _secret_cache.get((project_id, secret_name))
+    ttl = float(os.getenv("SECRET_CACHE_TTL_SECONDS", "3600"))
+    if cached is not None and not refresh and time.monotonic() - cached[0] < ttl:
+        secret_dict = cached[1]
+    else:
+        # Create a Secret Manager client
+        from google.cloud import secretmanager
+        client = secretmanager.SecretManagerServiceClient()
 
-    # Build the resource name of the secret
-    secret_path = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
+        # Build the resource name of the secret
+        secret_path = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
 
-    # Fetch the secret
-    response = client.access_secret_version(request={"name": secret_path})
-    secret_json = response.payload.data.decode("UTF-8")  # Decode secret value
+        # Fetch the secret
+        response = client.access_secret_version(request={"name": secret_path})
+        secret_json = response.payload.data.decode("UTF-8")  # Decode secret value
 
-    # Parse the JSON secret
-    secret_dict = json.loads(secret_json)
+        # Parse the JSON secret
+        secret_dict = json.loads(secret_json)
+        _secret_cache[(project_id, secret_name)] = (time.monotonic(), secret_dict)
+        logger.info(f"Retrieved secret {secret_name}")
 
     # Set each secret as an environment variable
     for key, value in secret_dict.items():
@@ -209,7 +233,7 @@ def validate_config(config:Dict[str,Any],logger:Logger):
 
 
 
-def save_output_dataframe(output:dict, input_dict:dict) -> pd.DataFrame:
+def save_output_dataframe(output:dict, input_dict:dict) -> "pd.DataFrame":
     """
     Save generated output dataframe from parsing output.
 
@@ -220,6 +244,8 @@ def save_output_dataframe(output:dict, input_dict:dict) -> pd.DataFrame:
         df (pd.DataFrame): Dataframe of parser output.
     
     """
+    import pandas as pd # type: ignore
+
     # Check for output variable data type
     assert isinstance(output, dict), f"Expected a dictionary, but got {type(output).__name__}"
 
@@ -278,6 +304,8 @@ def initialize_environment_variables(secret_name: str, project_id: str, logger:L
     Returns:
         dict: A dictionary containing the secret's key-value pairs.
     """
+    from google.cloud import secretmanager
+
     try:
         # Attempt to retrieve secrets from GCP
         retrieve_secret(secret_name, project_id)
@@ -296,7 +324,7 @@ def initialize_environment_variables(secret_name: str, project_id: str, logger:L
 
 
 def safe_blob_download(
-        blob: storage.Blob, 
+        blob: "storage.Blob", 
         download_file_prefix: str,
         source_blob_name: str
     ) -> str:
@@ -310,6 +338,8 @@ def safe_blob_download(
     Returns:
         local_filename: The file path where the blob was downloaded.
     """
+    from google.api_core.exceptions import NotFound, PermissionDenied
+
     try:
         # Download the file
         local_filename = os.path.join(download_file_prefix, os.path.basename(blob.name))
@@ -347,6 +377,9 @@ def upload_images_to_bucket(local_folder: str, bucket_name: str, destination_fol
         FileNotFoundError: If the provided local folder does not exist.
         GoogleCloudError: If an error occurs during the upload to GCP.
     """
+    from google.cloud import storage
+    from google.cloud.exceptions import GoogleCloudError
+
     # Check if local folder exists
     if not os.path.exists(local_folder):
         raise FileNotFoundError(f"Local folder '{local_folder}' does not exist.")
@@ -398,6 +431,8 @@ def download_images_from_gcs(
         enable_cloud_logging: Boolean flag to enable cloud logging.
         gcp_upload_path: Path to the GCP bucket for uploading logs.
     """
+    from google.cloud import storage
+
     # Initialize GCS client
     client = storage.Client()
     
@@ -464,7 +499,8 @@ def download_images_from_gcs(
 
 def get_logger_filepath(logger: logging.Logger) -> str:
     """
-    Retrieve the file path from the first FileHandler attached to the given logger.
+    Retrieve the file path from the first FileHandler attached to the given logger, including a
+    FileHandler served behind a queue (see `configure_logging(queued=True)`).
 
     Args:
         logger (logging.Logger): The logger instance.
@@ -472,7 +508,7 @@ def get_logger_filepath(logger: logging.Logger) -> str:
     Returns:
         str: The file path of the log file, or an empty string if no FileHandler is found.
     """
-    for handler in logger.handlers:
+    for handler in effective_handlers(logger):
         if isinstance(handler, logging.FileHandler):
             return handler.baseFilename
     return ""
@@ -496,6 +532,9 @@ def upload_file_to_bucket(source: str, bucket_name: str, destination_blob_name:
         FileNotFoundError: If is_content is False and the local file does not exist.
         GoogleCloudError: If an error occurs during the upload process.
     """
+    from google.cloud import storage
+    from google.cloud.exceptions import GoogleCloudError
+
     logger = logging.getLogger(__name__)
     client = storage.Client()
     bucket = client.bucket(bucket_name)
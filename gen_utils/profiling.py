@@ -0,0 +1,266 @@
+import asyncio
+import contextvars
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# Header carrying the admin token that turns profiling on for a request
+PROFILE_HEADER = "X-Profile-Token"
+
+# Set inside a profiled request; tasks created under it inherit it and are put on its timeline
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("current_profile", default=None)
+
+
+def profiling_requested(token: Optional[str]) -> bool:
+    """
+    Whether a request asked to be profiled.
+
+    Profiling is admin-only: the token must equal PROFILE_ADMIN_TOKEN. Without that variable,
+    profiling is disabled.
+
+    Args:
+        token (str): The value of the request's PROFILE_HEADER, if any.
+    """
+    admin_token = os.getenv("PROFILE_ADMIN_TOKEN")
+    return bool(token and admin_token) and hmac.compare_digest(token, admin_token)
+
+
+def frame_label(code: Any) -> str:
+    """Label of a stack frame in the folded stacks: the function and where it is defined."""
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Sampling profiler of one thread.
+
+    A daemon thread reads the target thread's stack every `interval` seconds and counts the stacks,
+    folded root first ("a;b;c"), the input format of flamegraph.pl and speedscope. While the target
+    thread holds the GIL, the sampler only gets to run at the interpreter's switch interval, so each
+    sample is weighted by the time elapsed since the previous one, in `interval` units: busy code is
+    not under-represented. Samples where the event loop waits in its selector are idle time: the loop
+    has nothing to run and waits on upstream I/O (or timers).
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        """
+        Args:
+            thread_id (int): The thread to sample, normally the event loop's.
+            interval (float): Seconds between two samples.
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.weight = 0
+        self.idle_weight = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        last_sample_at = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            weight = max(1, round((now - last_sample_at) / self.interval))
+            last_sample_at = now
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            self.samples += 1
+            self.weight += weight
+            if labels[0].startswith(("EpollSelector.select", "KqueueSelector.select", "SelectSelector.select", "PollSelector.select")):
+                self.idle_weight += weight
+            self.stacks[";".join(reversed(labels))] += weight
+
+    def folded(self) -> str:
+        """The sampled stacks in folded format, one "stack weight" line each."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """
+    Profile of one request: the sampled stacks of the event loop thread and the timeline of the
+    asyncio tasks the request created.
+
+    The sampler sees everything the loop runs, including other requests served at the same time;
+    the timeline only holds the profiled request's tasks.
+    """
+
+    def __init__(self, name: str, interval: float = 0.005):
+        """
+        Args:
+            name (str): What is profiled, e.g. the endpoint.
+            interval (float): Seconds between two stack samples.
+        """
+        self.profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.tasks: List[Dict[str, Any]] = []
+        # Paths of the written files, see `write`
+        self.files: Dict[str, str] = {}
+
+    def add_task(self, task: asyncio.Task) -> None:
+        """Put a task on the timeline, from its creation to its completion."""
+        coro = task.get_coro()
+        entry = {
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", type(coro).__name__),
+            "start": time.perf_counter(),
+            "end": None,
+            "state": "pending",
+        }
+        self.tasks.append(entry)
+
+        def done(task: asyncio.Task) -> None:
+            entry["end"] = time.perf_counter()
+            entry["state"] = "cancelled" if task.cancelled() else "failed" if task.exception() is not None else "done"
+
+        task.add_done_callback(done)
+
+    def timeline(self) -> Dict[str, Any]:
+        """
+        The task timeline in the Chrome trace event format (chrome://tracing, Perfetto, speedscope).
+
+        Overlapping tasks are laid out on separate lanes; tasks still pending when the request ended
+        run until its end.
+        """
+        events = [{"name": self.name, "ph": "X", "pid": 1, "tid": 0, "ts": 0,
+                   "dur": round((self.finished_at - self.started_at) * 1e6)}]
+        lane_ends: List[float] = []
+        for task in sorted(self.tasks, key=lambda task: task["start"]):
+            end = task["end"] if task["end"] is not None else self.finished_at
+            lane = next((n for n, lane_end in enumerate(lane_ends) if lane_end <= task["start"]), len(lane_ends))
+            if lane == len(lane_ends):
+                lane_ends.append(end)
+            else:
+                lane_ends[lane] = end
+            events.append({
+                "name": task["coroutine"],
+                "ph": "X",
+                "pid": 1,
+                "tid": lane + 1,
+                "ts": round((task["start"] - self.started_at) * 1e6),
+                "dur": round((end - task["start"]) * 1e6),
+                "args": {"task": task["name"], "state": task["state"]},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"profile_id": self.profile_id, "name": self.name}}
+
+    def summary(self) -> Dict[str, Any]:
+        """The profile's id, duration, sample count and the share of the sampled time the loop was idle."""
+        sampler = self.sampler
+        return {
+            "profile_id": self.profile_id,
+            "name": self.name,
+            "seconds": round(self.finished_at - self.started_at, 3),
+            "samples": sampler.samples,
+            "loop_idle_ratio": round(sampler.idle_weight / sampler.weight, 3) if sampler.weight else None,
+            "tasks": len(self.tasks),
+        }
+
+    def write(self, profile_dir: str) -> Dict[str, str]:
+        """
+        Write the profile's files.
+
+        Returns:
+            Dict[str, str]: The paths of the folded stacks (flame graph), the task timeline and the summary.
+        """
+        directory = Path(profile_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = {
+            "flamegraph": directory / f"{self.profile_id}.folded",
+            "timeline": directory / f"{self.profile_id}.timeline.json",
+            "summary": directory / f"{self.profile_id}.json",
+        }
+        paths["flamegraph"].write_text(self.sampler.folded(), encoding="utf-8")
+        paths["timeline"].write_text(json.dumps(self.timeline()), encoding="utf-8")
+        paths["summary"].write_text(json.dumps(self.summary(), indent=2), encoding="utf-8")
+        return {kind: str(path) for kind, path in paths.items()}
+
+
+_profiled_loops: Dict[asyncio.AbstractEventLoop, List[Any]] = {}
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    # Wrap the loop's task factory while at least one request is profiled on it
+    entry = _profiled_loops.get(loop)
+    if entry is not None:
+        entry[1] += 1
+        return
+    previous = loop.get_task_factory()
+
+    def task_factory(loop, coro, context=None):
+        kwargs = {"context": context} if context is not None else {}
+        task = previous(loop, coro, **kwargs) if previous is not None else asyncio.Task(coro, loop=loop, **kwargs)
+        profile = (context.get(_current_profile) if context is not None else _current_profile.get())
+        if profile is not None:
+            profile.add_task(task)
+        return task
+
+    loop.set_task_factory(task_factory)
+    _profiled_loops[loop] = [previous, 1]
+
+
+def _uninstall_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    entry = _profiled_loops[loop]
+    entry[1] -= 1
+    if entry[1] == 0:
+        loop.set_task_factory(entry[0])
+        del _profiled_loops[loop]
+
+
+@asynccontextmanager
+async def profile_request(name: str) -> AsyncIterator[RequestProfile]:
+    """
+    Profile the work done inside the block.
+
+    Runs a sampling profiler on the event loop thread and records the asyncio tasks created inside
+    the block, then writes the profile to PROFILES_DIR (default ./profiles): the folded stacks
+    (`<id>.folded`, for flamegraph.pl or speedscope), the task timeline (`<id>.timeline.json`, Chrome
+    trace format) and a summary (`<id>.json`). Only entered for requests that asked for it (see
+    `profiling_requested`), so unprofiled requests pay nothing.
+
+    Configured with environment variables:
+        - PROFILES_DIR: Directory of the profiles (default ./profiles).
+        - PROFILE_SAMPLE_INTERVAL: Seconds between two stack samples (default 0.005).
+
+    Args:
+        name (str): What is profiled, e.g. the endpoint.
+    Yields:
+        RequestProfile: The profile, complete with its `files` once the block exits.
+    """
+    loop = asyncio.get_running_loop()
+    profile = RequestProfile(name, float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005")))
+    token = _current_profile.set(profile)
+    _install_task_factory(loop)
+    profile.sampler.start()
+    try:
+        yield profile
+    finally:
+        profile.sampler.stop()
+        profile.finished_at = time.perf_counter()
+        _uninstall_task_factory(loop)
+        _current_profile.reset(token)
+        profile.files = await asyncio.to_thread(profile.write, os.getenv("PROFILES_DIR", "./profiles"))
+        logging.getLogger(__name__).info("Request profile written: %s %s", profile.summary(), profile.files)
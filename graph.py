@@ -1,12 +1,20 @@
 import os
-from typing import List, Dict, Any, TypedDict, Annotated, Tuple
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.graph import StateGraph, END
-from langchain.prompts import PromptTemplate
-from tavily import AsyncTavilyClient
+import time
+import asyncio
+import logging
+from typing import List, Dict, Any, TypedDict, Annotated, Tuple, Optional, AsyncIterator
 from pydantic import BaseModel, Field
 from gen_utils.parsing_utils import retrieve_secret
 from langgraph_agent.agent_workflows.SearchAgent import SearchAgent
+from langgraph_agent.agent_workflows.sessions import get_session_store
+from langgraph_agent.agent_workflows.deadlines import new_deadline, run_with_timeout
+from langgraph_agent.structured_output.registry import structured_output_registry
+from langgraph_agent.agent_workflows.direct_answer import answered_directly
+from langgraph_agent.structured_output.streaming import StructuredOutputStream
+from langgraph_agent.tools.tools import preconnect_tavily
+from langgraph_agent.tools.page_fetch import get_page_fetcher
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import MessagesState
 from langgraph.graph import add_messages
 
@@ -14,63 +22,273 @@ from langgraph.graph import add_messages
 # TODO: Implementation of the graph
 
 
-# Execute search workflow
-async def execute_search_workflow(query:str) -> Tuple[Dict[str,Any], SearchAgent]:
-    """ 
-    This function executes a search agent that retrieves information from the web with sources.
-    It uses a structured output format to ensure clarity and correctness in the generated code.
+# Module level so checkpointed final responses can be deserialized on follow-up questions
+class ExampleStructuredOutput(BaseModel):
+    response: str = Field(description="The response from the search agent")
+    sources: List[str] = Field(description="The url sources from the search agent")
+
+class AgentState(MessagesState):
+    # Final structured response from the agent
+    messages: Annotated[list,add_messages]
+    final_response: ExampleStructuredOutput
+
+# Build the output schema, validator and structured-output binding once per process
+structured_output_registry.register(ExampleStructuredOutput)
+
+
+async def build_input_dict(query:str, thread_id:Optional[str]=None) -> Dict[str,Any]:
+    """
+    Build the SearchAgent input dictionary for a query.
+
     Args:
         query (str): The query to be searched.
+        thread_id (str): Optional session thread id.
     Returns:
-        Tuple[Dict[str, Any], searchAgentWorkflow]: A tuple containing the generated code and the agent workflow instance.
+        Dict[str, Any]: The input dictionary.
     """
-    # Retrieve the secrets for the Google Cloud project
-    retrieve_secret(project_id='cd-ds-384118', secret_name='generalized-parser-des')
-
     # Load the system and user prompts from files
     with open('./langgraph_agent/prompts/search_system_prompt.txt', 'r') as f:
         search_system_prompt = f.read()
     with open('./langgraph_agent/prompts/structured_output_agent_prompt.txt', 'r') as f:
         structured_output_agent_prompt = f.read()
         structured_output_agent_prompt = ""
+    with open('./langgraph_agent/prompts/direct_answer_prompt.txt', 'r') as f:
+        direct_answer_prompt = f.read()
 
     # # Extract the attribute from the structured output schema
     # attribute = dict(structured_output.schema()).get("title")
-    class ExampleStructuredOutput(BaseModel):
-        response: str = Field(description="The response from the search agent")
-        sources: List[str] = Field(description="The url sources from the search agent")
-
-    class AgentState(MessagesState):
-        # Final structured response from the agent
-        messages: Annotated[list,add_messages]
-        final_response: ExampleStructuredOutput
-
 
     # Define the input dictionary for the MapperAgentWorkflow
-    input_dict = {
+    return {
         "input_prompt": f'''{query}''',
         "search_agent_prompt":search_system_prompt,
         "agent_state":AgentState,
         "structured_output_class":ExampleStructuredOutput,
-        "structured_output_agent_prompt": structured_output_agent_prompt
+        "structured_output_agent_prompt": structured_output_agent_prompt,
+        "direct_answer_prompt": direct_answer_prompt,
+        "page_fetch_top_k": int(os.getenv("PAGE_FETCH_TOP_K", "0")),
+        # Write the first search turn of simple questions locally, see `SearchAgent.local_first_hop`
+        "query_expansion": os.getenv("QUERY_EXPANSION_ENABLED", "true").lower() == "true",
+        # Search cheaply first and escalate Tavily depth, results and queries when needed, see `EffortController`
+        "search_effort": os.getenv("SEARCH_EFFORT_ENABLED", "true").lower() == "true",
+        # Serve repeated queries of the request from their first result, see `QueryMemo`
+        "query_memo": os.getenv("QUERY_MEMO_ENABLED", "true").lower() == "true",
+        # Race an answer from the model's own knowledge against the search, see `direct_answer.race`
+        "direct_answer_race": os.getenv("DIRECT_ANSWER_RACE_ENABLED", "false").lower() == "true",
+        "direct_answer_min_confidence": float(os.getenv("DIRECT_ANSWER_MIN_CONFIDENCE", "0.85")),
+        "thread_id": thread_id,
+        "session_store": await get_session_store(allowed_types=[ExampleStructuredOutput]) if thread_id else None
     }
 
+
+# Execute search workflow
+async def execute_search_workflow(query:str, thread_id:Optional[str]=None, timeout_seconds:Optional[float]=None) -> Tuple[Dict[str,Any], SearchAgent]:
+    """ 
+    This function executes a search agent that retrieves information from the web with sources.
+    It uses a structured output format to ensure clarity and correctness in the generated code.
+    Args:
+        query (str): The query to be searched.
+        thread_id (str): Optional session thread id. Questions on the same thread are follow-ups
+            that see the checkpointed conversation, including prior search results.
+        timeout_seconds (float): Time budget of the request, SEARCH_DEADLINE_SECONDS if omitted.
+            Searching stops early enough to answer from the results gathered so far.
+    Returns:
+        Tuple[Dict[str, Any], searchAgentWorkflow]: A tuple containing the generated code and the agent workflow instance.
+    Raises:
+        DeadlineExceeded: If even the best-effort answer misses the deadline. The workflow is cancelled.
+    """
+    deadline = new_deadline(timeout_seconds)
+
+    # Retrieve the secrets for the Google Cloud project
+    retrieve_secret(project_id='cd-ds-384118', secret_name='generalized-parser-des')
+
+    input_dict = await build_input_dict(query, thread_id)
+    input_dict["deadline"] = deadline
+
     # Initialize the MapperAgentWorkflow with the input dictionary
     lg = SearchAgent(input_dict)
 
 
-    # Run the workflow (now async)
-    answer = await lg.run()
+    # Run the workflow (now async), cancelling every outstanding task at the deadline
+    answer = await run_with_timeout(lg.run(), deadline - time.monotonic() if deadline else None)
 
 
     return answer.get('final_response'), lg
 
 
-async def run_graph(question: str) -> Dict:
+async def warm_up() -> Dict[str, Any]:
+    """
+    Pay the cold-start costs of the search workflow before the service takes traffic.
+
+    Steps, each timed and bounded by WARMUP_STEP_TIMEOUT seconds (default 30):
+        1. secrets: resolve the Secret Manager secrets, which are then cached.
+        2. compile: initialize the model and compile the graph, with and without sessions.
+        3. connections: open the pooled connections to Azure OpenAI and Tavily.
+        4. synthetic_invocation: run the workflow once against a stub model, so LangGraph and
+           Pydantic build their runtime structures without calling the LLM.
+    A failed step is logged and reported; the remaining steps still run.
+
+    Returns:
+        Dict[str, Any]: The duration of each step and of the whole warm-up in seconds, and the
+        errors of the failed steps.
+    """
+    logger = logging.getLogger(__name__)
+    step_timeout = float(os.getenv("WARMUP_STEP_TIMEOUT", "30"))
+    report: Dict[str, Any] = {"steps": {}, "errors": {}}
+    started_at = time.perf_counter()
+    agent = SearchAgent(await build_input_dict("warm-up"))
+    agent.create_tools()
+
+    async def compile_graphs():
+        agent.get_graph()
+        session_agent = SearchAgent(await build_input_dict("warm-up", thread_id="warm-up"))
+        session_agent.create_tools()
+        session_agent.get_graph()
+
+    async def open_connections():
+        get_page_fetcher()
+        tasks = [preconnect_tavily()]
+        for models in getattr(agent, "tier_models", {}).values():
+            # Any authenticated call opens the model's keep-alive connection; listing models is free
+            tasks.append(models["model"].root_async_client.models.list())
+        await asyncio.gather(*tasks)
+
+    async def synthetic_invocation():
+        stub_agent = SearchAgent({**await build_input_dict("warm-up"), "query_expansion": False})
+        stub_agent.create_tools()
+        stub_agent.search_model_with_tools = RunnableLambda(lambda messages: AIMessage(content="agent_respond"))
+        stub_agent.model_with_structured_output = RunnableLambda(
+            lambda messages: ExampleStructuredOutput(response="warm-up", sources=[])
+        )
+        await stub_agent.build_graph().ainvoke({"messages": [("human", "warm-up")]}, config=stub_agent.get_run_config())
+
+    async def resolve_secrets():
+        for secret_name in ('generalized-parser-des', 'des-o3'):
+            await asyncio.to_thread(retrieve_secret, project_id='cd-ds-384118', secret_name=secret_name)
+
+    steps = [
+        ("secrets", resolve_secrets),
+        ("compile", compile_graphs),
+        ("connections", open_connections),
+        ("synthetic_invocation", synthetic_invocation),
+    ]
+    for name, step in steps:
+        step_started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), timeout=step_timeout)
+        except Exception as e:
+            report["errors"][name] = f"{type(e).__name__}: {e}"
+            logger.warning("Warm-up step %s failed: %s", name, report["errors"][name])
+        report["steps"][name] = round(time.perf_counter() - step_started_at, 3)
+
+    report["total_seconds"] = round(time.perf_counter() - started_at, 3)
+    logger.info("Warm-up finished in %.3fs: %s", report["total_seconds"], report)
+    return report
+
+
+async def run_graph(question: str, thread_id: Optional[str] = None, timeout_seconds: Optional[float] = None, include_usage: bool = False) -> Dict:
     # TODO: Implementation of the graph execution
 
-    answer, graph_object = await execute_search_workflow(question)
+    # Questions are only checkpointed when the caller opens a session with a thread_id
+    answer, graph_object = await execute_search_workflow(question, thread_id, timeout_seconds)
 
     result = {"final_answer": answer.model_dump()}
+    # Answers from the model's own knowledge carry no search results behind their sources
+    if answered_directly(graph_object.answer):
+        result["unsourced"] = True
+    if thread_id:
+        result["thread_id"] = thread_id
+    # Tokens, Tavily credits and wall time spent on this request
+    if include_usage:
+        result["usage"] = graph_object.usage.summary()
+        if graph_object.query_memo is not None:
+            result["usage"]["query_memo"] = graph_object.query_memo.summary()
     
-    return result
\ No newline at end of file
+    return result
+
+
+def message_text(message: Any) -> str:
+    """Text of a streamed message chunk: its content, or the arguments of its tool calls."""
+    if isinstance(message.content, str) and message.content:
+        return message.content
+    return "".join(chunk.get("args") or "" for chunk in getattr(message, "tool_call_chunks", []))
+
+
+async def stream_graph(question: str, thread_id: Optional[str] = None, timeout_seconds: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the search workflow, yielding events as soon as they are known.
+
+    Events:
+        - {"event": "node", "node": name}: a search step finished.
+        - "delta", "item" and "field_done": parts of the final answer, parsed from the structured
+          output while the model writes it (see `StructuredOutputStream`).
+        - {"event": "final", "final_answer": ...}: the validated final answer, with
+          `"unsourced": true` when the model answered from its own knowledge.
+
+    Args:
+        question (str): The user question.
+        thread_id (str): Optional session thread id.
+        timeout_seconds (float): Time budget of the request, SEARCH_DEADLINE_SECONDS if omitted.
+    Yields:
+        Dict[str, Any]: The events.
+    Raises:
+        DeadlineExceeded: If the deadline is reached. The workflow is cancelled.
+    """
+    deadline = new_deadline(timeout_seconds)
+
+    # Retrieve the secrets for the Google Cloud project
+    retrieve_secret(project_id='cd-ds-384118', secret_name='generalized-parser-des')
+
+    input_dict = await build_input_dict(question, thread_id)
+    input_dict["deadline"] = deadline
+    agent = SearchAgent(input_dict)
+    output_stream = StructuredOutputStream(input_dict["structured_output_class"])
+
+    # The graph runs in its own task, so the deadline can cancel it while the caller is busy
+    # writing events out
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def produce():
+        try:
+            async for item in agent.astream(stream_mode=["messages", "updates"]):
+                await queue.put(item)
+            await queue.put(done)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    final_response, unsourced = None, False
+    try:
+        while True:
+            item = await run_with_timeout(queue.get(), deadline - time.monotonic() if deadline else None)
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            mode, chunk = item
+            if mode == "messages":
+                message, metadata = chunk
+                # Only the structured-output pass writes the answer
+                if metadata.get("langgraph_node") == "agent_respond":
+                    for event in output_stream.feed(message_text(message)):
+                        yield event
+            else:
+                for node, update in chunk.items():
+                    # The answer comes from the search loop's last node, or from the race node
+                    if isinstance(update, dict) and "final_response" in update:
+                        final_response = update["final_response"]
+                        unsourced = answered_directly(update)
+                    else:
+                        yield {"event": "node", "node": node}
+    finally:
+        producer.cancel()
+
+    if final_response is None:
+        raise RuntimeError("The workflow ended without a final answer")
+    event = {"event": "final", "final_answer": final_response.model_dump()}
+    if unsourced:
+        event["unsourced"] = True
+    if thread_id:
+        event["thread_id"] = thread_id
+    yield event
@@ -1,6 +1,6 @@
 from langchain_openai import AzureChatOpenAI
 from pydantic import BaseModel, Field
-from typing import Literal, Any, List, Dict, Set, Union, Annotated
+from typing import Literal, Any, List, Dict, Set, Union, Annotated, AsyncIterator, Awaitable, Iterator, Optional, TypeVar
 from langchain_core.tools import tool
 from langgraph.graph import MessagesState
 from langgraph.graph import StateGraph, END
@@ -8,6 +8,9 @@ from langgraph.prebuilt import ToolNode
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 from dotenv import load_dotenv
 import os
+import asyncio
+import threading
+import logging
 from openai import AzureOpenAI
 from pydantic import BaseModel
 # from langfuse import Langfuse
@@ -16,18 +19,81 @@ from langgraph.graph.message import add_messages
 from typing_extensions import TypedDict
 from langgraph.checkpoint.memory import MemorySaver
 from gen_utils.parsing_utils import retrieve_secret
+from langgraph_agent.agent_workflows.http_pool import get_model_http_client
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
     name: str
     birthday: str
 
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """
+    An event loop running in a dedicated daemon thread.
+
+    Synchronous callers submit coroutines to it and wait for their results, so async agents can be
+    used from scripts, notebooks and worker threads without creating a new event loop per call and
+    without ever blocking the caller's own event loop.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The background loop, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="agent-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run(self, awaitable: Awaitable[T]) -> T:
+        """
+        Run a coroutine on the background loop and wait for its result.
+
+        Raises:
+            RuntimeError: If called from a thread running an event loop, which would block that
+                loop for the whole call: `await` the coroutine there instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise RuntimeError("The sync shim cannot be used from a running event loop, await the async method instead.")
+        return asyncio.run_coroutine_threadsafe(awaitable, self.loop).result()
+
+    def iterate(self, iterator: AsyncIterator[T]) -> Iterator[T]:
+        """Consume an async iterator on the background loop, yielding its items synchronously."""
+        while True:
+            try:
+                yield self.run(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+
+
+# Shared by every agent's sync shim
+background_loop = BackgroundLoop()
+
+
 class LangGraphAgentSystem():
     """
         A class to support a minimal implementation of a LangGraph Agentic Framework.
 
         This class implements a minimal agentic framework. 
         A single agent with a tool that routes to another downstream agent that does pydantic structured output.
+
+        The framework is async-first: nodes call the models with `ainvoke` and the graph is executed
+        with `astream`, so agents never block the event loop of the server running them. Synchronous
+        callers use `run_sync` and `stream_sync`, which run the async methods on a shared background loop.
     """
 
     def __init__(self, input_dict:dict):
@@ -91,6 +157,8 @@ class LangGraphAgentSystem():
             openai_api_version="2024-08-01-preview",
             openai_api_key=AZURE_OPENAI_API_KEY,
             deployment_name=AZURE_OPENAI_DEPLOYMENT_NAME,
+            # Share warm keep-alive connections across models and requests
+            http_async_client=get_model_http_client(),
             temperature=0.0,  # For deterministic output
         )
 
@@ -139,7 +207,7 @@ class LangGraphAgentSystem():
         self.tools = tools
 
 
-    def call_model(self, state: MessagesState, agent_prompt:str="agent_prompt") -> Dict[str, List[SystemMessage]]:
+    async def call_model(self, state: MessagesState, agent_prompt:str="agent_prompt") -> Dict[str, List[SystemMessage]]:
         """
         Calls the model with the provided state and appends the system message.
 
@@ -161,7 +229,7 @@ class LangGraphAgentSystem():
             state = {
                 "messages": [HumanMessage(content="What's the weather in SF?")]
             }
-            result = call_model(state)
+            result = await call_model(state)
             print(result["messages"])
         """
         
@@ -171,14 +239,14 @@ class LangGraphAgentSystem():
         ))
 
         # Call the model with the updated message state
-        response = self.model_with_tools.invoke(state["messages"])
+        response = await self.model_with_tools.ainvoke(state["messages"])
         
         # Return the updated messages as a list
         return {"messages": [response]}
 
 
 
-    def respond(self, state: MessagesState) -> Dict[str, Union[str, HumanMessage]]:
+    async def respond(self, state: MessagesState) -> Dict[str, Union[str, HumanMessage]]:
         """
         Responds to the user by processing the last tool message and invoking the model
         with structured output to maintain consistent formatting.
@@ -196,16 +264,16 @@ class LangGraphAgentSystem():
                 or an exit message if no tool was called.
         """
         # Check if the third-to-last message is a ToolMessage
-        if isinstance(state['messages'][-3], ToolMessage):
+        if len(state['messages']) >= 3 and isinstance(state['messages'][-3], ToolMessage):
             # Convert the ToolMessage content to a HumanMessage
-            response = self.model_with_structured_output.invoke(
+            response = await self.model_with_structured_output.ainvoke(
                 [HumanMessage(content=state["messages"][-3].content)]
             )
             # Return the final structured response
             return {"final_response": response}
         else:
             # Exit gracefully if no ToolMessage is found
-            print("Tool was not called")
+            logging.getLogger(__name__).warning("Tool was not called")
             return {"final_response": "Exit: tool not called"}
 
 
@@ -233,15 +301,10 @@ class LangGraphAgentSystem():
             return "respond"
         else:
             return "continue"
-            
-    def create_workflow(self) -> Any:
-        """
-        Creates and executes a workflow for managing the conversation flow between an agent, tool interactions, 
-        and user responses.
 
-        This method defines a `StateGraph` to handle the conversation workflow, including conditional transitions
-        based on whether the agent should continue processing or respond to the user. It compiles the workflow 
-        and invokes it with the input message, returning the final result.
+    def build_graph(self) -> Any:
+        """
+        Builds and compiles the workflow graph.
 
         Workflow Overview:
             - Nodes:
@@ -256,11 +319,8 @@ class LangGraphAgentSystem():
                 - From "tools", transitions back to "agent".
                 - From "respond", ends the workflow (`END`).
 
-        Parameters:
-            None
-
         Returns:
-            Any: The output of the workflow after invoking the graph, typically the final response.
+            Any: The compiled graph.
         """
         # Define a new graph
         workflow = StateGraph(self.input_dict['agent_state'])
@@ -287,31 +347,73 @@ class LangGraphAgentSystem():
         workflow.add_edge("tools", "agent")  # Cycle back to "agent" from "tools"
         workflow.add_edge("respond", END)   # End the workflow from "respond"
 
-        memory = MemorySaver()
         # Compile the workflow into a graph
-        graph = workflow.compile()
+        return workflow.compile()
+
+    def get_graph(self) -> Any:
+        """
+        Initializes the model and returns the compiled graph. Subclasses may cache compiled graphs.
+
+        Returns:
+            Any: The compiled graph.
+        """
+        self.initialize_model()
+        return self.build_graph()
 
-        # Invoke the graph with the initial input and callback handler
-        answer = graph.invoke(
-            input={"messages": [("human", self.input_dict['input_prompt'])]}
+    def get_run_config(self) -> Dict[str, Any]:
+        """
+        Builds the runnable config passed to the graph execution.
+
+        Returns:
+            Dict[str, Any]: The runnable config.
+        """
+        return {}
+
+    async def astream(self, stream_mode: str = "updates") -> AsyncIterator[Any]:
+        """
+        Executes the workflow on the input prompt, yielding its progress.
+
+        Parameters:
+            stream_mode (str): The LangGraph stream mode: "updates" yields each node's output,
+                "values" yields the full state after each step.
+
+        Yields:
+            Any: The stream chunks of the graph execution.
+        """
+        if getattr(self, "graph", None) is None:
+            self.create_tools()
+            self.graph = self.get_graph()
+
+        async for chunk in self.graph.astream(
+            input={"messages": [("human", self.input_dict['input_prompt'])]},
+            config=self.get_run_config(),
+            stream_mode=stream_mode,
             # config={"callbacks": [self.langfuse_handler]}
-        )
+        ):
+            yield chunk
 
-        # Save graph
-        self.graph = graph
+    async def create_workflow(self) -> Any:
+        """
+        Executes the workflow on the input prompt and returns its final state.
 
+        Returns:
+            Any: The output of the workflow after invoking the graph, typically the final response.
+        """
+        answer = None
+        async for answer in self.astream(stream_mode="values"):
+            pass
         return answer
 
 
-    def run(self) -> Any:
+    async def run(self) -> Any:
         """
         Executes the main workflow for the agent, including tool creation, model initialization, 
         and workflow execution.
 
         This method performs the following steps:
         1. Creates tools using `create_tools`.
-        2. Initializes the model with monitoring and configuration using `initialize_model`.
-        3. Builds and executes the conversation workflow using `create_workflow`.
+        2. Initializes the model and compiles the workflow using `get_graph`.
+        3. Executes the conversation workflow using `create_workflow`.
         4. Stores the final output of the workflow in `self.answer`.
 
         Returns:
@@ -325,22 +427,44 @@ class LangGraphAgentSystem():
             encounter an error.
 
         Example:
-            result = run()
+            result = await agent.run()
             print(result)  # Outputs the final workflow response.
         """
         # Step 1: Create tools
         self.create_tools()
 
-        # Step 2: Initialize the model
-        self.initialize_model()
+        # Step 2: Initialize the model and compile the workflow
+        self.graph = self.get_graph()
 
-        # Step 3: Create and execute the workflow
-        answer = self.create_workflow()
+        # Step 3: Execute the workflow
+        answer = await self.create_workflow()
 
         # Store the final response
         self.answer = answer
 
         # Return the final response
         return answer
-    
 
+    def run_sync(self) -> Any:
+        """
+        Synchronous version of `run` for callers without an event loop.
+
+        The workflow runs on the shared background loop. Do not call it from async code, which
+        must `await run()` instead.
+
+        Returns:
+            Any: The final response from the executed workflow.
+        """
+        return background_loop.run(self.run())
+
+    def stream_sync(self, stream_mode: str = "updates") -> Iterator[Any]:
+        """
+        Synchronous version of `astream` for callers without an event loop.
+
+        Parameters:
+            stream_mode (str): The LangGraph stream mode.
+
+        Yields:
+            Any: The stream chunks of the graph execution.
+        """
+        return background_loop.iterate(self.astream(stream_mode=stream_mode))
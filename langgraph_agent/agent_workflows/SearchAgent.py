@@ -2,33 +2,84 @@ from __future__ import annotations
 from langgraph_agent.agent_workflows.LangGraphAgent import LangGraphAgentSystem
 from langchain_openai import AzureChatOpenAI
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import MessagesState
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage, AIMessage
 from dotenv import load_dotenv
 import os
+import time
+import asyncio
+import logging
 # from langfuse import Langfuse
 # from langfuse.callback import CallbackHandler
-import pandas as pd
 from typing import Optional, Dict, Any
 from gen_utils.parsing_utils import retrieve_secret
-import pandas as pd 
 from typing import Union
 import os
-import pandas as pd
-import numpy as np
 from typing import Dict
-from langgraph.checkpoint.memory import MemorySaver
-from typing import List
+from typing import List, Tuple, AsyncIterator
 # from langgraph_agent.structured_output.structured_outputs import OutputResponse, AgentState
-from langgraph_agent.tools.tools import web_search
-from phoenix.otel import register
+from langgraph_agent.tools.tools import web_search, get_local_index, get_tavily_client, condense_tavily_response, condensed_view
+from langgraph_agent.tools.blob_store import blob_ref, get_blob_store, materialize_tool_messages
+from langgraph_agent.tools.page_fetch import get_page_fetcher, select_top_urls
+from langgraph_agent.tools.dedup import dedup_responses
+from gen_utils.log_queue import Payload
+from langgraph_agent.tools.query_memo import QueryMemo, get_query_memo_totals
+from langgraph_agent.tools.search_effort import EffortConfig, EffortController, EffortLevel, get_search_effort_stats, trim_raw_content
+from langgraph_agent.structured_output.registry import structured_output_registry
+from langgraph_agent.agent_workflows.http_pool import get_model_http_client, on_model_http_client_closed
+from langgraph_agent.agent_workflows.deadlines import DeadlineExceeded, deadline_config, time_is_short, with_deadline
+from langgraph_agent.agent_workflows.model_router import MODEL_TIERS, get_model_router, tier_settings
+from langgraph_agent.agent_workflows.prompt_cache import assemble_messages, get_prompt_cache_stats, static_prefix
+from langgraph_agent.agent_workflows.usage import RequestUsage, get_usage_totals
+from langgraph_agent.agent_workflows.direct_answer import DIRECT_ANSWER_NAME, direct_answer_class, get_race_stats, race
+from langgraph_agent.agent_workflows.query_expansion import expand_question, get_query_expansion_stats, local_tool_call_id, query_expansion_max_words
 # from tools.tools import web_search
 from tavily import AsyncTavilyClient
 
-@tool
-async def web_search(query: List[str]) -> str:
+# Added to the conversation when the deadline cuts the search short
+BEST_EFFORT_MESSAGE = "The time budget for searching is exhausted: answer from the results gathered so far."
+
+# Confidence the direct answer needs to win the race against search, unless the request sets one
+DEFAULT_MIN_CONFIDENCE = 0.85
+
+# Compiled graphs, keyed by `SearchAgent.graph_cache_key`
+_compiled_graphs: Dict[Tuple, Any] = {}
+
+
+def clear_compiled_graphs() -> None:
+    """Drop the compiled graphs and the structured-output bindings, whose models use the closed model HTTP client."""
+    _compiled_graphs.clear()
+    structured_output_registry.clear_bindings()
+
+
+on_model_http_client_closed(clear_compiled_graphs)
+
+_tracer_provider = None
+
+
+def get_tracer_provider():
+    """
+    Register the Phoenix tracer once per process.
+
+    phoenix is imported here rather than at module level since its import (and auto-instrumentation)
+    takes seconds, which would otherwise be paid by every process start.
+    """
+    global _tracer_provider
+    if _tracer_provider is None:
+        from phoenix.otel import register
+
+        _tracer_provider = register(
+            project_name="search-agent", # Default is 'default'
+            endpoint="https://devpoc.compassdigital.io:443/phoenix-arize/v1/traces",
+            auto_instrument=True # Auto-instrument your app based on installed dependencies
+        )
+    return _tracer_provider
+
+@tool(response_format="content_and_artifact")
+async def web_search(query: List[str], config: RunnableConfig) -> Tuple[str, Dict[str, Any]]:
     """
     Perform a web search using the Tavily API.
     Args:
@@ -36,17 +87,120 @@ async def web_search(query: List[str]) -> str:
     Returns:
         str: The results from the Tavily search.
     """
+    # The full results go to the blob store; the ToolMessage keeps a condensed view as its content
+    # and a reference to the blob as its artifact, see `materialize_tool_messages`
     load_dotenv(override=True)
 
-    tavily_client = AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+    tavily_client = get_tavily_client()
+    local_index = get_local_index()
+    configurable = config.get("configurable", {})
+    # The request's token and credit meter, see `SearchAgent.get_run_config`
+    usage: Optional[RequestUsage] = configurable.get("usage")
+    # Start with a cheap search and escalate while the results fall short, see `EffortController`
+    effort = EffortController(query, EffortConfig.from_env()) if configurable.get("search_effort") else None
+    # The request's earlier search results, see `SearchAgent.get_run_config`
+    memo: Optional[QueryMemo] = configurable.get("query_memo")
     
-    responses = []
+    tavily_responses = []
+    # Responses of this call, memoized once it is done: the memo only serves the queries of later calls
+    searched = []
     
-    for q in query:
-        response = await tavily_client.search(q)
-        responses.append(response)
+    skipped_queries = []
+
+    async def search(q: str, level: Optional[EffortLevel] = None, reuse_results: bool = True) -> Dict[str, Any]:
+        if reuse_results:
+            # Serve repeats of a query searched earlier in the request from its first response
+            memoized = memo.lookup(q) if memo is not None else None
+            if memoized is not None:
+                return memoized
+            # Serve queries close to a recent past query from the local index, without calling Tavily
+            served_locally, hits = await asyncio.to_thread(local_index.lookup, q)
+            if served_locally:
+                if usage is not None:
+                    usage.record_search(0.0)
+                response = {"query": q, "results": hits, "served_from": "local_index"}
+                searched.append((q, response))
+                return response
+        # Stop searching once only the time reserved for the final answer is left
+        search_kwargs = level.search_kwargs() if level is not None else {}
+        started_at = time.perf_counter()
+        response = await with_deadline(tavily_client.search(q, **search_kwargs), config, keep_reserve=True)
+        seconds = time.perf_counter() - started_at
+        if usage is not None:
+            usage.record_search(seconds, response, search_kwargs.get("search_depth"))
+        if level is not None:
+            get_search_effort_stats().record_search(level.name, seconds)
+            if level.include_raw_content:
+                trim_raw_content(response, effort.config.raw_content_chars)
+        tavily_responses.append(response)
+        searched.append((q, response))
+        return response
+
+    if effort is None:
+        responses = []
+        for n, q in enumerate(query):
+            try:
+                responses.append(await search(q))
+            except DeadlineExceeded:
+                skipped_queries = list(query[n:])
+                break
+    else:
+        try:
+            for level, batch in effort.batches(can_escalate=lambda: not time_is_short(config)):
+                for q in batch:
+                    # Re-searches of weak queries at a higher level go to Tavily
+                    response = await search(q, level, reuse_results=q not in effort.responses)
+                    # A repeat served by the memo can be re-searched like the search it repeats
+                    effort.record(q, response, None if response.get("served_from") == "local_index" else level)
+        except DeadlineExceeded:
+            skipped_queries = [q for q in effort.queries if q not in effort.responses]
+        get_search_effort_stats().record_call(effort)
+        responses = [effort.responses[q] for q in effort.queries if q in effort.responses]
+
+    if memo is not None:
+        for q, response in searched:
+            memo.store(q, response)
+
+    logging.getLogger(__name__).info("Local index stats: %s", local_index.stats())
+
+    # Index the condensed Tavily results so later questions can be served locally
+    condensed_results = [result for response in tavily_responses for result in condense_tavily_response(response)]
+    await asyncio.to_thread(local_index.add, condensed_results)
+
+    # Paraphrased queries return overlapping results: keep one result per near-duplicate cluster
+    responses = dedup_responses(responses)
+
+    # Results sent by an earlier search of the request are only referenced
+    if memo is not None:
+        responses = memo.mark_provided(responses)
+
+    if skipped_queries:
+        responses.append({"skipped_queries": skipped_queries, "reason": "request deadline reached"})
+
+    # Optional page fetch stage: read the main content of the top-K result pages
+    page_fetch_top_k = int(config.get("configurable", {}).get("page_fetch_top_k", 0))
+    if page_fetch_top_k > 0 and not time_is_short(config):
+        urls = select_top_urls(responses, page_fetch_top_k)
+        try:
+            pages = await with_deadline(get_page_fetcher().fetch_many(urls), config, keep_reserve=True)
+        except DeadlineExceeded:
+            pages = [{"error": "request deadline reached before the pages were fetched"}]
+        return await store_search_results(str({"search_results": responses, "fetched_pages": pages}), responses, pages)
+
+    return await store_search_results(str(responses), responses)
+
+
+async def store_search_results(content: str, responses: List[Dict[str, Any]], pages: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Store the full search results out of band.
 
-    return str(responses)
+    Returns:
+        Tuple[str, Dict[str, Any]]: The condensed view and the blob reference, as the tool's content
+        and artifact.
+    """
+    key = await asyncio.to_thread(get_blob_store().put, content)
+    view = condensed_view(responses, pages, snippet_chars=int(os.getenv("TOOL_RESULT_SNIPPET_CHARS", "300")))
+    return view, blob_ref(key, content)
 
 
 
@@ -83,6 +237,7 @@ class SearchAgent(LangGraphAgentSystem):
         Attributes set:
         - `self.langfuse`: An instance of the Langfuse client for monitoring.
         - `self.langfuse_handler`: A Langfuse callback handler for interaction logging.
+        - `self.model`: The Azure OpenAI model.
         - `self.model_with_tools`: The Azure OpenAI model with tools bound to it.
         - `self.model_with_structured_output`: The Azure OpenAI model with structured output handling.
 
@@ -98,11 +253,7 @@ class SearchAgent(LangGraphAgentSystem):
         retrieve_secret(secret_name='des-o3', project_id='cd-ds-384118')
 
         # # configure the Phoenix tracer
-        tracer_provider = register(
-            project_name="search-agent", # Default is 'default'
-            endpoint="https://devpoc.compassdigital.io:443/phoenix-arize/v1/traces",
-            auto_instrument=True # Auto-instrument your app based on installed dependencies
-        )
+        tracer_provider = get_tracer_provider()
 
         # Load Azure OpenAI API credentials
         AZURE_OPENAI_API_KEY: str = os.getenv("AZURE_OPENAI_API_KEY", "")
@@ -113,29 +264,72 @@ class SearchAgent(LangGraphAgentSystem):
         if not (AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_DEPLOYMENT_NAME):
             raise KeyError("Missing Azure OpenAI API credentials in environment variables.")
 
-        openai_api_version_4o = "2024-08-01-preview"
-        openai_api_version_o3 = "2024-12-01-preview"
-        # Initialize the Azure OpenAI model
-        model = AzureChatOpenAI(
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            openai_api_version=openai_api_version_o3,
-            openai_api_key=AZURE_OPENAI_API_KEY,
-            deployment_name=AZURE_OPENAI_DEPLOYMENT_NAME,
-            # temperature=0.0,  # For deterministic output
-        )
+        # One model per tier: the reasoning deployment (o3) and, if configured, a fast deployment (4o)
+        self.tier_models = {}
+        for tier in MODEL_TIERS:
+            settings = tier_settings(tier)
+            if settings is None:
+                continue
+            http_client = get_model_http_client()
+            model = AzureChatOpenAI(
+                azure_endpoint=settings["endpoint"],
+                openai_api_version=settings["api_version"],
+                openai_api_key=settings["api_key"],
+                deployment_name=settings["deployment"],
+                # Share warm keep-alive connections across models and requests
+                http_async_client=http_client,
+                # temperature=0.0,  # For deterministic output
+            )
+            # The structured-output bindings hold the model: a rotated key or a new HTTP client must not reuse them
+            chat_model_key = (settings["endpoint"], settings["deployment"], settings["api_version"], settings["api_key"], id(http_client))
+            self.tier_models[tier] = {
+                "model": model,
+                "search": model.bind_tools(self.search_tools),
+                # Set up structured output, bound once per deployment and output model. The raw
+                # message is kept for its token usage.
+                "respond": structured_output_registry.bind(
+                    model,
+                    self.input_dict['structured_output_class'],
+                    chat_model_key=chat_model_key,
+                    include_raw=True,
+                ),
+                # The direct-answer branch: the same output model, with a self-assessed confidence
+                "direct": structured_output_registry.bind(
+                    model,
+                    direct_answer_class(self.input_dict['structured_output_class']),
+                    chat_model_key=chat_model_key,
+                    include_raw=True,
+                ),
+            }
 
-        # Bind tools to the model
-        self.model_with_tools = model.bind_tools(self.tools)
+        # Assign the reasoning tier's models to instance attributes
+        reasoning = self.tier_models["reasoning"]
+        self.model = reasoning["model"]
+        self.model_with_tools = reasoning["model"].bind_tools(self.tools)
+        self.search_model_with_tools = reasoning["search"]
+        self.model_with_structured_output = reasoning["respond"]
+        self.model_with_direct_answer = self.tier_models.get("fast", reasoning)["direct"]
 
-        # Set up structured output
-        model_with_structured_output = model.with_structured_output(self.input_dict['structured_output_class'])
+    def tier_model(self, tier: str, stage: str) -> Any:
+        """
+        Return the model of a tier for a stage of the workflow.
 
-        # Assign models to instance attributes
-        self.search_model_with_tools = model.bind_tools(self.search_tools)
-        self.model_with_structured_output = model_with_structured_output
+        Args:
+            tier (str): "fast" or "reasoning".
+            stage (str): "search" for the model with the search tools bound, "respond" for the
+                structured-output model, "direct" for the direct-answer model.
+        Returns:
+            Any: The model, the instance attribute's if the tier has no deployment.
+        """
+        models = getattr(self, "tier_models", {}).get(tier)
+        if models is not None:
+            return models[stage]
+        if stage == "direct":
+            return self.model_with_direct_answer
+        return self.search_model_with_tools if stage == "search" else self.model_with_structured_output
 
 
-    async def respond(self, state: MessagesState) -> Dict[str, Union[str, HumanMessage]]:
+    async def respond(self, state: MessagesState, model: Any = "", tier: Optional[str] = None, usage: Optional[RequestUsage] = None) -> Dict[str, Union[str, HumanMessage]]:
         """
         Responds to the user by processing the last tool message and invoking the model
         with structured output to maintain consistent formatting.
@@ -146,15 +340,31 @@ class SearchAgent(LangGraphAgentSystem):
 
         Parameters:
             state (MessagesState): The current state of the conversation, including a list of messages.
+            model (Any): The structured-output model, `self.model_with_structured_output` if omitted.
+            tier (str): The model's tier, under which the call is recorded in the router metrics.
+            usage (RequestUsage): The request's usage, in which the call is recorded.
 
         Returns:
             Dict[str, Union[str, HumanMessage]]: A dictionary containing the final response:
                 - "final_response": A structured response from the model if a tool was invoked,
                 or an exit message if no tool was called.
         """
-        response = await self.model_with_structured_output.ainvoke(
-            state['messages']
+        if model == "":
+            model = self.model_with_structured_output
+        started_at = time.perf_counter()
+        # The answer is written from the full search results, loaded from the blob store for this call only
+        conversation = await asyncio.to_thread(materialize_tool_messages, state['messages'])
+        # Same static prefix as the search turns, then the conversation and search results
+        response = await model.ainvoke(
+            assemble_messages(self.prompt_prefix('search_agent_prompt'), conversation)
         )
+        raw = None
+        # Models bound with include_raw return the raw message next to the parsed output
+        if isinstance(response, dict) and "parsed" in response:
+            if response.get("parsing_error") is not None:
+                raise response["parsing_error"]
+            raw, response = response["raw"], response["parsed"]
+        self.record_model_call("respond", tier, time.perf_counter() - started_at, getattr(raw, "usage_metadata", None), usage)
         # Return the final structured response
         return {"final_response": response}
 
@@ -170,27 +380,32 @@ class SearchAgent(LangGraphAgentSystem):
         """
         messages = state["messages"]
         last_msg = str(messages[-1])
-        print("search Agent: ", last_msg)
         # 2) No tool run yet, inspect the model’s text to see intent
         text = last_msg
         if "web_search" in text:
-            # model is asking to query PMA → run search_tools
-            return "search_tools"
-        if "agent_respond" in text:
-            # model is asking to scrape size → hand off to scraper_agent
-            return "agent_respond"
-        return "agent_respond"
+            # model is asking to search → run search_tools
+            route = "search_tools"
+        else:
+            # model is asking to respond, or named no tool → hand off to agent_respond
+            route = "agent_respond"
+        # The message is only rendered for sampled records, on the log listener thread
+        logging.getLogger(__name__).debug("search_agent route=%s message=%s", route, Payload(messages[-1]))
+        return route
     
 
-    async def call_model(self, state: MessagesState, agent_prompt:str="agent_prompt", model:Any="") -> Dict[str, List[SystemMessage]]:
+    async def call_model(self, state: MessagesState, agent_prompt:str="agent_prompt", model:Any="", tier:Optional[str]=None, usage:Optional[RequestUsage]=None) -> Dict[str, List[SystemMessage]]:
         """
-        Calls the model with the provided state and appends the system message.
+        Calls the model on the static prompt prefix followed by the conversation.
 
-        This method appends a system message containing the agent's prompt to the existing message state,
-        invokes the model to generate a response, and returns the updated state.
+        The agent's system prompt and few-shot examples are placed before the conversation (see
+        `prompt_prefix`), the model is invoked, and its response is returned as a state update.
 
         Parameters:
             state (MessagesState): The current state of the conversation, including a list of messages.
+            agent_prompt (str): The input_dict key of the system prompt.
+            model (Any): The model to call, `self.model_with_tools` if omitted.
+            tier (str): The model's tier, under which the call is recorded in the router metrics.
+            usage (RequestUsage): The request's usage, in which the call is recorded.
 
         Returns:
             Dict[str, List[SystemMessage]]: A dictionary containing the updated messages, 
@@ -207,115 +422,349 @@ class SearchAgent(LangGraphAgentSystem):
             result = call_model(state)
             print(result["messages"])
         """
+        started_at = time.perf_counter()
         
-        # Append the agent's system message to the conversation
-        if SystemMessage(content=self.input_dict[agent_prompt]) not in state['messages']:
-            state['messages'].append(SystemMessage(
-                content=self.input_dict[agent_prompt]
-            ))
+        # The static system prompt and few-shots lead, so the provider's prompt cache matches them
+        messages = assemble_messages(self.prompt_prefix(agent_prompt), state['messages'])
 
         if model == "":
-            # Call the model with the updated message state (async)
-            response = await self.model_with_tools.ainvoke(state["messages"])
+            # Call the model with the assembled messages (async)
+            response = await self.model_with_tools.ainvoke(messages)
         else:
-            # Call the model with the updated message state (async)
-            response = await model.ainvoke(state["messages"])
+            # Call the model with the assembled messages (async)
+            response = await model.ainvoke(messages)
+        self.record_model_call("search", tier, time.perf_counter() - started_at, getattr(response, "usage_metadata", None), usage)
         
         # Return the updated messages as a list
         return {"messages": [response]}
 
     
-    async def create_workflow(self) -> Any:
+    async def direct_answer(self, state: MessagesState, model: Any = "", tier: Optional[str] = None, usage: Optional[RequestUsage] = None) -> Any:
+        """
+        Answers the question from the model's own knowledge, without searching.
+
+        Parameters:
+            state (MessagesState): The current state of the conversation, ending with the question.
+            model (Any): The direct-answer model, `self.model_with_direct_answer` if omitted.
+            tier (str): The model's tier, under which the call is recorded in the router metrics.
+            usage (RequestUsage): The request's usage, in which the call is recorded.
+
+        Returns:
+            Any: The `direct_answer_class` instance: the answer and the model's confidence in it.
+        """
+        if model == "":
+            model = self.model_with_direct_answer
+        started_at = time.perf_counter()
+        prefix = static_prefix(self.input_dict['direct_answer_prompt'])
+        response = await model.ainvoke(assemble_messages(prefix, state['messages']))
+        raw = None
+        if isinstance(response, dict) and "parsed" in response:
+            if response.get("parsing_error") is not None:
+                raise response["parsing_error"]
+            raw, response = response["raw"], response["parsed"]
+        self.record_model_call("direct", tier, time.perf_counter() - started_at, getattr(raw, "usage_metadata", None), usage)
+        return response
+
+    def local_first_hop(self, state: MessagesState) -> Optional[Dict[str, List[AIMessage]]]:
+        """
+        Write the first search turn locally, without calling the model.
+
+        For a simple new question, the search queries are written with rules and templates (see
+        `expand_question`) and the web_search call is returned as the model would have returned it.
+        Follow-up questions, whose queries depend on the conversation, and other questions are left
+        to the model. Every outcome is recorded in the query expansion metrics.
+
+        Parameters:
+            state (MessagesState): The current state of the conversation, ending with the question.
+
+        Returns:
+            Optional[Dict[str, List[AIMessage]]]: The state update with the web_search call, or None
+            to call the model.
+        """
+        stats = get_query_expansion_stats()
+        if len(state['messages']) > 1:
+            stats.record_fallback("follow_up")
+            return None
+        question = state['messages'][-1].content
+        plan = expand_question(question, query_expansion_max_words())
+        stats.record_plan(plan)
+        if plan.fallback_reason is not None:
+            return None
+        tool_call = {"name": "web_search", "args": {"query": plan.queries}, "id": local_tool_call_id(question)}
+        return {"messages": [AIMessage(content="", tool_calls=[tool_call])]}
+
+    def prompt_prefix(self, agent_prompt: str) -> Tuple[Any, ...]:
+        """
+        The static leading messages of the agent's model calls, identical across requests.
+
+        Parameters:
+            agent_prompt (str): The input_dict key of the system prompt.
+
+        Returns:
+            Tuple[Any, ...]: The system prompt, then the `few_shot_messages` of the input_dict as
+            ("human" | "ai", content) pairs.
+        """
+        few_shots = tuple(tuple(example) for example in self.input_dict.get("few_shot_messages", ()))
+        return static_prefix(self.input_dict[agent_prompt], few_shots)
+
+    def record_model_call(self, stage: str, tier: Optional[str], seconds: float, usage: Optional[Dict[str, Any]], request_usage: Optional[RequestUsage] = None) -> None:
+        """Record a model call in the tier and prompt-cache metrics, and in the request's usage."""
+        if tier is not None:
+            get_model_router().record(tier, stage, seconds, usage)
+        get_prompt_cache_stats().record(stage, seconds, usage)
+        if request_usage is not None:
+            request_usage.record_llm(stage, tier, seconds, usage)
+
+    def get_run_config(self) -> Dict[str, Any]:
+        """
+        Builds the runnable config passed to the graph invocation.
+
+        Per-request tool settings are placed under `configurable`, where tools that accept
+        a `config: RunnableConfig` argument can read them. A new `RequestUsage` is set as
+        `self.usage` and placed there too, to meter the run's LLM calls and Tavily queries, and
+        so is a new `QueryMemo` (`self.query_memo`) when the input enables it.
+
+        Returns:
+            Dict[str, Any]: The runnable config for `graph.ainvoke`.
+        """
+        # Route the question to a model tier, unless the caller picked one
+        router = get_model_router()
+        self.usage = RequestUsage()
+        self.query_memo = QueryMemo() if self.input_dict.get("query_memo", False) else None
+        model_tier = self.input_dict.get("model_tier") or router.route(self.input_dict['input_prompt']).tier
+        configurable = {
+            "page_fetch_top_k": self.input_dict.get("page_fetch_top_k", 0),
+            "query_expansion": self.input_dict.get("query_expansion", False),
+            "search_effort": self.input_dict.get("search_effort", False),
+            "query_memo": self.query_memo,
+            "direct_answer_race": self.input_dict.get("direct_answer_race", False),
+            "direct_answer_min_confidence": self.input_dict.get("direct_answer_min_confidence", DEFAULT_MIN_CONFIDENCE),
+            "direct_answer_tier": "fast" if tier_settings("fast") is not None else "reasoning",
+            "model_tier": model_tier,
+            "respond_tier": router.respond_tier(model_tier),
+            # Only primitive values are copied into checkpoint metadata, so the meter is not persisted
+            "usage": self.usage,
+            # Deadline and answer reserve, read by every node, LLM call and Tavily query
+            **deadline_config(self.input_dict.get("deadline"), self.input_dict.get("respond_reserve")),
+        }
+        if self.input_dict.get("thread_id"):
+            configurable["thread_id"] = self.input_dict["thread_id"]
+        return {"configurable": configurable}
+
+    def graph_cache_key(self) -> Tuple:
+        """
+        Key of everything the compiled graph's nodes depend on.
+
+        Agents with the same key share one compiled graph, so per-request settings must not be read
+        from `self` inside the nodes: they travel in the run config (see `get_run_config`).
+
+        Returns:
+            Tuple: The agent class, state, output model, prompt and few-shots, model configuration and checkpointer.
         """
-        Creates and executes a workflow for managing the conversation flow between an agent, tool interactions, 
-        and user responses.
+        session_store = self.input_dict.get("session_store")
+        fast_settings = tier_settings("fast")
+        return (
+            type(self),
+            self.input_dict['agent_state'],
+            self.input_dict['structured_output_class'],
+            self.input_dict['search_agent_prompt'],
+            self.input_dict.get('direct_answer_prompt'),
+            tuple(tuple(example) for example in self.input_dict.get("few_shot_messages", ())),
+            os.getenv("AZURE_OPENAI_ENDPOINT", ""),
+            os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", ""),
+            os.getenv("AZURE_OPENAI_API_KEY", ""),
+            tuple(sorted(fast_settings.items())) if fast_settings else None,
+            session_store.checkpointer if session_store else None,
+        )
 
-        This method defines a `StateGraph` to handle the conversation workflow, including conditional transitions
-        based on whether the agent should continue processing or respond to the user. It compiles the workflow 
-        and invokes it with the input message, returning the final result.
+    def build_graph(self) -> Any:
+        """
+        Builds and compiles the workflow for managing the conversation flow between an agent, tool
+        interactions, and user responses.
 
         Workflow Overview:
             - Nodes:
                 - "search_agent": Handles model invocation using `call_model`.
                 - "agent_respond": Handles user responses using `respond`.
                 - "search_tools": Handles tool interactions using a `ToolNode`.
-            - Entry Point: "search_agent"
+                - "race": Runs the three nodes above as a subgraph, concurrently with a direct answer
+                  from the model's own knowledge (see `direct_answer`), and returns the first
+                  confident result.
+            - Entry Point: "race" for new questions when the request enables `direct_answer_race`,
+              "search_agent" otherwise.
             - Transitions:
                 - From "search_agent":
                     - If `should_continue` returns "continue", transitions to "search_tools".
                     - If `should_continue` returns "agent_respond", transitions to "agent_respond".
                 - From "search_tools", transitions back to "search_agent".
                 - From "agent_respond", ends the workflow (`END`).
-
-        Parameters:
-            None
+                - From "race", ends the workflow (`END`).
 
         Returns:
-            Any: The output of the workflow after invoking the graph, typically the final response.
+            Any: The compiled graph, checkpointed when the request belongs to a session.
         """
         # Define a new graph
         workflow = StateGraph(self.input_dict['agent_state'])
 
         # Define the three nodes in the workflow
-        async def search_agent_node(state):
-            return await self.call_model(state, 'search_agent_prompt', self.search_model_with_tools)
+        async def search_agent_node(state, config: RunnableConfig):
+            # When time is short, skip further searching and answer from the results gathered so far
+            if not time_is_short(config):
+                tier = config.get("configurable", {}).get("model_tier", "reasoning")
+                usage = config.get("configurable", {}).get("usage")
+                # The first turn of a simple question is written locally, saving a model round-trip
+                expand_locally = config.get("configurable", {}).get("query_expansion") and isinstance(state['messages'][-1], HumanMessage)
+                if expand_locally:
+                    update = self.local_first_hop(state)
+                    if update is not None:
+                        return update
+                started_at = time.perf_counter()
+                try:
+                    update = await with_deadline(
+                        self.call_model(state, 'search_agent_prompt', self.tier_model(tier, "search"), tier, usage), config, keep_reserve=True
+                    )
+                except DeadlineExceeded:
+                    pass
+                else:
+                    if expand_locally:
+                        get_query_expansion_stats().record_model_first_hop(time.perf_counter() - started_at)
+                    return update
+            return {"messages": [AIMessage(content=BEST_EFFORT_MESSAGE)]}
         
-        async def agent_respond_node(state):
-            return await self.respond(state)
-
-        workflow.add_node("search_agent", search_agent_node)
-        workflow.add_node("agent_respond", agent_respond_node)
-        workflow.add_node("search_tools", ToolNode(self.search_tools))
-
-        # Set the entry point to "search_agent"
-        workflow.set_entry_point("search_agent")
-
-        # Add conditional edges from "search_agent" based on `should_continue`
-        workflow.add_conditional_edges(
-            "search_agent",
-            self.search_should_continue,
-            {
-                "search_tools": "search_tools",  # Transition to "search_tools" if `should_continue` returns "search_tools"
-                "agent_respond": "agent_respond"  # Transition to "agent_respond" if `should_continue` returns "agent_respond"
-            },
-        )
-
-        # Define other edges
-        workflow.add_edge("search_tools", "search_agent")  # Cycle back to "search_agent" from "search_tools"
-        workflow.add_edge("agent_respond", END)   # End the workflow from "agent_respond"
-
-        memory = MemorySaver()
-        # Compile the workflow into a graph
-        graph = workflow.compile()
+        async def agent_respond_node(state, config: RunnableConfig):
+            tier = config.get("configurable", {}).get("respond_tier", "reasoning")
+            usage = config.get("configurable", {}).get("usage")
+            return await with_deadline(self.respond(state, self.tier_model(tier, "respond"), tier, usage), config)
+
+        def add_search_nodes(workflow: StateGraph) -> None:
+            workflow.add_node("search_agent", search_agent_node)
+            workflow.add_node("agent_respond", agent_respond_node)
+            workflow.add_node("search_tools", ToolNode(self.search_tools))
+
+            # Add conditional edges from "search_agent" based on `should_continue`
+            workflow.add_conditional_edges(
+                "search_agent",
+                self.search_should_continue,
+                {
+                    "search_tools": "search_tools",  # Transition to "search_tools" if `should_continue` returns "search_tools"
+                    "agent_respond": "agent_respond"  # Transition to "agent_respond" if `should_continue` returns "agent_respond"
+                },
+            )
+
+            # Define other edges
+            workflow.add_edge("search_tools", "search_agent")  # Cycle back to "search_agent" from "search_tools"
+            workflow.add_edge("agent_respond", END)   # End the workflow from "agent_respond"
+
+        # The search loop on its own, run by the race node next to the direct-answer branch
+        search_workflow = StateGraph(self.input_dict['agent_state'])
+        add_search_nodes(search_workflow)
+        search_workflow.set_entry_point("search_agent")
+        search_graph = search_workflow.compile()
+
+        async def race_node(state, config: RunnableConfig):
+            configurable = config.get("configurable", {})
+            tier = configurable.get("direct_answer_tier", "fast")
+            started_at = time.perf_counter()
+            outcome, result = await race(
+                search_graph.ainvoke(state, config),
+                self.direct_answer(state, self.tier_model(tier, "direct"), tier, configurable.get("usage")),
+                configurable.get("direct_answer_min_confidence", DEFAULT_MIN_CONFIDENCE),
+            )
+            get_race_stats().record(outcome, time.perf_counter() - started_at)
+            if outcome != "direct":
+                return result
+            # The direct answer is flagged by the name of its message, see `answered_directly`
+            message = AIMessage(content=result.answer.model_dump_json(), name=DIRECT_ANSWER_NAME)
+            return {"messages": [message], "final_response": result.answer}
+
+        def route_question(state, config: RunnableConfig) -> str:
+            # New questions race a direct answer against search when the request asks for it
+            if config.get("configurable", {}).get("direct_answer_race") and isinstance(state['messages'][-1], HumanMessage):
+                return "race"
+            return "search_agent"
+
+        add_search_nodes(workflow)
+        workflow.add_node("race", race_node)
+        workflow.add_edge("race", END)
+
+        # Enter the search loop, or the race between search and a direct answer
+        workflow.set_conditional_entry_point(route_question, {"race": "race", "search_agent": "search_agent"})
+
+        # Compile the workflow into a graph, checkpointed when the request belongs to a session
+        session_store = self.input_dict.get("session_store")
+        return workflow.compile(checkpointer=session_store.checkpointer if session_store else None)
+
+    def get_graph(self) -> Any:
+        """
+        Return the compiled graph for this agent's configuration.
 
-        # Invoke the graph with the initial input and callback handler (async)
-        answer = await graph.ainvoke(
-            input={"messages": [("human", self.input_dict['input_prompt'])]}
-            # config={"callbacks": [self.langfuse_handler]}
-        )
+        The model is initialized and the workflow compiled the first time a configuration is seen
+        (normally during the start-up warm-up); later requests reuse the compiled graph.
 
-        # Save graph
-        self.graph = graph
+        Returns:
+            Any: The compiled graph.
+        """
+        # Load the credentials the model configuration is keyed on
+        load_dotenv()
+        retrieve_secret(secret_name='des-o3', project_id='cd-ds-384118')
 
-        return answer
+        key = self.graph_cache_key()
+        graph = _compiled_graphs.get(key)
+        if graph is None:
+            self.initialize_model()
+            graph = _compiled_graphs.setdefault(key, self.build_graph())
+        return graph
 
-    async def run(self) -> Any:
+    async def astream(self, stream_mode: Union[str, List[str]] = "updates") -> AsyncIterator[Any]:
         """
-        Executes the main workflow for the agent, including tool creation, model initialization, 
-        and workflow execution.
-        """
-        # Step 1: Create tools
-        self.create_tools()
-
-        # Step 2: Initialize the model
-        self.initialize_model()
+        Executes the compiled workflow on the input prompt, yielding its progress.
 
-        # Step 3: Create and execute the workflow (now async)
-        answer = await self.create_workflow()
+        Questions on a session thread are appended to the checkpointed conversation, and the
+        thread is locked from preparing the input until its checkpoint is pruned. The run's usage
+        (`self.usage`) and query memo counts are added to the process-wide totals once it ends.
 
-        # Store the final response
-        self.answer = answer
+        Parameters:
+            stream_mode (Union[str, List[str]]): The LangGraph stream mode: "updates" yields each
+                node's output, "values" yields the full state after each step, "messages" yields the
+                LLM tokens as they are generated. With a list, (mode, chunk) pairs are yielded.
 
-        # Return the final response
-        return answer
-        
+        Yields:
+            Any: The stream chunks of the graph execution.
+        """
+        if getattr(self, "graph", None) is None:
+            self.create_tools()
+            self.graph = self.get_graph()
+        graph = self.graph
+
+        config = self.get_run_config()
+        try:
+            session_store = self.input_dict.get("session_store")
+            if session_store:
+                thread_id = self.input_dict['thread_id']
+                # Serialize turns on the thread: prepare, invoke and prune must not interleave
+                async with session_store.thread_lock(thread_id):
+                    # Follow-up: the question is appended to the checkpointed conversation
+                    graph_input = await session_store.prepare_input(graph, thread_id, self.input_dict['input_prompt'])
+                    async for chunk in graph.astream(
+                        input=graph_input,
+                        config=config,
+                        stream_mode=stream_mode,
+                        # Only checkpoint the final state of the run
+                        durability="exit"
+                    ):
+                        yield chunk
+                    await session_store.finish_turn(thread_id)
+            else:
+                # Execute the graph with the initial input and callback handler (async)
+                async for chunk in graph.astream(
+                    input={"messages": [("human", self.input_dict['input_prompt'])]},
+                    config=config,
+                    stream_mode=stream_mode,
+                    # config={"callbacks": [self.langfuse_handler]}
+                ):
+                    yield chunk
+        finally:
+            # Spend counts even when the run fails or is cancelled
+            get_usage_totals().add(self.usage.summary())
+            if self.query_memo is not None:
+                get_query_memo_totals().add(self.query_memo.summary())
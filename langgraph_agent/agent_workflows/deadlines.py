@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request runs past its deadline. Outstanding work has been cancelled."""
+
+
+def new_deadline(timeout_seconds: Optional[float] = None) -> Optional[float]:
+    """
+    Compute the deadline of a request, as a `time.monotonic()` timestamp.
+
+    Args:
+        timeout_seconds (float): Time budget of the request, SEARCH_DEADLINE_SECONDS (default 120)
+            if omitted. A budget of 0 or less disables the deadline.
+    Returns:
+        Optional[float]: The deadline, or None for no deadline.
+    """
+    if timeout_seconds is None:
+        timeout_seconds = float(os.getenv("SEARCH_DEADLINE_SECONDS", "120"))
+    return time.monotonic() + timeout_seconds if timeout_seconds > 0 else None
+
+
+def deadline_config(deadline: Optional[float], respond_reserve: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Build the `configurable` entries carrying a deadline through the graph.
+
+    Args:
+        deadline (float): The request deadline, None for no deadline.
+        respond_reserve (float): Seconds kept for writing the final answer, DEADLINE_RESPOND_RESERVE_SECONDS
+            (default 20) if omitted. Searching stops once less time than this remains.
+    Returns:
+        Dict[str, Any]: Entries for the run config's `configurable`.
+    """
+    if deadline is None:
+        return {}
+    if respond_reserve is None:
+        respond_reserve = float(os.getenv("DEADLINE_RESPOND_RESERVE_SECONDS", "20"))
+    return {"deadline": deadline, "respond_reserve": respond_reserve}
+
+
+def time_left(config: Optional[Dict[str, Any]], keep_reserve: bool = False) -> Optional[float]:
+    """
+    Seconds left before the deadline in a run config.
+
+    Args:
+        config (Dict[str, Any]): The run config.
+        keep_reserve (bool): Subtract the time reserved for the final answer.
+    Returns:
+        Optional[float]: The seconds left (possibly negative), or None if there is no deadline.
+    """
+    configurable = (config or {}).get("configurable", {})
+    deadline = configurable.get("deadline")
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if keep_reserve:
+        left -= configurable.get("respond_reserve", 0.0)
+    return left
+
+
+def time_is_short(config: Optional[Dict[str, Any]]) -> bool:
+    """Whether only the time reserved for the final answer is left."""
+    left = time_left(config, keep_reserve=True)
+    return left is not None and left <= 0
+
+
+async def run_with_timeout(awaitable: Awaitable[T], timeout: Optional[float]) -> T:
+    """
+    Await with a timeout, cancelling the awaitable when it expires.
+
+    Args:
+        awaitable (Awaitable): The work to run.
+        timeout (float): Seconds allowed, None for no limit.
+    Raises:
+        DeadlineExceeded: If the timeout expires.
+    """
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=max(0.0, timeout))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Deadline exceeded after {max(0.0, timeout):.1f}s") from None
+
+
+async def with_deadline(awaitable: Awaitable[T], config: Optional[Dict[str, Any]], keep_reserve: bool = False) -> T:
+    """
+    Await within the deadline of a run config, cancelling the awaitable when it expires.
+
+    Args:
+        awaitable (Awaitable): The work to run, e.g. an LLM call or a Tavily query.
+        config (Dict[str, Any]): The run config.
+        keep_reserve (bool): Stop early enough to leave the time reserved for the final answer.
+    Raises:
+        DeadlineExceeded: If the deadline (or the start of the reserve) is reached.
+    """
+    return await run_with_timeout(awaitable, time_left(config, keep_reserve=keep_reserve))
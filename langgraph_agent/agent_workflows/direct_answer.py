@@ -0,0 +1,142 @@
+import asyncio
+import statistics
+import threading
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Any, Awaitable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel, Field, create_model
+
+from langgraph_agent.structured_output.registry import structured_output_registry
+
+
+@lru_cache(maxsize=None)
+def direct_answer_class(output_class: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    The output model of the direct-answer branch: the agent's output model and a confidence.
+
+    Built and registered once per output model.
+
+    Args:
+        output_class (Type[BaseModel]): The agent's structured output class.
+    Returns:
+        Type[BaseModel]: A model with an `answer` of the output class and a `confidence` in [0, 1].
+    """
+    model = create_model(
+        f"Direct{output_class.__name__}",
+        answer=(output_class, Field(description="The answer, written from your own knowledge")),
+        confidence=(float, Field(ge=0, le=1, description="How sure you are that the answer is correct and complete, from 0 to 1")),
+    )
+    structured_output_registry.register(model)
+    return model
+
+
+class RaceStats:
+    """
+    Outcome of the races between the direct-answer branch and the search branch.
+
+    A race is won by the direct answer when it arrives first with a confidence at or above the
+    threshold. The latency saved by a win is estimated from the average duration of the search
+    branch in races it completed.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window (int): Number of recent search branch durations kept.
+        """
+        self._outcomes: Counter = Counter()
+        self._direct_win_seconds = 0.0
+        self._search_seconds: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str, seconds: float) -> None:
+        """
+        Record a race.
+
+        Args:
+            outcome (str): "direct" (the direct answer won), "low_confidence" (it came first, not
+                confident enough), "search_first" (search finished first) or "direct_error".
+            seconds (float): Duration of the race.
+        """
+        with self._lock:
+            self._outcomes[outcome] += 1
+            if outcome == "direct":
+                self._direct_win_seconds += seconds
+            else:
+                self._search_seconds.append(seconds)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the race count, the outcomes, the direct answer's win rate and the estimated seconds saved."""
+        with self._lock:
+            races = sum(self._outcomes.values())
+            wins = self._outcomes["direct"]
+            search_avg = statistics.fmean(self._search_seconds) if self._search_seconds else None
+            return {
+                "races": races,
+                "outcomes": dict(self._outcomes),
+                "win_rate": round(wins / races, 3) if races else None,
+                "search_seconds_avg": round(search_avg, 3) if search_avg is not None else None,
+                "estimated_seconds_saved": round(wins * search_avg - self._direct_win_seconds, 3) if search_avg is not None else None,
+            }
+
+
+async def race(search: Awaitable[Any], direct: Awaitable[Any], min_confidence: float) -> Tuple[str, Any]:
+    """
+    Run the search and direct-answer branches concurrently.
+
+    The direct answer wins if it arrives before search finishes with a confidence of at least
+    `min_confidence`: search is then cancelled. Otherwise search's result is awaited, and a direct
+    answer still running is cancelled.
+
+    Args:
+        search (Awaitable[Any]): The search branch.
+        direct (Awaitable[Any]): The direct-answer branch, returning an object with a `confidence`.
+        min_confidence (float): Confidence the direct answer needs to win.
+    Returns:
+        Tuple[str, Any]: The outcome (see `RaceStats.record`) and the winning branch's result.
+    Raises:
+        Exception: What the search branch raised, e.g. `DeadlineExceeded`.
+    """
+    search_task = asyncio.ensure_future(search)
+    direct_task = asyncio.ensure_future(direct)
+    try:
+        done, _ = await asyncio.wait({search_task, direct_task}, return_when=asyncio.FIRST_COMPLETED)
+        if direct_task in done and search_task not in done:
+            if direct_task.exception() is not None:
+                outcome = "direct_error"
+            elif direct_task.result().confidence >= min_confidence:
+                search_task.cancel()
+                return "direct", direct_task.result()
+            else:
+                outcome = "low_confidence"
+        else:
+            outcome = "search_first"
+        return outcome, await search_task
+    finally:
+        for task in (search_task, direct_task):
+            task.cancel()
+        # Cancelled branches are awaited so they finish cleaning up before the node returns
+        await asyncio.gather(search_task, direct_task, return_exceptions=True)
+
+
+# Name of the AI message holding a direct answer, which marks the turn as unsourced
+DIRECT_ANSWER_NAME = "direct_answer"
+
+
+def answered_directly(state: Dict[str, Any]) -> bool:
+    """Whether a final state's answer came from the direct-answer branch, without search."""
+    messages = state.get("messages") or []
+    return bool(messages) and getattr(messages[-1], "name", None) == DIRECT_ANSWER_NAME
+
+
+_race_stats: Optional[RaceStats] = None
+
+
+def get_race_stats() -> RaceStats:
+    """Return the process-wide race statistics."""
+    global _race_stats
+    if _race_stats is None:
+        _race_stats = RaceStats()
+    return _race_stats
+
@@ -0,0 +1,225 @@
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from gen_utils.cassettes import cassette_transport
+
+
+class _MeteredStream(httpx.AsyncByteStream):
+    """Response body stream that reports when it is closed, i.e. when the request is done."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class MeteredTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport counting requests and new connections on top of an `httpx.AsyncHTTPTransport`.
+
+    New TCP connections and TLS handshakes are counted from the connection pool's trace events,
+    so the share of requests served on a reused keep-alive connection can be tracked.
+    """
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self._transport = transport
+        self.requests_total = 0
+        self.requests_in_flight = 0
+        self.max_requests_in_flight = 0
+        self.errors_total = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        parent_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+            if parent_trace is not None:
+                await parent_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        self.requests_total += 1
+        self.requests_in_flight += 1
+        self.max_requests_in_flight = max(self.max_requests_in_flight, self.requests_in_flight)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.requests_in_flight -= 1
+            self.errors_total += 1
+            raise
+
+        def on_close() -> None:
+            self.requests_in_flight -= 1
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_MeteredStream(response.stream, on_close),
+            extensions=response.extensions,
+        )
+
+    def pool_snapshot(self) -> Dict[str, int]:
+        """Count the pooled connections by state."""
+        # httpx does not expose its httpcore pool; the pool's `connections` list is public
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return {
+            "pool_connections": len(connections),
+            "pool_idle_connections": sum(1 for c in connections if c.is_idle()),
+            "pool_http2_connections": sum(1 for c in connections if "HTTP/2" in c.info()),
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the request, connection and pool counters."""
+        reused = self.requests_total - self.connections_opened
+        return {
+            "requests_total": self.requests_total,
+            "requests_in_flight": self.requests_in_flight,
+            "max_requests_in_flight": self.max_requests_in_flight,
+            "errors_total": self.errors_total,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "connection_reuse_ratio": round(reused / self.requests_total, 3) if self.requests_total else None,
+            **self.pool_snapshot(),
+        }
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def http2_available() -> bool:
+    """Whether the optional `h2` package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class MeteredAsyncClient(httpx.AsyncClient):
+    """An `httpx.AsyncClient` over a `MeteredTransport`, exposing its pool metrics."""
+
+    def __init__(self, transport: MeteredTransport, **kwargs: Any):
+        super().__init__(transport=transport, **kwargs)
+        self.metered_transport = transport
+
+    def pool_metrics(self) -> Dict[str, Any]:
+        """Return the request, connection and pool counters of the client."""
+        return self.metered_transport.metrics()
+
+
+def create_model_http_client(
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 60.0,
+    connect_timeout: float = 5.0,
+    timeout: float = 600.0,
+    http2: bool = True,
+) -> MeteredAsyncClient:
+    """
+    Create a metered, pooled async HTTP client for chat models.
+
+    Args:
+        max_connections (int): Maximum number of open connections.
+        max_keepalive_connections (int): Maximum number of idle connections kept open.
+        keepalive_expiry (float): Seconds after which an idle connection is closed.
+        connect_timeout (float): Timeout of connection establishment, including TLS.
+        timeout (float): Timeout of reads, writes and waits for a pooled connection.
+        http2 (bool): Use HTTP/2 when the server and the `h2` package support it.
+    Returns:
+        MeteredAsyncClient: The client, recording to or replaying from the cassette when
+        CASSETTE_MODE is set (see `get_cassette`).
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=http2 and http2_available(),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+    return MeteredAsyncClient(
+        MeteredTransport(cassette_transport(transport)),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+
+
+_model_http_client: Optional[MeteredAsyncClient] = None
+
+# Called when the shared client is closed, to drop the models bound to it
+_close_callbacks: List[Callable[[], None]] = []
+
+
+def on_model_http_client_closed(callback: Callable[[], None]) -> None:
+    """
+    Register a callback run when the process-wide model HTTP client is closed.
+
+    Modules caching chat models (or runnables bound to them) register one to drop them, so a later
+    start-up in the same process builds new models on a new client.
+    """
+    _close_callbacks.append(callback)
+
+
+def get_model_http_client() -> MeteredAsyncClient:
+    """
+    Return the process-wide HTTP client shared by every chat model the agents create, so requests
+    reuse warm keep-alive connections to the model endpoint instead of each model opening its own.
+
+    Configured with environment variables:
+        - MODEL_HTTP_MAX_CONNECTIONS: Maximum number of open connections (default 100).
+        - MODEL_HTTP_MAX_KEEPALIVE: Maximum number of idle connections kept open (default 20).
+        - MODEL_HTTP_KEEPALIVE_EXPIRY: Seconds before an idle connection is closed (default 60).
+        - MODEL_HTTP_CONNECT_TIMEOUT: Connection timeout in seconds (default 5).
+        - MODEL_HTTP_TIMEOUT: Read, write and pool timeout in seconds (default 600).
+        - MODEL_HTTP2: "true" (default) to use HTTP/2 where available.
+    """
+    global _model_http_client
+    if _model_http_client is None:
+        _model_http_client = create_model_http_client(
+            max_connections=int(os.getenv("MODEL_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("MODEL_HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("MODEL_HTTP_KEEPALIVE_EXPIRY", "60")),
+            connect_timeout=float(os.getenv("MODEL_HTTP_CONNECT_TIMEOUT", "5")),
+            timeout=float(os.getenv("MODEL_HTTP_TIMEOUT", "600")),
+            http2=os.getenv("MODEL_HTTP2", "true").lower() == "true",
+        )
+    return _model_http_client
+
+
+def model_http_pool_metrics() -> Optional[Dict[str, Any]]:
+    """Return the metrics of the process-wide model HTTP client, or None if it was not created."""
+    if _model_http_client is None:
+        return None
+    return _model_http_client.pool_metrics()
+
+
+async def close_model_http_client() -> None:
+    """
+    Close the process-wide model HTTP client, if it was created. Call it at application shutdown.
+
+    The models cached by the registered callbacks are dropped with it (see `on_model_http_client_closed`).
+    """
+    global _model_http_client
+    if _model_http_client is not None:
+        await _model_http_client.aclose()
+        _model_http_client = None
+        for callback in _close_callbacks:
+            callback()
@@ -0,0 +1,229 @@
+import os
+import re
+import statistics
+import threading
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Model tiers: a fast deployment for easy questions, a reasoning deployment for hard ones
+MODEL_TIERS = ("fast", "reasoning")
+
+# Phrasings asking for analysis, comparison or planning rather than a fact lookup
+REASONING_CUES = re.compile(
+    r"\b(compare|comparison|versus|vs\.?|difference between|pros and cons|trade-?offs?|why|explain|"
+    r"analy[sz]e|evaluate|assess|recommend|should (?:i|we)|step[- ]by[- ]step|plan|strategy|"
+    r"impact|implications?|predict|forecast|best way|how (?:does|do|would|could)|what if)\b",
+    re.IGNORECASE,
+)
+# Questions a single search result answers
+FACTUAL_OPENER = re.compile(r"^\s*(who|what|when|where|which)\s+(is|was|are|were)\b", re.IGNORECASE)
+CALCULATION = re.compile(r"\d+(?:\.\d+)?\s*[-+*/^%]\s*\d+|\bcalculate\b|\bconvert\b", re.IGNORECASE)
+
+
+@dataclass
+class RoutingDecision:
+    """The tier chosen for a question, with the complexity score and the signals behind it."""
+    tier: str
+    score: int
+    signals: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RouterConfig:
+    """
+    Settings of the model router.
+
+    Attributes:
+        enabled (bool): Route questions between tiers. When False, or when no fast deployment is
+            configured, every question goes to the reasoning tier.
+        complexity_threshold (int): Complexity score from which a question goes to the reasoning tier.
+        long_question_words (int): Word count from which a question counts as long.
+        fast_respond (bool): Use the fast tier for the structured-output pass of every question.
+    """
+    enabled: bool = True
+    complexity_threshold: int = 2
+    long_question_words: int = 25
+    fast_respond: bool = False
+
+    @classmethod
+    def from_env(cls) -> "RouterConfig":
+        """
+        Read the settings from environment variables:
+            - MODEL_ROUTER_ENABLED: "true" (default) to route questions between tiers.
+            - MODEL_ROUTER_COMPLEXITY_THRESHOLD: Score from which the reasoning tier is used (default 2).
+            - MODEL_ROUTER_LONG_QUESTION_WORDS: Word count of a long question (default 25).
+            - MODEL_ROUTER_FAST_RESPOND: "true" to use the fast tier for the structured output (default "false").
+        """
+        return cls(
+            enabled=os.getenv("MODEL_ROUTER_ENABLED", "true").lower() == "true" and tier_settings("fast") is not None,
+            complexity_threshold=int(os.getenv("MODEL_ROUTER_COMPLEXITY_THRESHOLD", "2")),
+            long_question_words=int(os.getenv("MODEL_ROUTER_LONG_QUESTION_WORDS", "25")),
+            fast_respond=os.getenv("MODEL_ROUTER_FAST_RESPOND", "false").lower() == "true",
+        )
+
+
+def tier_settings(tier: str) -> Optional[Dict[str, str]]:
+    """
+    Azure OpenAI settings of a tier.
+
+    The reasoning tier is the main deployment (AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY,
+    AZURE_OPENAI_DEPLOYMENT_NAME, o3 API version). The fast tier is configured with
+    AZURE_OPENAI_FAST_DEPLOYMENT_NAME and, when they differ from the main deployment's,
+    AZURE_OPENAI_FAST_ENDPOINT, AZURE_OPENAI_FAST_API_KEY and AZURE_OPENAI_FAST_API_VERSION
+    (default the 4o API version).
+
+    Args:
+        tier (str): "fast" or "reasoning".
+    Returns:
+        Optional[Dict[str, str]]: The endpoint, API key, deployment and API version, or None for
+        a fast tier without a deployment.
+    """
+    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "")
+    api_key = os.getenv("AZURE_OPENAI_API_KEY", "")
+    if tier == "reasoning":
+        return {
+            "endpoint": endpoint,
+            "api_key": api_key,
+            "deployment": os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", ""),
+            "api_version": "2024-12-01-preview",
+        }
+    deployment = os.getenv("AZURE_OPENAI_FAST_DEPLOYMENT_NAME", "")
+    if not deployment:
+        return None
+    return {
+        "endpoint": os.getenv("AZURE_OPENAI_FAST_ENDPOINT", endpoint),
+        "api_key": os.getenv("AZURE_OPENAI_FAST_API_KEY", api_key),
+        "deployment": deployment,
+        "api_version": os.getenv("AZURE_OPENAI_FAST_API_VERSION", "2024-08-01-preview"),
+    }
+
+
+def classify_question(question: str, config: RouterConfig) -> RoutingDecision:
+    """
+    Score the complexity of a question with cheap local heuristics.
+
+    Signals raising the score: length, reasoning cues (compare, why, explain, plan, ...), several
+    sub-questions and calculations. A short "who/what/when is ..." question lowers it.
+
+    Args:
+        question (str): The user question.
+        config (RouterConfig): The router settings.
+    Returns:
+        RoutingDecision: "reasoning" when the score reaches the complexity threshold, else "fast".
+    """
+    score = 0
+    signals = []
+    words = len(question.split())
+    if words >= 2 * config.long_question_words:
+        score += 2
+        signals.append("very_long")
+    elif words >= config.long_question_words:
+        score += 1
+        signals.append("long")
+    cues = {match.lower() for match in REASONING_CUES.findall(question)}
+    if cues:
+        score += min(len(cues), 2) + 1
+        signals.extend(f"cue:{cue}" for cue in sorted(cues))
+    if question.count("?") > 1:
+        score += 1
+        signals.append("several_questions")
+    if CALCULATION.search(question):
+        score += 1
+        signals.append("calculation")
+    if FACTUAL_OPENER.match(question) and words < config.long_question_words:
+        score -= 1
+        signals.append("factual")
+    tier = "reasoning" if score >= config.complexity_threshold else "fast"
+    return RoutingDecision(tier=tier, score=score, signals=signals)
+
+
+class ModelRouter:
+    """
+    Routes questions to a model tier and keeps per-tier latency and token metrics.
+    """
+
+    def __init__(self, config: Optional[RouterConfig] = None, window: int = 1000):
+        """
+        Args:
+            config (RouterConfig): The router settings, read from the environment if omitted.
+            window (int): Number of recent call latencies kept per tier and stage.
+        """
+        self.config = config or RouterConfig.from_env()
+        self._routed: Counter = Counter()
+        self._calls: Counter = Counter()
+        self._tokens: Dict[str, Counter] = defaultdict(Counter)
+        self._latencies: Dict[tuple, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def route(self, question: str) -> RoutingDecision:
+        """
+        Choose the tier of a question.
+
+        Args:
+            question (str): The user question.
+        Returns:
+            RoutingDecision: The chosen tier; always "reasoning" when routing is disabled.
+        """
+        if self.config.enabled:
+            decision = classify_question(question, self.config)
+        else:
+            decision = RoutingDecision(tier="reasoning", score=0, signals=["routing_disabled"])
+        with self._lock:
+            self._routed[decision.tier] += 1
+        return decision
+
+    def respond_tier(self, tier: str) -> str:
+        """Tier of the structured-output pass for a question routed to `tier`."""
+        return "fast" if self.config.enabled and self.config.fast_respond else tier
+
+    def record(self, tier: str, stage: str, seconds: float, usage: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record an LLM call.
+
+        Args:
+            tier (str): The tier of the model called.
+            stage (str): "search" for the search agent turns, "respond" for the structured output,
+                "direct" for the direct answers raced against the search.
+            seconds (float): Wall time of the call.
+            usage (Dict[str, Any]): The response's `usage_metadata`, if the provider returned one.
+        """
+        with self._lock:
+            self._calls[(tier, stage)] += 1
+            self._latencies[(tier, stage)].append(seconds)
+            if usage:
+                self._tokens[tier]["input_tokens"] += usage.get("input_tokens", 0)
+                self._tokens[tier]["output_tokens"] += usage.get("output_tokens", 0)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the routing counts and, per tier and stage, the call counts and latencies."""
+        with self._lock:
+            tiers = {}
+            for tier in MODEL_TIERS:
+                stages = {}
+                for stage in ("search", "respond", "direct"):
+                    latencies = sorted(self._latencies[(tier, stage)])
+                    stages[stage] = {
+                        "calls": self._calls[(tier, stage)],
+                        "latency_seconds_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                        "latency_seconds_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+                        "latency_seconds_avg": round(statistics.fmean(latencies), 3) if latencies else None,
+                    }
+                tiers[tier] = {
+                    "routed_total": self._routed[tier],
+                    "input_tokens": self._tokens[tier]["input_tokens"],
+                    "output_tokens": self._tokens[tier]["output_tokens"],
+                    **stages,
+                }
+            return {"enabled": self.config.enabled, "tiers": tiers}
+
+
+_model_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide model router, configured from the environment (see `RouterConfig.from_env`)."""
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter()
+    return _model_router
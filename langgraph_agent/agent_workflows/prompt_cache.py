@@ -0,0 +1,118 @@
+import statistics
+import threading
+from collections import Counter, defaultdict, deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+
+@lru_cache(maxsize=64)
+def static_prefix(system_prompt: str, few_shots: Tuple[Tuple[str, str], ...] = ()) -> Tuple[BaseMessage, ...]:
+    """
+    The static leading messages of every model call: the system prompt, then the few-shot examples.
+
+    Providers cache prompts by prefix (Azure OpenAI from 1024 tokens, tool schemas first), so the
+    static content must come first and be byte-identical across requests and loop iterations.
+    Built once per prompt and shared.
+
+    Args:
+        system_prompt (str): The system prompt.
+        few_shots (Tuple[Tuple[str, str], ...]): Example turns as ("human" | "ai", content) pairs.
+    Returns:
+        Tuple[BaseMessage, ...]: The prefix messages.
+    """
+    examples = [HumanMessage(content=content) if role == "human" else AIMessage(content=content) for role, content in few_shots]
+    return (SystemMessage(content=system_prompt), *examples)
+
+
+def assemble_messages(prefix: Sequence[BaseMessage], conversation: Iterable[BaseMessage]) -> List[BaseMessage]:
+    """
+    Lay out the messages of a model call: the static prefix, then the per-request conversation.
+
+    System messages in the conversation, e.g. from checkpoints written before the prefix layout,
+    are dropped so they do not repeat the prefix.
+
+    Args:
+        prefix (Sequence[BaseMessage]): The static prefix, see `static_prefix`.
+        conversation (Iterable[BaseMessage]): The graph state's messages.
+    Returns:
+        List[BaseMessage]: The messages to send.
+    """
+    return [*prefix, *(message for message in conversation if not isinstance(message, SystemMessage))]
+
+
+def cached_tokens(usage: Optional[Dict[str, Any]]) -> int:
+    """Number of prompt tokens the provider served from its prompt cache, from a `usage_metadata`."""
+    return ((usage or {}).get("input_token_details") or {}).get("cache_read") or 0
+
+
+class PromptCacheStats:
+    """
+    Prompt-cache hit rates and latencies of the model calls, per stage.
+
+    A call hits the cache when the provider reports cached prompt tokens. Comparing the latency of
+    hits and misses estimates the time the cache saves.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window (int): Number of recent call latencies kept per stage and outcome.
+        """
+        self._counts: Dict[str, Counter] = defaultdict(Counter)
+        self._latencies: Dict[Tuple[str, bool], deque] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, usage: Optional[Dict[str, Any]]) -> None:
+        """
+        Record a model call.
+
+        Args:
+            stage (str): "search" or "respond".
+            seconds (float): Wall time of the call.
+            usage (Dict[str, Any]): The response's `usage_metadata`. Calls without one are not counted.
+        """
+        if not usage:
+            return
+        cached = cached_tokens(usage)
+        with self._lock:
+            counts = self._counts[stage]
+            counts["calls"] += 1
+            counts["hits"] += cached > 0
+            counts["input_tokens"] += usage.get("input_tokens", 0)
+            counts["cached_tokens"] += cached
+            self._latencies[(stage, cached > 0)].append(seconds)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return, per stage, the hit rate, the cached share of prompt tokens and the estimated time saved."""
+        with self._lock:
+            stages = {}
+            for stage, counts in self._counts.items():
+                hit_latencies, miss_latencies = self._latencies[(stage, True)], self._latencies[(stage, False)]
+                avg_hit = statistics.fmean(hit_latencies) if hit_latencies else None
+                avg_miss = statistics.fmean(miss_latencies) if miss_latencies else None
+                stages[stage] = {
+                    "calls": counts["calls"],
+                    "hit_rate": round(counts["hits"] / counts["calls"], 3),
+                    "input_tokens": counts["input_tokens"],
+                    "cached_tokens": counts["cached_tokens"],
+                    "cached_token_ratio": round(counts["cached_tokens"] / counts["input_tokens"], 3) if counts["input_tokens"] else None,
+                    "latency_seconds_avg_hit": round(avg_hit, 3) if avg_hit is not None else None,
+                    "latency_seconds_avg_miss": round(avg_miss, 3) if avg_miss is not None else None,
+                    "estimated_seconds_saved": (
+                        round(counts["hits"] * (avg_miss - avg_hit), 3) if avg_hit is not None and avg_miss is not None else None
+                    ),
+                }
+            return stages
+
+
+_prompt_cache_stats: Optional[PromptCacheStats] = None
+
+
+def get_prompt_cache_stats() -> PromptCacheStats:
+    """Return the process-wide prompt-cache statistics."""
+    global _prompt_cache_stats
+    if _prompt_cache_stats is None:
+        _prompt_cache_stats = PromptCacheStats()
+    return _prompt_cache_stats
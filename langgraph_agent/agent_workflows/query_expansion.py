@@ -0,0 +1,181 @@
+import hashlib
+import os
+import re
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from langgraph_agent.agent_workflows.model_router import RouterConfig, classify_question
+from langgraph_agent.tools.query_memo import normalize_query
+
+# Words carrying no search intent, dropped from keyword queries
+STOPWORDS = frozenset("""
+a an the and or but if of to in on at by for with from into onto about as is are was were be been being
+do does did done have has had i me my we our you your he she it its they them their this that these those
+what which who whom whose when where why how can could should would will shall may might must please
+tell show give find know want need get some any there here way ways just very really
+""".split())
+
+TOKEN = re.compile(r"[\w][\w'+.-]*", re.UNICODE)
+HOW_TO = re.compile(r"^\s*how\s+(?:to|do\s+(?:i|you|we)|can\s+(?:i|you|we)|should\s+(?:i|we))\s+(.+)$", re.IGNORECASE)
+OPENER = re.compile(r"^\s*(what|who|when|where|which)\b", re.IGNORECASE)
+QUALITY = re.compile(r"\b(nice|good|great|best|top|popular|recommended|cheap|affordable)\b", re.IGNORECASE)
+
+# Third query of each question type, a paraphrase of the keywords
+TEMPLATES = {
+    "how_to": "{rest} step by step guide",
+    "what": "{keywords} explained",
+    "who": "{keywords} facts",
+    "when": "{keywords} date",
+    "where": "{keywords} location",
+    "which": "{keywords} comparison",
+    "quality": "best {rest}",
+    "other": "{keywords} overview",
+}
+
+
+@dataclass
+class QueryPlan:
+    """The search queries written locally for a question, or the reason to ask the model instead."""
+    queries: List[str] = field(default_factory=list)
+    fallback_reason: Optional[str] = None
+    seconds: float = 0.0
+
+
+def keywords(question: str) -> List[str]:
+    """The question's content words, in order and without repeats; capitalization is kept."""
+    seen, words = set(), []
+    for token in TOKEN.findall(question):
+        token = token.strip(".'-")
+        if token and token.lower() not in STOPWORDS and token.lower() not in seen:
+            seen.add(token.lower())
+            words.append(token)
+    return words
+
+
+def expand_question(question: str, max_words: int = 15) -> QueryPlan:
+    """
+    Write the search queries of a simple question with rules and templates, as the search agent's
+    first model call would (see search_system_prompt.txt): the question itself, its keywords, and a
+    paraphrase picked by the question type.
+
+    Questions the model router scores above 0 (reasoning cues, calculations, several questions, long
+    questions) are left to the model.
+
+    Args:
+        question (str): The user question.
+        max_words (int): Questions with more words are left to the model.
+    Returns:
+        QueryPlan: The queries, or the fallback reason: "complex", "too_long" or "no_keywords".
+    """
+    started_at = time.perf_counter()
+    cleaned = " ".join(question.split()).rstrip("?!. ")
+    content_words = keywords(cleaned)
+    if len(cleaned.split()) > max_words:
+        reason = "too_long"
+    elif classify_question(question, RouterConfig()).score > 0:
+        reason = "complex"
+    elif not content_words:
+        reason = "no_keywords"
+    else:
+        reason = None
+    if reason is not None:
+        return QueryPlan(fallback_reason=reason, seconds=time.perf_counter() - started_at)
+
+    keyword_query = " ".join(content_words)
+    how_to, opener = HOW_TO.match(cleaned), OPENER.match(cleaned)
+    if how_to:
+        kind, rest = "how_to", how_to.group(1)
+    elif QUALITY.search(cleaned):
+        kind, rest = "quality", " ".join(word for word in content_words if not QUALITY.fullmatch(word)) or keyword_query
+    else:
+        kind, rest = (opener.group(1).lower() if opener else "other"), keyword_query
+    candidates = [cleaned, keyword_query, TEMPLATES[kind].format(rest=rest, keywords=keyword_query), TEMPLATES["other"].format(keywords=keyword_query)]
+    # Candidates differing only by filler words or plurals would return the same results
+    queries, seen = [], set()
+    for query in candidates:
+        if normalize_query(query) not in seen:
+            seen.add(normalize_query(query))
+            queries.append(query)
+    return QueryPlan(queries=queries[:3], seconds=time.perf_counter() - started_at)
+
+
+def local_tool_call_id(question: str) -> str:
+    """Deterministic id of the local web_search call, so identical questions send identical requests."""
+    return "local-" + hashlib.sha256(question.encode("utf-8")).hexdigest()[:16]
+
+
+class QueryExpansionStats:
+    """
+    Outcome of the local query expansion: first hops answered locally, fallbacks to the model and
+    their reasons, and the latency saved.
+
+    The saving is estimated from the latency of the first-hop model calls of fallback questions,
+    which local expansions did not pay, minus the time spent expanding.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window (int): Number of recent first-hop model call latencies kept.
+        """
+        self._counts: Counter = Counter()
+        self._fallback_reasons: Counter = Counter()
+        self._local_seconds = 0.0
+        self._model_latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_plan(self, plan: QueryPlan) -> None:
+        """Record a local expansion attempt."""
+        with self._lock:
+            if plan.fallback_reason is None:
+                self._counts["local"] += 1
+            else:
+                self._counts["fallback"] += 1
+                self._fallback_reasons[plan.fallback_reason] += 1
+            self._local_seconds += plan.seconds
+
+    def record_fallback(self, reason: str) -> None:
+        """Record a first hop left to the model without a local attempt, e.g. a follow-up question."""
+        with self._lock:
+            self._counts["fallback"] += 1
+            self._fallback_reasons[reason] += 1
+
+    def record_model_first_hop(self, seconds: float) -> None:
+        """Record the latency of a first-hop model call."""
+        with self._lock:
+            self._model_latencies.append(seconds)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the local and fallback counts, the fallback rate and reasons, and the estimated seconds saved."""
+        with self._lock:
+            local, fallback = self._counts["local"], self._counts["fallback"]
+            model_avg = statistics.fmean(self._model_latencies) if self._model_latencies else None
+            return {
+                "local": local,
+                "fallback": fallback,
+                "fallback_rate": round(fallback / (local + fallback), 3) if local + fallback else None,
+                "fallback_reasons": dict(self._fallback_reasons),
+                "model_first_hop_seconds_avg": round(model_avg, 3) if model_avg is not None else None,
+                "local_seconds_total": round(self._local_seconds, 6),
+                "estimated_seconds_saved": round(local * model_avg - self._local_seconds, 3) if model_avg is not None else None,
+            }
+
+
+_query_expansion_stats: Optional[QueryExpansionStats] = None
+
+
+def get_query_expansion_stats() -> QueryExpansionStats:
+    """Return the process-wide query expansion statistics."""
+    global _query_expansion_stats
+    if _query_expansion_stats is None:
+        _query_expansion_stats = QueryExpansionStats()
+    return _query_expansion_stats
+
+
+def query_expansion_max_words() -> int:
+    """QUERY_EXPANSION_MAX_WORDS: questions with more words are left to the model (default 15)."""
+    return int(os.getenv("QUERY_EXPANSION_MAX_WORDS", "15"))
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+
+class SessionStore:
+    """
+    Thread-aware conversation sessions on top of a LangGraph checkpointer.
+
+    A session is a LangGraph thread. Follow-up questions on the same `thread_id` are appended to
+    the checkpointed conversation, so prior tool results are visible to the agent. Storage is
+    bounded in three ways:
+        - only the latest checkpoint of each thread is kept,
+        - the oldest turns are removed once the history exceeds `max_history_chars`,
+        - threads idle for more than `ttl_seconds` are deleted.
+
+    Turns on the same thread must be serialized with `thread_lock`, since pruning a thread
+    deletes and rewrites its checkpoint.
+    """
+
+    def __init__(
+        self,
+        checkpointer: BaseCheckpointSaver,
+        conn: Any = None,
+        ttl_seconds: float = 86400.0,
+        max_history_chars: int = 200_000,
+        cleanup_interval: float = 300.0,
+    ):
+        """
+        Args:
+            checkpointer (BaseCheckpointSaver): The LangGraph checkpointer the graph compiles with.
+            conn (aiosqlite.Connection): Connection of a SQLite checkpointer, used to persist thread
+                activity. Activity is kept in memory when omitted.
+            ttl_seconds (float): Idle time after which a thread is deleted.
+            max_history_chars (int): Maximum number of message characters kept per thread.
+            cleanup_interval (float): Minimum number of seconds between two expiry sweeps.
+        """
+        self.checkpointer = checkpointer
+        self.conn = conn
+        self.ttl_seconds = ttl_seconds
+        self.max_history_chars = max_history_chars
+        self.cleanup_interval = cleanup_interval
+        self._activity: Dict[str, float] = {}
+        self._last_cleanup = time.time()
+        self._thread_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def thread_lock(self, thread_id: str) -> asyncio.Lock:
+        """
+        Return the lock serializing turns on a thread.
+
+        Hold it from `prepare_input` through the graph invocation to `finish_turn`, so two
+        concurrent requests on the same thread cannot interleave and lose the conversation.
+        """
+        lock = self._thread_locks.get(thread_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._thread_locks[thread_id] = lock
+        return lock
+
+    async def setup(self) -> None:
+        """Create the thread activity table of a SQLite-backed store."""
+        if self.conn is not None:
+            await self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+            await self.conn.commit()
+
+    async def prepare_input(self, graph: Any, thread_id: str, question: str) -> Dict[str, List[Any]]:
+        """
+        Build the graph input for a new question on a thread.
+
+        If the checkpointed history plus the new question would exceed `max_history_chars`,
+        removals of the oldest turns are prepended so the `add_messages` reducer drops them.
+
+        Args:
+            graph: The compiled graph.
+            thread_id (str): The session thread id.
+            question (str): The new user question.
+        Returns:
+            Dict[str, List[Any]]: The input for `graph.ainvoke`.
+        """
+        state = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+        messages: List[BaseMessage] = state.values.get("messages", []) if state.values else []
+        removals = [RemoveMessage(id=m.id) for m in self.trim_history(messages, self.max_history_chars - len(question))]
+        return {"messages": removals + [("human", question)]}
+
+    @staticmethod
+    def trim_history(messages: List[BaseMessage], max_chars: int) -> List[BaseMessage]:
+        """
+        Select whole turns to remove, oldest first, until the history fits in `max_chars`.
+
+        A turn starts at a human message and holds the tool calls and answers that follow it, so
+        tool calls are never separated from their results.
+
+        Args:
+            messages (List[BaseMessage]): The checkpointed messages.
+            max_chars (int): Character budget for the history.
+        Returns:
+            List[BaseMessage]: The messages to remove (only those with an id can be removed).
+        """
+        total = sum(len(str(m.content)) for m in messages)
+        removed: List[BaseMessage] = []
+        i = 0
+        while total > max_chars and i < len(messages):
+            # Remove one turn: up to, not including, the next human message
+            j = i + 1
+            while j < len(messages) and not isinstance(messages[j], HumanMessage):
+                j += 1
+            for m in messages[i:j]:
+                total -= len(str(m.content))
+                if m.id:
+                    removed.append(m)
+            i = j
+        return removed
+
+    async def finish_turn(self, thread_id: str) -> None:
+        """
+        Keep only the latest checkpoint of a thread, record its activity and sweep expired threads.
+
+        Args:
+            thread_id (str): The session thread id.
+        """
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        latest = await self.checkpointer.aget_tuple(config)
+        if latest is not None and latest.parent_config is not None:
+            await self.checkpointer.adelete_thread(thread_id)
+            await self.checkpointer.aput(
+                config, latest.checkpoint, latest.metadata, latest.checkpoint["channel_versions"]
+            )
+        await self._touch(thread_id)
+
+        if time.time() - self._last_cleanup >= self.cleanup_interval:
+            await self.cleanup_expired()
+
+    async def _touch(self, thread_id: str) -> None:
+        now = time.time()
+        if self.conn is None:
+            self._activity[thread_id] = now
+            return
+        await self.conn.execute(
+            "INSERT INTO thread_activity (thread_id, updated_at) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (thread_id, now),
+        )
+        await self.conn.commit()
+
+    async def cleanup_expired(self) -> int:
+        """
+        Delete every thread idle for more than `ttl_seconds`.
+
+        Returns:
+            int: The number of deleted threads.
+        """
+        self._last_cleanup = time.time()
+        cutoff = self._last_cleanup - self.ttl_seconds
+        if self.conn is None:
+            expired = [thread_id for thread_id, updated_at in self._activity.items() if updated_at < cutoff]
+            for thread_id in expired:
+                del self._activity[thread_id]
+        else:
+            async with self.conn.execute(
+                "SELECT thread_id FROM thread_activity WHERE updated_at < ?", (cutoff,)
+            ) as cursor:
+                expired = [row[0] for row in await cursor.fetchall()]
+            await self.conn.execute("DELETE FROM thread_activity WHERE updated_at < ?", (cutoff,))
+            await self.conn.commit()
+
+        for thread_id in expired:
+            async with self.thread_lock(thread_id):
+                await self.checkpointer.adelete_thread(thread_id)
+        return len(expired)
+
+    async def aclose(self) -> None:
+        """Close the SQLite connection, if any. Call it at application shutdown."""
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+
+_session_store: Optional[SessionStore] = None
+_session_store_lock = asyncio.Lock()
+
+
+async def get_session_store(allowed_types: Iterable[type] = ()) -> SessionStore:
+    """
+    Return the process-wide session store, creating it on first use.
+
+    Configured with environment variables:
+        - CHECKPOINT_BACKEND: "sqlite" (default) for a durable SQLite file, or "memory".
+        - CHECKPOINT_DB_PATH: Path of the SQLite file (default "./checkpoints/checkpoints.sqlite").
+        - CHECKPOINT_TTL_SECONDS: Idle time after which a thread is deleted (default one day).
+        - CHECKPOINT_MAX_HISTORY_CHARS: Maximum message characters kept per thread (default 200000).
+
+    Args:
+        allowed_types (Iterable[type]): Application types stored in the graph state (e.g. the
+            structured output class), registered with the serializer so checkpoints holding them
+            can be deserialized under strict msgpack.
+    """
+    global _session_store
+    async with _session_store_lock:
+        if _session_store is not None:
+            return _session_store
+
+        serde = JsonPlusSerializer(allowed_msgpack_modules=list(allowed_types) or None)
+        settings = dict(
+            ttl_seconds=float(os.getenv("CHECKPOINT_TTL_SECONDS", "86400")),
+            max_history_chars=int(os.getenv("CHECKPOINT_MAX_HISTORY_CHARS", "200000")),
+        )
+        if os.getenv("CHECKPOINT_BACKEND", "sqlite").lower() == "memory":
+            store = SessionStore(MemorySaver(serde=serde), **settings)
+        else:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+            db_path = Path(os.getenv("CHECKPOINT_DB_PATH", "./checkpoints/checkpoints.sqlite"))
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = await aiosqlite.connect(str(db_path))
+            checkpointer = AsyncSqliteSaver(conn, serde=serde)
+            await checkpointer.setup()
+            store = SessionStore(checkpointer, conn=conn, **settings)
+
+        await store.setup()
+        _session_store = store
+        return _session_store
+
+
+async def close_session_store() -> None:
+    """Close the process-wide session store, if it was created."""
+    global _session_store
+    async with _session_store_lock:
+        if _session_store is not None:
+            await _session_store.aclose()
+            _session_store = None
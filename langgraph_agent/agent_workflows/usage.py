@@ -0,0 +1,221 @@
+import os
+import threading
+from collections import Counter, defaultdict, deque
+from typing import Any, Dict, Optional
+
+from langgraph_agent.agent_workflows.prompt_cache import cached_tokens
+
+# Credits of a Tavily search when the response does not report them: a basic-depth search
+TAVILY_DEFAULT_CREDITS = 1
+# Credits of each search depth, see `langgraph_agent.tools.search_effort`
+TAVILY_CREDITS_BY_DEPTH = {"basic": 1, "advanced": 2}
+
+LLM_COUNTERS = ("calls", "input_tokens", "output_tokens", "cached_tokens")
+
+
+def model_prices(tier: str) -> Optional[Dict[str, float]]:
+    """
+    Prices of a tier's deployment in USD per million tokens.
+
+    Configured with MODEL_PRICE_<TIER>_INPUT, MODEL_PRICE_<TIER>_CACHED_INPUT (default the input
+    price) and MODEL_PRICE_<TIER>_OUTPUT, e.g. MODEL_PRICE_REASONING_INPUT.
+
+    Returns:
+        Optional[Dict[str, float]]: The input, cached input and output prices, or None if the tier
+        has no input or output price.
+    """
+    prefix = f"MODEL_PRICE_{tier.upper()}_"
+    input_price, output_price = os.getenv(prefix + "INPUT"), os.getenv(prefix + "OUTPUT")
+    if input_price is None or output_price is None:
+        return None
+    return {
+        "input": float(input_price),
+        "cached_input": float(os.getenv(prefix + "CACHED_INPUT", input_price)),
+        "output": float(output_price),
+    }
+
+
+def estimate_cost(llm: Dict[str, Dict[str, Dict[str, float]]], tavily_credits: float) -> Optional[float]:
+    """
+    Estimated cost in USD of LLM calls and Tavily credits.
+
+    Args:
+        llm (Dict): The LLM counters, by stage and tier.
+        tavily_credits (float): The Tavily credits used.
+    Returns:
+        Optional[float]: The cost, or None if no price is configured. Tiers without a price count
+        for nothing; Tavily credits are priced with TAVILY_PRICE_PER_CREDIT.
+    """
+    cost, priced = 0.0, False
+    for tiers in llm.values():
+        for tier, counts in tiers.items():
+            prices = model_prices(tier)
+            if prices is None:
+                continue
+            priced = True
+            uncached = counts["input_tokens"] - counts["cached_tokens"]
+            cost += (
+                uncached * prices["input"] + counts["cached_tokens"] * prices["cached_input"] + counts["output_tokens"] * prices["output"]
+            ) / 1e6
+    credit_price = os.getenv("TAVILY_PRICE_PER_CREDIT")
+    if credit_price is not None:
+        priced = True
+        cost += tavily_credits * float(credit_price)
+    return round(cost, 6) if priced else None
+
+
+class RequestUsage:
+    """
+    Tokens, credits and wall time spent answering one request.
+
+    Every LLM call (search agent turns and the structured-output pass) and every Tavily query of the
+    request is recorded. The instance travels in the run config's `configurable`, under "usage",
+    where the nodes and tools find it.
+    """
+
+    def __init__(self):
+        self._llm: Dict[str, Dict[str, Counter]] = defaultdict(lambda: defaultdict(Counter))
+        self._tavily: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record_llm(self, stage: str, tier: Optional[str], seconds: float, usage: Optional[Dict[str, Any]]) -> None:
+        """
+        Record an LLM call.
+
+        Args:
+            stage (str): "search" or "respond".
+            tier (str): The tier of the model called, "reasoning" if unknown.
+            seconds (float): Wall time of the call.
+            usage (Dict[str, Any]): The response's `usage_metadata`, if the provider returned one.
+        """
+        with self._lock:
+            counts = self._llm[stage][tier or "reasoning"]
+            counts["calls"] += 1
+            counts["seconds"] += seconds
+            if usage:
+                counts["input_tokens"] += usage.get("input_tokens", 0)
+                counts["output_tokens"] += usage.get("output_tokens", 0)
+                counts["cached_tokens"] += cached_tokens(usage)
+
+    def record_search(self, seconds: float, response: Optional[Dict[str, Any]] = None, search_depth: Optional[str] = None) -> None:
+        """
+        Record a Tavily query.
+
+        Args:
+            seconds (float): Wall time of the query.
+            response (Dict[str, Any]): The Tavily response. Its reported credits are used when
+                present, the credits of `search_depth` otherwise. None for a query served from the
+                local index, which costs no credits.
+            search_depth (str): The Tavily search depth, basic if None.
+        """
+        with self._lock:
+            if response is None:
+                self._tavily["served_locally"] += 1
+                return
+            self._tavily["queries"] += 1
+            self._tavily["seconds"] += seconds
+            default_credits = TAVILY_CREDITS_BY_DEPTH.get(search_depth, TAVILY_DEFAULT_CREDITS)
+            self._tavily["credits"] += (response.get("usage") or {}).get("credits", default_credits)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Return the request's usage.
+
+        Returns:
+            Dict[str, Any]: The LLM calls, tokens and seconds, in total and by stage and tier, the
+            Tavily queries, credits and seconds, and the estimated cost (None without prices).
+        """
+        with self._lock:
+            by_stage = {
+                stage: {tier: {**{name: counts[name] for name in LLM_COUNTERS}, "seconds": round(counts["seconds"], 3)}
+                        for tier, counts in tiers.items()}
+                for stage, tiers in self._llm.items()
+            }
+            tavily = dict(self._tavily)
+        llm = {name: sum(counts[name] for tiers in by_stage.values() for counts in tiers.values()) for name in LLM_COUNTERS}
+        llm["seconds"] = round(sum(counts["seconds"] for tiers in by_stage.values() for counts in tiers.values()), 3)
+        return {
+            "llm": {**llm, "by_stage": by_stage},
+            "tavily": {
+                "queries": tavily.get("queries", 0),
+                "served_locally": tavily.get("served_locally", 0),
+                "credits": tavily.get("credits", 0),
+                "seconds": round(tavily.get("seconds", 0.0), 3),
+            },
+            "estimated_cost_usd": estimate_cost(by_stage, tavily.get("credits", 0)),
+        }
+
+
+class UsageTotals:
+    """
+    Usage of all requests since the process started, to find the stages and loops dominating spend.
+
+    Besides the totals by stage and tier, the spread of search turns and tokens per request is kept
+    over a window of recent requests.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window (int): Number of recent requests kept for the per-request figures.
+        """
+        self._requests = 0
+        self._llm: Dict[str, Dict[str, Counter]] = defaultdict(lambda: defaultdict(Counter))
+        self._tavily: Counter = Counter()
+        self._cost = 0.0
+        self._priced = False
+        self._recent: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, usage: Dict[str, Any]) -> None:
+        """
+        Add a request's usage.
+
+        Args:
+            usage (Dict[str, Any]): The request's `RequestUsage.summary`.
+        """
+        with self._lock:
+            self._requests += 1
+            for stage, tiers in usage["llm"]["by_stage"].items():
+                for tier, counts in tiers.items():
+                    self._llm[stage][tier].update(counts)
+            self._tavily.update(usage["tavily"])
+            if usage["estimated_cost_usd"] is not None:
+                self._priced = True
+                self._cost += usage["estimated_cost_usd"]
+            search_turns = sum(counts["calls"] for counts in usage["llm"]["by_stage"].get("search", {}).values())
+            tokens = usage["llm"]["input_tokens"] + usage["llm"]["output_tokens"]
+            self._recent.append((search_turns, tokens, usage["tavily"]["queries"]))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the request count, the totals by stage and tier, and the per-request averages and maxima."""
+        with self._lock:
+            recent = list(self._recent)
+            per_request = {}
+            for index, name in enumerate(("search_turns", "tokens", "tavily_queries")):
+                values = [entry[index] for entry in recent]
+                per_request[name] = {
+                    "avg": round(sum(values) / len(values), 2) if values else None,
+                    "max": max(values) if values else None,
+                }
+            return {
+                "requests": self._requests,
+                "llm": {
+                    stage: {tier: {name: round(value, 3) for name, value in counts.items()} for tier, counts in tiers.items()}
+                    for stage, tiers in self._llm.items()
+                },
+                "tavily": {name: round(value, 3) for name, value in self._tavily.items()},
+                "estimated_cost_usd": round(self._cost, 6) if self._priced else None,
+                "per_request": per_request,
+            }
+
+
+_usage_totals: Optional[UsageTotals] = None
+
+
+def get_usage_totals() -> UsageTotals:
+    """Return the process-wide usage totals."""
+    global _usage_totals
+    if _usage_totals is None:
+        _usage_totals = UsageTotals()
+    return _usage_totals
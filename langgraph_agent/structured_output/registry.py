@@ -0,0 +1,133 @@
+import inspect
+import threading
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, TypeAdapter
+
+
+@dataclass(frozen=True)
+class CompiledOutputModel:
+    """The precompiled artefacts of a structured output model."""
+    model: Type[BaseModel]
+    title: str
+    json_schema: Dict[str, Any]
+    adapter: TypeAdapter
+
+    def validate(self, data: Any) -> BaseModel:
+        """Validate a dict (or model instance) against the output model."""
+        return self.adapter.validate_python(data)
+
+    def validate_json(self, data: Union[str, bytes]) -> BaseModel:
+        """Validate a JSON document against the output model."""
+        return self.adapter.validate_json(data)
+
+
+class StructuredOutputRegistry:
+    """
+    Process-wide registry of structured output models.
+
+    Each model's JSON schema and TypeAdapter are built once at registration, and structured-output
+    runnables are bound once per (chat model key, output model), so none of it is repeated on the
+    request path. Models are looked up by class or by schema title.
+    """
+
+    def __init__(self):
+        self._by_model: Dict[Type[BaseModel], CompiledOutputModel] = {}
+        self._by_title: Dict[str, CompiledOutputModel] = {}
+        self._bindings: Dict[Tuple[Hashable, Type[BaseModel], Tuple], Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, model: Type[BaseModel]) -> CompiledOutputModel:
+        """
+        Compile and register an output model. Registering a model twice is a no-op.
+
+        Args:
+            model (Type[BaseModel]): The Pydantic output model.
+        Returns:
+            CompiledOutputModel: The compiled model.
+        Raises:
+            ValueError: If a different model is already registered under the same title.
+        """
+        compiled = self._by_model.get(model)
+        if compiled is not None:
+            return compiled
+
+        json_schema = model.model_json_schema()
+        title = json_schema.get("title", model.__name__)
+        compiled = CompiledOutputModel(model=model, title=title, json_schema=json_schema, adapter=TypeAdapter(model))
+        with self._lock:
+            existing = self._by_title.get(title)
+            if existing is not None and existing.model is not model:
+                raise ValueError(f"Output model title '{title}' is already registered by {existing.model.__name__}.")
+            self._by_model[model] = compiled
+            self._by_title[title] = compiled
+        return compiled
+
+    def register_module(self, module: ModuleType) -> List[CompiledOutputModel]:
+        """
+        Register every Pydantic model defined in a module, e.g. `structured_outputs`.
+
+        Args:
+            module (ModuleType): The module holding the output models.
+        Returns:
+            List[CompiledOutputModel]: The compiled models, in definition order.
+        """
+        return [
+            self.register(obj)
+            for obj in vars(module).values()
+            if inspect.isclass(obj) and issubclass(obj, BaseModel) and obj.__module__ == module.__name__
+        ]
+
+    def get(self, key: Union[Type[BaseModel], str]) -> CompiledOutputModel:
+        """
+        Look up a compiled model by class (registering it if needed) or by schema title.
+
+        Raises:
+            KeyError: If no model is registered under the given title.
+        """
+        if isinstance(key, str):
+            return self._by_title[key]
+        return self.register(key)
+
+    def bind(self, chat_model: Any, key: Union[Type[BaseModel], str], chat_model_key: Optional[Hashable] = None, **kwargs: Any) -> Any:
+        """
+        Return `chat_model.with_structured_output(model)`, binding it only once.
+
+        The bound runnable is cached under `chat_model_key`, which must identify the chat model's
+        configuration (endpoint, deployment, API version, API key, HTTP client, ...), so a chat model
+        rebuilt per request with the same configuration reuses the first binding, and one rebuilt
+        with other credentials or another client gets a new one.
+
+        Args:
+            chat_model: The LangChain chat model.
+            key (Union[Type[BaseModel], str]): The output model class or title.
+            chat_model_key (Hashable): Cache key of the chat model configuration, the chat model's
+                identity if omitted.
+            **kwargs: Extra arguments for `with_structured_output`.
+        Returns:
+            The structured-output runnable.
+        """
+        compiled = self.get(key)
+        cache_key = (chat_model_key if chat_model_key is not None else id(chat_model), compiled.model, tuple(sorted(kwargs.items())))
+        runnable = self._bindings.get(cache_key)
+        if runnable is None:
+            runnable = chat_model.with_structured_output(compiled.model, **kwargs)
+            with self._lock:
+                runnable = self._bindings.setdefault(cache_key, runnable)
+        return runnable
+
+    def clear_bindings(self) -> None:
+        """Drop the bound runnables, e.g. once the HTTP client of their chat models is closed."""
+        with self._lock:
+            self._bindings.clear()
+
+    def __contains__(self, key: Union[Type[BaseModel], str]) -> bool:
+        return key in self._by_title if isinstance(key, str) else key in self._by_model
+
+    def __len__(self) -> int:
+        return len(self._by_model)
+
+
+structured_output_registry = StructuredOutputRegistry()
@@ -0,0 +1,158 @@
+from typing import Any, Dict, List, Type, Union
+
+from langchain_core.utils.json import parse_partial_json
+from pydantic import BaseModel
+
+from langgraph_agent.structured_output.registry import structured_output_registry
+
+
+class StructuredOutputStream:
+    """
+    Incremental parser of a structured output streamed as JSON text.
+
+    Feed it the model's output as it arrives; it returns events as soon as parts of the output are
+    syntactically complete:
+        - {"event": "delta", "field": name, "text": ...}: new text of a top-level string field,
+        - {"event": "item", "field": name, "index": i, "value": ...}: a complete element of a
+          top-level list field, e.g. one of the `sources`,
+        - {"event": "field_done", "field": name}: a top-level field is complete.
+    `finish` validates the whole output against the output model.
+
+    A small scanner follows the JSON structure (strings, escapes and nesting) to know which values
+    are closed; the values themselves are read with LangChain's partial JSON parser.
+    """
+
+    def __init__(self, output_class: Union[Type[BaseModel], str]):
+        """
+        Args:
+            output_class (Union[Type[BaseModel], str]): The output model class or schema title.
+        """
+        self.compiled = structured_output_registry.get(output_class)
+        self.buffer = ""
+        self._in_string = False
+        self._escape = False
+        self._stack: List[str] = []
+        self._expecting_key = False
+        self._key_chars: List[str] = []
+        self._key = None
+        self._scalar_pending = False
+        self._completed_items: Dict[str, int] = {}
+        self._done_fields: List[str] = []
+        self._emitted_items: Dict[str, int] = {}
+        self._emitted_text: Dict[str, str] = {}
+        self._reported_done: set = set()
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Add a chunk of the output.
+
+        Args:
+            text (str): The next characters of the JSON output.
+        Returns:
+            List[Dict[str, Any]]: The events the chunk completes, possibly none.
+        """
+        if not text:
+            return []
+        self.buffer += text
+        for char in text:
+            self._scan(char)
+        return self._events()
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Validate the complete output.
+
+        Returns:
+            Dict[str, Any]: The "final" event with the validated output as a dict.
+        Raises:
+            pydantic.ValidationError: If the output is not a valid instance of the output model.
+        """
+        output = self.compiled.validate_json(self.buffer)
+        return {"event": "final", "output": output.model_dump()}
+
+    def _scan(self, char: str) -> None:
+        depth = len(self._stack)
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                self._close_string(depth)
+                return
+            if depth == 1 and self._expecting_key:
+                self._key_chars.append(char)
+            return
+
+        if char == '"':
+            self._in_string = True
+            if depth == 1 and self._expecting_key:
+                self._key_chars = []
+        elif char in "{[":
+            self._stack.append(char)
+            if depth == 0:
+                self._expecting_key = True
+        elif char in "}]":
+            self._end_scalar(depth)
+            if self._stack:
+                self._stack.pop()
+            self._close_container(len(self._stack))
+        elif char == ",":
+            self._end_scalar(depth)
+            if depth == 1:
+                self._expecting_key = True
+        elif char == ":":
+            pass
+        elif not char.isspace() and depth in (1, 2):
+            # A number, true, false or null
+            self._scalar_pending = True
+
+    def _close_string(self, depth: int) -> None:
+        if depth == 1:
+            if self._expecting_key:
+                self._key = "".join(self._key_chars)
+                self._expecting_key = False
+            else:
+                self._done_fields.append(self._key)
+        elif depth == 2 and self._stack[-1] == "[":
+            self._completed_items[self._key] = self._completed_items.get(self._key, 0) + 1
+
+    def _close_container(self, depth: int) -> None:
+        # `depth` is the nesting level once the container is closed
+        if depth == 1:
+            self._done_fields.append(self._key)
+        elif depth == 2 and self._stack[-1] == "[":
+            self._completed_items[self._key] = self._completed_items.get(self._key, 0) + 1
+
+    def _end_scalar(self, depth: int) -> None:
+        if not self._scalar_pending:
+            return
+        self._scalar_pending = False
+        if depth == 1:
+            self._done_fields.append(self._key)
+        elif depth == 2 and self._stack[-1] == "[":
+            self._completed_items[self._key] = self._completed_items.get(self._key, 0) + 1
+
+    def _events(self) -> List[Dict[str, Any]]:
+        parsed = parse_partial_json(self.buffer)
+        if not isinstance(parsed, dict):
+            return []
+        events = []
+        for field, value in parsed.items():
+            if isinstance(value, str):
+                emitted = self._emitted_text.get(field, "")
+                # A partial escape sequence can make the parsed text shrink: wait until it grows again
+                if len(value) > len(emitted) and value.startswith(emitted):
+                    events.append({"event": "delta", "field": field, "text": value[len(emitted):]})
+                    self._emitted_text[field] = value
+            elif isinstance(value, list):
+                start = self._emitted_items.get(field, 0)
+                end = min(self._completed_items.get(field, 0), len(value))
+                for index in range(start, end):
+                    events.append({"event": "item", "field": field, "index": index, "value": value[index]})
+                self._emitted_items[field] = max(start, end)
+            if field in self._done_fields and field not in self._reported_done:
+                self._reported_done.add(field)
+                events.append({"event": "field_done", "field": field})
+        return events
@@ -0,0 +1,180 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+
+class BlobStore:
+    """
+    Content-addressed store of large tool results, kept out of the graph state.
+
+    Blobs are keyed by the SHA-256 of their content, so identical results are stored once across
+    requests. The most recently used blobs stay in memory up to `max_memory_bytes`; older ones
+    spill to files under `spill_dir`, which are deleted oldest first beyond `max_disk_bytes`. Files
+    spilled by earlier processes are counted against the disk budget from the start.
+    Thread-safe: callers on the event loop should use it through `asyncio.to_thread`.
+    """
+
+    def __init__(self, spill_dir: str, max_memory_bytes: int = 64 * 2**20, max_disk_bytes: int = 2**30):
+        """
+        Args:
+            spill_dir (str): Directory of the spilled blobs.
+            max_memory_bytes (int): Memory budget of the blobs held in memory.
+            max_disk_bytes (int): Disk budget of the spilled blobs.
+        """
+        self.spill_dir = Path(spill_dir)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_sizes: Dict[str, int] = {}
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"puts": 0, "dedup_hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "spilled": 0}
+        self._load_spilled()
+
+    def put(self, content: str) -> str:
+        """
+        Store a blob.
+
+        Args:
+            content (str): The blob.
+        Returns:
+            str: Its key.
+        """
+        data = content.encode("utf-8")
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._counters["puts"] += 1
+            if key in self._memory:
+                self._counters["dedup_hits"] += 1
+                self._memory.move_to_end(key)
+                return key
+            self._memory[key] = content
+            self._memory_sizes[key] = len(data)
+            self._memory_bytes += len(data)
+            self._spill()
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Load a blob, from memory or from disk.
+
+        Returns:
+            Optional[str]: The blob, or None if it was never stored or has been evicted.
+        """
+        with self._lock:
+            content = self._memory.get(key)
+            if content is not None:
+                self._counters["memory_hits"] += 1
+                self._memory.move_to_end(key)
+                return content
+            path = self._path(key)
+            # Blobs spilled by an earlier process are still found by key
+            if not path.exists():
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            return path.read_text(encoding="utf-8")
+
+    def _path(self, key: str) -> Path:
+        return self.spill_dir / key[:2] / key
+
+    def _load_spilled(self) -> None:
+        # Seed the disk index with the blobs left by earlier processes, oldest first, so they are
+        # evicted within the disk budget like the ones spilled by this process
+        paths = [path for path in self.spill_dir.glob("??/*") if path.is_file() and path.parent.name == path.name[:2]]
+        for path in sorted(paths, key=lambda path: path.stat().st_mtime):
+            size = path.stat().st_size
+            self._disk[path.name] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _spill(self) -> None:
+        # Move the least recently used blobs to disk until the memory budget is met
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            key, content = self._memory.popitem(last=False)
+            size = self._memory_sizes.pop(key)
+            self._memory_bytes -= size
+            path = self._path(key)
+            if key not in self._disk:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(content, encoding="utf-8")
+                self._disk[key] = size
+                self._disk_bytes += size
+                self._counters["spilled"] += 1
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        # Delete the oldest spilled blobs until the disk budget is met
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the blob counts, sizes and hit counters."""
+        with self._lock:
+            return {
+                "memory_blobs": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_blobs": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                **self._counters,
+            }
+
+
+def blob_ref(key: str, content: str) -> Dict[str, Any]:
+    """The compact reference to a blob kept in a ToolMessage's artifact."""
+    return {"blob_key": key, "bytes": len(content.encode("utf-8"))}
+
+
+def materialize_tool_messages(messages: Sequence[BaseMessage], blob_store: Optional["BlobStore"] = None) -> List[BaseMessage]:
+    """
+    Replace the condensed view of out-of-band tool results with their full content.
+
+    The graph state is not modified: copies of the ToolMessages are returned. A result whose blob
+    was evicted keeps its condensed view.
+
+    Args:
+        messages (Sequence[BaseMessage]): The graph state's messages.
+        blob_store (BlobStore): The store holding the blobs, the process-wide one if omitted.
+    Returns:
+        List[BaseMessage]: The messages, with the full tool results.
+    """
+    blob_store = blob_store or get_blob_store()
+    materialized = []
+    for message in messages:
+        key = message.artifact.get("blob_key") if isinstance(message, ToolMessage) and isinstance(message.artifact, dict) else None
+        content = blob_store.get(key) if key else None
+        materialized.append(message.model_copy(update={"content": content}) if content is not None else message)
+    return materialized
+
+
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """
+    Return the process-wide blob store of tool results.
+
+    Configured with environment variables:
+        - TOOL_BLOB_DIR: Directory of the spilled blobs (default ./tool_blobs).
+        - TOOL_BLOB_MAX_MEMORY_BYTES: Memory budget (default 64 MiB).
+        - TOOL_BLOB_MAX_DISK_BYTES: Disk budget (default 1 GiB).
+    """
+    global _blob_store
+    with _blob_store_lock:
+        if _blob_store is None:
+            _blob_store = BlobStore(
+                spill_dir=os.getenv("TOOL_BLOB_DIR", "./tool_blobs"),
+                max_memory_bytes=int(os.getenv("TOOL_BLOB_MAX_MEMORY_BYTES", str(64 * 2**20))),
+                max_disk_bytes=int(os.getenv("TOOL_BLOB_MAX_DISK_BYTES", str(2**30))),
+            )
+        return _blob_store
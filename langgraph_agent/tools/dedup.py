@@ -0,0 +1,163 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Mersenne prime 2**31 - 1: with 31-bit hash values and coefficients the products fit in uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+class MinHashDeduplicator:
+    """
+    Near-duplicate detector for search results based on MinHash with LSH banding.
+
+    Each result's content is shingled into word n-grams and summarized by a MinHash signature.
+    Signatures are split into `bands` bands of `rows` rows; results sharing any band bucket are
+    candidate pairs, which are confirmed when their estimated Jaccard similarity reaches
+    `threshold`. Confirmed pairs are merged into clusters with union-find.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3, threshold: float = 0.7, seed: int = 1):
+        """
+        Args:
+            num_perm (int): Number of hash permutations in a signature, must be divisible by `bands`.
+            bands (int): Number of LSH bands.
+            shingle_size (int): Number of words per shingle.
+            threshold (float): Minimum estimated Jaccard similarity for two results to be duplicates.
+            seed (int): Seed of the permutation coefficients.
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands}).")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Hash the word n-grams of a text into an array of 31-bit integers."""
+        words = re.findall(r"\w+", text.lower())
+        n = self.shingle_size
+        grams = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        return np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) & 0x7FFFFFFF for gram in grams),
+            dtype=np.uint64,
+            count=len(grams),
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a text."""
+        hashes = (self._a * self.shingles(text)[None, :] + self._b) % _PRIME
+        return hashes.min(axis=1)
+
+    def cluster(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group near-identical texts. Texts without any word are each left in their own cluster.
+
+        Args:
+            texts (List[str]): Texts to compare.
+        Returns:
+            List[List[int]]: Clusters of indices into `texts`, each sorted, in order of first member.
+        """
+        # Texts without words have no shingles to compare: they are never duplicates
+        signatures = [self.signature(text) if re.search(r"\w", text) else None for text in texts]
+
+        # LSH banding: texts sharing a band bucket are candidate duplicates
+        buckets: Dict[Any, List[int]] = defaultdict(list)
+        for i, sig in enumerate(signatures):
+            if sig is None:
+                continue
+            for band in range(self.bands):
+                buckets[(band, sig[band * self.rows:(band + 1) * self.rows].tobytes())].append(i)
+
+        parent = list(range(len(texts)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        checked = set()
+        for members in buckets.values():
+            for j in members[1:]:
+                i = members[0]
+                if (i, j) in checked or find(i) == find(j):
+                    continue
+                checked.add((i, j))
+                similarity = float(np.mean(signatures[i] == signatures[j]))
+                if similarity >= self.threshold:
+                    parent[find(j)] = find(i)
+
+        clusters: Dict[int, List[int]] = defaultdict(list)
+        for i in range(len(texts)):
+            clusters[find(i)].append(i)
+        return sorted(clusters.values(), key=lambda members: members[0])
+
+
+_deduplicator: Optional[MinHashDeduplicator] = None
+
+
+def _cluster_results(results: List[Dict[str, Any]], deduplicator: Optional[MinHashDeduplicator]) -> List[List[int]]:
+    """Cluster results by title and content, with the highest scoring result first in each cluster."""
+    global _deduplicator
+    if deduplicator is None:
+        if _deduplicator is None:
+            _deduplicator = MinHashDeduplicator()
+        deduplicator = _deduplicator
+
+    texts = [f"{result.get('title') or ''} {result.get('content') or ''}" for result in results]
+    return [
+        sorted(members, key=lambda i: -(results[i].get("score") or 0.0))
+        for members in deduplicator.cluster(texts)
+    ]
+
+
+def _merge_cluster(results: List[Dict[str, Any]], members: List[int]) -> Dict[str, Any]:
+    """Return the cluster representative with the URLs of every member as `sources`."""
+    sources = list(dict.fromkeys(results[i]["url"] for i in members if results[i].get("url")))
+    return {**results[members[0]], "sources": sources}
+
+
+def dedup_results(results: List[Dict[str, Any]], deduplicator: Optional[MinHashDeduplicator] = None) -> List[Dict[str, Any]]:
+    """
+    Keep one representative per cluster of near-duplicate search results.
+
+    The representative is the result with the highest Tavily score, and it gets a `sources`
+    field listing the URLs of every result in its cluster.
+
+    Args:
+        results (List[Dict[str, Any]]): Tavily results with `url`, `content` and `score` fields.
+        deduplicator (MinHashDeduplicator): Optional detector, a shared default one is used if omitted.
+    Returns:
+        List[Dict[str, Any]]: The representatives, in order of their cluster's first result.
+    """
+    return [_merge_cluster(results, members) for members in _cluster_results(results, deduplicator)]
+
+
+def dedup_responses(responses: List[Dict[str, Any]], deduplicator: Optional[MinHashDeduplicator] = None) -> List[Dict[str, Any]]:
+    """
+    Remove near-duplicate results across several Tavily responses.
+
+    Results are compared across all responses; each representative stays in the response it
+    came from and responses keep their other fields.
+
+    Args:
+        responses (List[Dict[str, Any]]): Raw Tavily search responses.
+        deduplicator (MinHashDeduplicator): Optional detector, a shared default one is used if omitted.
+    Returns:
+        List[Dict[str, Any]]: The responses with near-duplicate results removed.
+    """
+    origins = [n for n, response in enumerate(responses) for _ in response.get("results", [])]
+    results = [result for response in responses for result in response.get("results", [])]
+
+    kept: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for members in _cluster_results(results, deduplicator):
+        kept[origins[members[0]]].append(_merge_cluster(results, members))
+
+    return [{**response, "results": kept.get(n, [])} for n, response in enumerate(responses)]
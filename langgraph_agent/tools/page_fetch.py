@@ -0,0 +1,320 @@
+import asyncio
+import codecs
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+
+# Tags whose content is never part of the main text of a page
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe",
+    "nav", "header", "footer", "aside", "form", "button", "select",
+}
+
+# Tags that delimit a block of text
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr", "td", "th",
+    "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6", "br", "dd", "dt", "figcaption",
+}
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+class MainContentExtractor(HTMLParser):
+    """
+    Incremental HTML parser that keeps the main text of a page.
+
+    The parser is fed chunk by chunk as bytes arrive from the network, so the full
+    document is never materialized as a DOM. Boilerplate containers (scripts, navigation,
+    headers, footers, forms, ...) are skipped and short text blocks are dropped.
+    """
+
+    def __init__(self, min_block_words: int = 5, max_chars: int = 8000):
+        """
+        Args:
+            min_block_words (int): Minimum number of words for a non-heading block to be kept.
+            max_chars (int): Maximum number of characters of text to keep.
+        """
+        super().__init__(convert_charrefs=True)
+        self.min_block_words = min_block_words
+        self.max_chars = max_chars
+        self.title = ""
+        self.blocks: List[str] = []
+        self._chars = 0
+        self._skip_depth = 0
+        self._in_title = False
+        self._is_heading = False
+        self._current: List[str] = []
+
+    @property
+    def is_full(self) -> bool:
+        """Whether the extractor already holds `max_chars` characters of text."""
+        return self._chars >= self.max_chars
+
+    def handle_starttag(self, tag: str, attrs: List[Any]) -> None:
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title" and not self.title:
+            self._in_title = True
+        elif tag in BLOCK_TAGS:
+            self._flush()
+            self._is_heading = tag in HEADING_TAGS
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title += data.strip()
+            return
+        if self._skip_depth or self.is_full:
+            return
+        text = data.strip()
+        if text:
+            self._current.append(text)
+
+    def _flush(self) -> None:
+        """Close the current text block, keeping it only if it looks like content."""
+        if not self._current:
+            return
+        block = " ".join(self._current)
+        self._current = []
+        if not self._is_heading and len(block.split()) < self.min_block_words:
+            return
+        remaining = self.max_chars - self._chars
+        if remaining <= 0:
+            return
+        block = block[:remaining]
+        self.blocks.append(block)
+        self._chars += len(block)
+
+    def get_text(self) -> str:
+        """Return the extracted main text, one block per line."""
+        self._flush()
+        return "\n".join(self.blocks)
+
+
+@dataclass
+class CachedPage:
+    """A fetched page held in the `PageCache`."""
+    url: str
+    title: str
+    text: str
+    etag: Optional[str] = None
+    truncated: bool = False
+    fetched_at: float = field(default_factory=time.monotonic)
+
+
+class PageCache:
+    """
+    Bounded LRU cache of extracted pages keyed by URL.
+
+    Entries with an ETag are revalidated with a conditional request; entries without one
+    are served as-is until `ttl` seconds have passed.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 900.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedPage]" = OrderedDict()
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        page = self._entries.get(url)
+        if page is not None:
+            self._entries.move_to_end(url)
+        return page
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        """Whether a page can be served without contacting the origin."""
+        return page.etag is None and time.monotonic() - page.fetched_at < self.ttl
+
+    def put(self, page: CachedPage) -> None:
+        self._entries[page.url] = page
+        self._entries.move_to_end(page.url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PageFetcher:
+    """
+    Fetches a batch of URLs concurrently over a pooled HTTP client and extracts their main text.
+
+    Every fetch is bounded by `max_bytes` of body and `timeout` seconds of wall time, and the
+    number of requests in flight is bounded by `max_concurrency`.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 512_000,
+        timeout: float = 5.0,
+        max_concurrency: int = 8,
+        max_chars: int = 8000,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[PageCache] = None,
+    ):
+        """
+        Args:
+            max_bytes (int): Maximum number of body bytes read per page.
+            timeout (float): Maximum number of seconds spent on a single page.
+            max_concurrency (int): Maximum number of pages fetched at the same time.
+            max_chars (int): Maximum number of characters of extracted text kept per page.
+            client (httpx.AsyncClient): Optional HTTP client, a pooled client is created if omitted.
+            cache (PageCache): Optional page cache, a new one is created if omitted.
+        """
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self.client = client or httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_concurrency * 2, max_keepalive_connections=max_concurrency),
+            headers={"User-Agent": "websearch-agent/1.0"},
+        )
+        self.cache = cache or PageCache()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_many(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Fetch and extract several pages concurrently.
+
+        Args:
+            urls (List[str]): URLs to fetch, duplicates are fetched once.
+        Returns:
+            List[Dict[str, Any]]: One result per unique URL, in input order.
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        return await asyncio.gather(*(self.fetch(url) for url in unique_urls))
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """
+        Fetch a page and extract its main text, never raising on network errors.
+
+        Args:
+            url (str): URL of the page.
+        Returns:
+            Dict[str, Any]: The url, title, extracted content and whether it came from cache,
+            or the url and an error message.
+        """
+        cached = self.cache.get(url)
+        if cached is not None and self.cache.is_fresh(cached):
+            return self._as_result(cached, from_cache=True)
+
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(self._fetch(url, cached), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                return {"url": url, "error": f"timed out after {self.timeout}s"}
+            except httpx.HTTPError as e:
+                return {"url": url, "error": f"{type(e).__name__}: {e}"}
+
+    async def _fetch(self, url: str, cached: Optional[CachedPage]) -> Dict[str, Any]:
+        headers = {}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                cached.fetched_at = time.monotonic()
+                return self._as_result(cached, from_cache=True)
+            if response.status_code >= 400:
+                return {"url": url, "error": f"HTTP {response.status_code}"}
+            content_type = response.headers.get("content-type", "")
+            if content_type and "html" not in content_type and "text" not in content_type:
+                return {"url": url, "error": f"unsupported content type {content_type}"}
+
+            # Decode and parse chunk by chunk, stopping at the byte cap
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            parser = MainContentExtractor(max_chars=self.max_chars)
+            received = 0
+            truncated = False
+            async for chunk in response.aiter_bytes():
+                chunk = chunk[: self.max_bytes - received]
+                received += len(chunk)
+                parser.feed(decoder.decode(chunk))
+                if received >= self.max_bytes or parser.is_full:
+                    truncated = True
+                    break
+            parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+
+            page = CachedPage(
+                url=url,
+                title=parser.title,
+                text=parser.get_text(),
+                etag=response.headers.get("etag"),
+                truncated=truncated,
+            )
+
+        self.cache.put(page)
+        return self._as_result(page, from_cache=False)
+
+    @staticmethod
+    def _as_result(page: CachedPage, from_cache: bool) -> Dict[str, Any]:
+        return {
+            "url": page.url,
+            "title": page.title,
+            "content": page.text,
+            "truncated": page.truncated,
+            "from_cache": from_cache,
+        }
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client."""
+        await self.client.aclose()
+
+
+def select_top_urls(responses: List[Dict[str, Any]], top_k: int) -> List[str]:
+    """
+    Pick the `top_k` highest scoring result URLs across several Tavily responses.
+
+    Args:
+        responses (List[Dict[str, Any]]): Raw Tavily search responses.
+        top_k (int): Number of URLs to return.
+    Returns:
+        List[str]: Unique URLs ordered by descending Tavily score.
+    """
+    results = [result for response in responses for result in response.get("results", [])]
+    results.sort(key=lambda result: result.get("score") or 0.0, reverse=True)
+    urls = list(dict.fromkeys(result["url"] for result in results if result.get("url")))
+    return urls[:top_k]
+
+
+_page_fetcher: Optional[PageFetcher] = None
+
+
+def get_page_fetcher() -> PageFetcher:
+    """
+    Return the process-wide page fetcher, so every request shares one connection pool and cache.
+
+    Limits are read from the PAGE_FETCH_MAX_BYTES, PAGE_FETCH_TIMEOUT and
+    PAGE_FETCH_CONCURRENCY environment variables.
+    """
+    global _page_fetcher
+    if _page_fetcher is None:
+        _page_fetcher = PageFetcher(
+            max_bytes=int(os.getenv("PAGE_FETCH_MAX_BYTES", "512000")),
+            timeout=float(os.getenv("PAGE_FETCH_TIMEOUT", "5.0")),
+            max_concurrency=int(os.getenv("PAGE_FETCH_CONCURRENCY", "8")),
+        )
+    return _page_fetcher
+
+
+async def close_page_fetcher() -> None:
+    """Close the process-wide page fetcher's connections, if it was created. Call it at application shutdown."""
+    global _page_fetcher
+    if _page_fetcher is not None:
+        await _page_fetcher.aclose()
+    _page_fetcher = None
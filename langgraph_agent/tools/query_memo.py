@@ -0,0 +1,130 @@
+import copy
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Words that do not change what a query searches for
+FILLER_WORDS = frozenset("a an the of in on for to and or with about is are what how".split())
+
+# Rough size of a token in characters, to estimate the tokens a suppressed result would have cost
+CHARS_PER_TOKEN = 4
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query so trivial rewordings of it compare equal: case, punctuation, word order,
+    filler words and plural "s" are ignored.
+    """
+    words = set()
+    for word in WORD.findall(query.lower()):
+        if word in FILLER_WORDS:
+            continue
+        words.add(word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word)
+    return " ".join(sorted(words))
+
+
+class QueryMemo:
+    """
+    Search results already obtained during one request.
+
+    The search loop often re-issues a query, or a trivial rewording of it, on a later turn. The memo
+    serves such repeats from the first response instead of calling Tavily again. `web_search` stores
+    a call's responses once the call is done, so the queries of one call never serve each other.
+    Results whose URL was sent to the model by an earlier `web_search` call of the request are
+    replaced by a short "already provided" marker, in both the condensed view and the stored full
+    results.
+    """
+
+    def __init__(self):
+        self._responses: Dict[str, Dict[str, Any]] = {}
+        self._provided_urls = set()
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a copy of the response of an earlier query normalizing to the same words, or None.
+
+        The copy is marked `"served_from": "query_memo"` and keeps the query as asked.
+        """
+        with self._lock:
+            response = self._responses.get(normalize_query(query))
+            if response is None:
+                return None
+            self._counts["suppressed_calls"] += 1
+        return {**copy.deepcopy(response), "query": query, "served_from": "query_memo"}
+
+    def store(self, query: str, response: Dict[str, Any]) -> None:
+        """Remember a query's response; a later response for the same normalized query replaces it."""
+        with self._lock:
+            self._responses[normalize_query(query)] = response
+
+    def mark_provided(self, responses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replace the results the model already received by an "already provided" marker.
+
+        Args:
+            responses (List[Dict[str, Any]]): The responses of a `web_search` call.
+        Returns:
+            List[Dict[str, Any]]: Copies of the responses. Their URLs count as provided for the
+            following calls.
+        """
+        marked, urls = [], set()
+        with self._lock:
+            for response in responses:
+                results = []
+                for result in response.get("results", []):
+                    url = result.get("url")
+                    if url and url in self._provided_urls:
+                        results.append({"url": url, "title": result.get("title", ""), "already_provided": True})
+                        self._counts["suppressed_results"] += 1
+                        self._counts["suppressed_tokens"] += len(str(result)) // CHARS_PER_TOKEN
+                    else:
+                        results.append(result)
+                        if url:
+                            urls.add(url)
+                marked.append({**response, "results": results} if "results" in response else response)
+            self._provided_urls |= urls
+        return marked
+
+    def summary(self) -> Dict[str, int]:
+        """Return the suppressed Tavily calls and results, and the estimated tokens they would have cost."""
+        with self._lock:
+            return {key: self._counts[key] for key in ("suppressed_calls", "suppressed_results", "suppressed_tokens")}
+
+
+class QueryMemoTotals:
+    """Process-wide totals of the query memos of finished requests."""
+
+    def __init__(self):
+        self._requests = 0
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, summary: Dict[str, int]) -> None:
+        """Add a request's `QueryMemo.summary`."""
+        with self._lock:
+            self._requests += 1
+            self._counts.update(summary)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the request count and the suppressed calls, results and tokens."""
+        with self._lock:
+            return {
+                "requests": self._requests,
+                **{key: self._counts[key] for key in ("suppressed_calls", "suppressed_results", "suppressed_tokens")},
+            }
+
+
+_query_memo_totals: Optional[QueryMemoTotals] = None
+
+
+def get_query_memo_totals() -> QueryMemoTotals:
+    """Return the process-wide query memo totals."""
+    global _query_memo_totals
+    if _query_memo_totals is None:
+        _query_memo_totals = QueryMemoTotals()
+    return _query_memo_totals
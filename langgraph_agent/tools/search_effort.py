@@ -0,0 +1,266 @@
+import os
+import statistics
+import threading
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class EffortLevel:
+    """
+    Tavily settings of a search effort level.
+
+    Attributes:
+        name (str): Level name, reported in the metrics.
+        search_depth (str): Tavily search depth; an advanced search costs 2 credits, a basic one 1.
+        max_results (int): Results per query.
+        max_queries (int): Number of the model's queries searched, all of them if None.
+        include_raw_content (bool): Return each result page's full text.
+    """
+    name: str
+    search_depth: str
+    max_results: int
+    max_queries: Optional[int] = None
+    include_raw_content: bool = False
+
+    def search_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments of `AsyncTavilyClient.search` for this level."""
+        return {
+            "search_depth": self.search_depth,
+            "max_results": self.max_results,
+            "include_raw_content": self.include_raw_content,
+            "include_usage": True,
+        }
+
+
+# From cheapest to most thorough: a search starts at the first level and escalates while the results fall short
+EFFORT_LEVELS = (
+    EffortLevel("light", "basic", max_results=3, max_queries=2),
+    EffortLevel("standard", "basic", max_results=5),
+    EffortLevel("deep", "advanced", max_results=5),
+    EffortLevel("full", "advanced", max_results=5, include_raw_content=True),
+)
+
+
+@dataclass
+class EffortConfig:
+    """
+    Settings of the search effort controller.
+
+    Attributes:
+        min_score (float): Tavily relevance score from which a result counts as relevant.
+        min_relevant_results (int): Distinct relevant result URLs needed to stop escalating.
+        min_query_coverage (float): Share of the searched queries that need a relevant result.
+        max_level (int): Index in `EFFORT_LEVELS` of the highest level a search may reach.
+        raw_content_chars (int): Characters kept of each result's raw content.
+    """
+    min_score: float = 0.5
+    min_relevant_results: int = 3
+    min_query_coverage: float = 0.5
+    max_level: int = len(EFFORT_LEVELS) - 1
+    raw_content_chars: int = 4000
+
+    @classmethod
+    def from_env(cls) -> "EffortConfig":
+        """
+        Read the settings from environment variables:
+            - SEARCH_EFFORT_MIN_SCORE: Relevance score of a relevant result (default 0.5).
+            - SEARCH_EFFORT_MIN_RESULTS: Relevant results needed to stop escalating (default 3).
+            - SEARCH_EFFORT_MIN_QUERY_COVERAGE: Share of queries needing a relevant result (default 0.5).
+            - SEARCH_EFFORT_MAX_LEVEL: Highest level, one of light, standard, deep, full (default full).
+            - SEARCH_EFFORT_RAW_CONTENT_CHARS: Characters kept of each page's raw content (default 4000).
+        """
+        names = [level.name for level in EFFORT_LEVELS]
+        return cls(
+            min_score=float(os.getenv("SEARCH_EFFORT_MIN_SCORE", "0.5")),
+            min_relevant_results=int(os.getenv("SEARCH_EFFORT_MIN_RESULTS", "3")),
+            min_query_coverage=float(os.getenv("SEARCH_EFFORT_MIN_QUERY_COVERAGE", "0.5")),
+            max_level=names.index(os.getenv("SEARCH_EFFORT_MAX_LEVEL", names[-1])),
+            raw_content_chars=int(os.getenv("SEARCH_EFFORT_RAW_CONTENT_CHARS", "4000")),
+        )
+
+
+@dataclass
+class Coverage:
+    """How well the responses gathered so far cover the searched queries."""
+    relevant_results: int
+    covered_queries: int
+    queries: int
+
+    def sufficient(self, config: EffortConfig) -> bool:
+        """Whether the results are enough to stop escalating."""
+        return (
+            self.relevant_results >= config.min_relevant_results
+            and self.covered_queries >= config.min_query_coverage * self.queries
+        )
+
+
+def relevant_urls(response: Dict[str, Any], min_score: float) -> List[str]:
+    """URLs of a response's results scoring at least `min_score`; results without a score count as relevant."""
+    return [
+        result["url"]
+        for result in response.get("results", [])
+        if result.get("url") and (result.get("score") is None or result["score"] >= min_score)
+    ]
+
+
+def assess(responses: Dict[str, Dict[str, Any]], min_score: float) -> Coverage:
+    """
+    Measure the coverage of the responses.
+
+    Args:
+        responses (Dict[str, Dict[str, Any]]): The response of each searched query.
+        min_score (float): Relevance score from which a result counts as relevant.
+    Returns:
+        Coverage: The distinct relevant URLs and the queries with at least one relevant result.
+    """
+    urls, covered = set(), 0
+    for response in responses.values():
+        relevant = relevant_urls(response, min_score)
+        urls.update(relevant)
+        covered += bool(relevant)
+    return Coverage(relevant_results=len(urls), covered_queries=covered, queries=len(responses))
+
+
+def trim_raw_content(response: Dict[str, Any], max_chars: int) -> Dict[str, Any]:
+    """Truncate the raw page content of a response's results, which the answer model reads in full."""
+    for result in response.get("results", []):
+        if isinstance(result.get("raw_content"), str):
+            result["raw_content"] = result["raw_content"][:max_chars]
+    return response
+
+
+class EffortController:
+    """
+    Escalating search plan of one `web_search` call.
+
+    The first batch searches the model's first queries at the cheapest level. After each batch the
+    caller records the responses, and the controller assesses their coverage: when it falls short,
+    the next level searches the queries not searched yet, and re-searches the queries without a
+    relevant result if the level's Tavily settings differ.
+    """
+
+    def __init__(self, queries: List[str], config: EffortConfig):
+        """
+        Args:
+            queries (List[str]): The model's search queries.
+            config (EffortConfig): The controller settings.
+        """
+        self.queries = list(dict.fromkeys(queries))
+        self.config = config
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self.level = 0
+        self.escalations = 0
+        self._searched_with: Dict[str, EffortLevel] = {}
+
+    def record(self, query: str, response: Dict[str, Any], level: Optional[EffortLevel] = None) -> None:
+        """Record a query's response, searched at `level` (None when served from the local index)."""
+        self.responses[query] = response
+        self._searched_with[query] = level
+
+    def coverage(self) -> Coverage:
+        """Coverage of the responses recorded so far."""
+        return assess(self.responses, self.config.min_score)
+
+    def _batch(self, level: EffortLevel) -> List[str]:
+        """Queries to search at `level`: new ones up to its query count, and weak ones it searches differently."""
+        limit = level.max_queries if level.max_queries is not None else len(self.queries)
+        batch = [query for query in self.queries[:limit] if query not in self.responses]
+        for query, response in self.responses.items():
+            previous = self._searched_with.get(query)
+            if previous is not None and previous.search_kwargs() != level.search_kwargs() and not relevant_urls(response, self.config.min_score):
+                batch.append(query)
+        return batch
+
+    def batches(self, can_escalate: Callable[[], bool] = lambda: True) -> Iterator[Tuple[EffortLevel, List[str]]]:
+        """
+        Yield the level and queries of each batch to search, escalating while coverage falls short.
+
+        Args:
+            can_escalate (Callable[[], bool]): Checked before each escalation, e.g. against the
+                request deadline.
+        Yields:
+            Tuple[EffortLevel, List[str]]: The level and its queries, never empty.
+        """
+        for index in range(self.config.max_level + 1):
+            if index > 0 and (self.coverage().sufficient(self.config) or not can_escalate()):
+                return
+            level = EFFORT_LEVELS[index]
+            batch = self._batch(level)
+            if not batch:
+                continue
+            if index > self.level:
+                self.escalations += 1
+            self.level = index
+            yield level, batch
+
+    @property
+    def level_name(self) -> str:
+        """Name of the highest level searched."""
+        return EFFORT_LEVELS[self.level].name
+
+
+class SearchEffortStats:
+    """
+    Per-level counts and latency of the searches run by the effort controller, and the level each
+    `web_search` call ended at.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window (int): Number of recent search latencies kept per level.
+        """
+        self._searches: Counter = Counter()
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._final_levels: Counter = Counter()
+        self._calls = 0
+        self._escalations = 0
+        self._insufficient = 0
+        self._lock = threading.Lock()
+
+    def record_search(self, level: str, seconds: float) -> None:
+        """Record a Tavily search run at `level`."""
+        with self._lock:
+            self._searches[level] += 1
+            self._latencies[level].append(seconds)
+
+    def record_call(self, controller: EffortController) -> None:
+        """Record a finished `web_search` call: its final level, escalations and whether its coverage sufficed."""
+        with self._lock:
+            self._calls += 1
+            self._final_levels[controller.level_name] += 1
+            self._escalations += controller.escalations
+            self._insufficient += not controller.coverage().sufficient(controller.config)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the calls, escalations and final levels, and per level the searches and their latency."""
+        with self._lock:
+            levels = {}
+            for level in EFFORT_LEVELS:
+                latencies = sorted(self._latencies[level.name])
+                levels[level.name] = {
+                    "searches": self._searches[level.name],
+                    "final_level_calls": self._final_levels[level.name],
+                    "latency_seconds_avg": round(statistics.fmean(latencies), 3) if latencies else None,
+                    "latency_seconds_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+                }
+            return {
+                "calls": self._calls,
+                "escalations": self._escalations,
+                "escalations_per_call": round(self._escalations / self._calls, 3) if self._calls else None,
+                "insufficient_coverage": self._insufficient,
+                "levels": levels,
+            }
+
+
+_search_effort_stats: Optional[SearchEffortStats] = None
+
+
+def get_search_effort_stats() -> SearchEffortStats:
+    """Return the process-wide search effort statistics."""
+    global _search_effort_stats
+    if _search_effort_stats is None:
+        _search_effort_stats = SearchEffortStats()
+    return _search_effort_stats
@@ -1,25 +1,24 @@
 import os, time, random, logging
 from typing import List, Dict, Optional
-import requests
 from dotenv import load_dotenv
-import snowflake
-import snowflake.connector
+import httpx
 from langchain_core.tools import tool
 import os
 from typing import List, Dict
 import threading
-import faiss
 # from sentence_transformers import SentenceTransformer
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
-import pandas as pd
 import os, re, threading
 import json
 import numpy as np 
 from pydantic import BaseModel
-import pickle
+import zlib
 from tavily import AsyncTavilyClient
 from dotenv import load_dotenv
+from gen_utils.cassettes import cassette_transport
+
+# faiss is slow to import: it is only imported when the local index is first used
 
 @tool
 async def web_search(query: str) -> str:
@@ -37,3 +36,364 @@ async def web_search(query: str) -> str:
     response = await tavily_client.search(query)
 
     return str(response)
+
+
+# --------------------------------------------------------------------------- #
+# Local index of past search results                                          #
+# --------------------------------------------------------------------------- #
+class HashingEmbedder:
+    """
+    Offline text embedding based on the hashing trick.
+
+    Word unigrams and bigrams are hashed with a stable hash (CRC32) into `dim` signed buckets
+    and the resulting vector is L2-normalized, so inner product equals cosine similarity.
+    No model download or network access is needed and vectors are stable across processes.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    STOPWORDS = {
+        "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+        "i", "in", "is", "it", "of", "on", "or", "the", "to", "what", "when", "where", "which",
+        "who", "why", "with", "you", "your",
+    }
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercased, stopword-free, crudely stemmed unigrams plus their bigrams."""
+        words = [
+            re.sub(r"(ing|ed|es|s)$", "", word) if len(word) > 4 else word
+            for word in re.findall(r"[a-z0-9]+", text.lower())
+            if word not in self.STOPWORDS
+        ]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts (List[str]): Texts to embed.
+        Returns:
+            np.ndarray: A float32 matrix of shape (len(texts), dim).
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in self.tokenize(text):
+                h = zlib.crc32(token.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def condense_tavily_response(response: Dict[str, Any], max_chars: int = 1500) -> List[Dict[str, Any]]:
+    """
+    Reduce a raw Tavily response to the fields worth keeping for each result.
+
+    Args:
+        response (Dict[str, Any]): A raw Tavily search response.
+        max_chars (int): Maximum number of content characters kept per result.
+    Returns:
+        List[Dict[str, Any]]: One dict per result with query, url, title, content and score.
+    """
+    return [
+        {
+            "query": response.get("query", ""),
+            "url": result.get("url", ""),
+            "title": result.get("title", ""),
+            "content": (result.get("content") or "")[:max_chars],
+            "score": result.get("score"),
+        }
+        for result in response.get("results", [])
+        if result.get("url")
+    ]
+
+
+def condensed_view(responses: List[Dict[str, Any]], pages: Optional[List[Dict[str, Any]]] = None, snippet_chars: int = 300) -> str:
+    """
+    Render search results compactly: per query, each result's title, URL and a short snippet.
+
+    This is what the graph state keeps of a search; the full results live in the blob store.
+
+    Args:
+        responses (List[Dict[str, Any]]): The search responses of `web_search`.
+        pages (List[Dict[str, Any]]): The fetched pages, if any.
+        snippet_chars (int): Maximum number of content characters per result.
+    Returns:
+        str: The condensed view.
+    """
+    lines = []
+    for response in responses:
+        if "skipped_queries" in response:
+            lines.append(f"skipped_queries: {response['skipped_queries']} ({response.get('reason', '')})")
+            continue
+        lines.append(f"Query: {response.get('query', '')}")
+        for result in response.get("results", []):
+            if result.get("already_provided"):
+                lines.append(f"- {result.get('title') or ''} <{result.get('url', '')}>: already provided by an earlier search")
+                continue
+            snippet = " ".join((result.get("content") or "").split())[:snippet_chars]
+            lines.append(f"- {result.get('title') or ''} <{result.get('url', '')}>: {snippet}")
+    for page in pages or []:
+        status = page.get("error") or f"{len(page.get('content') or '')} characters"
+        lines.append(f"Fetched page: {page.get('title') or ''} <{page.get('url', '')}> ({status})")
+    return "\n".join(lines)
+
+
+class LocalSearchIndex:
+    """
+    Persistent FAISS index of condensed search results with their metadata.
+
+    The persisted vectors are memory-mapped read-only, new results go into an in-memory delta
+    index, and `persist` folds the delta into a new file on disk. Faiss ids are positions in the
+    metadata list, which is stored as JSON lines next to the index.
+
+    Results are embedded from the query that produced them and their title, so a new query close
+    to a past one finds that query's results. Results older than `max_age_seconds` are never
+    returned, so time-sensitive answers are searched again.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = "./local_index",
+        dim: int = 512,
+        min_score: float = 0.2,
+        serve_score: float = 0.6,
+        max_age_seconds: float = 7 * 86400,
+        persist_every: int = 50,
+    ):
+        """
+        Args:
+            index_dir (str): Directory holding `index.faiss` and `metadata.jsonl`.
+            dim (int): Dimension of the hashing embedding.
+            min_score (float): Minimum cosine similarity for a hit to be returned.
+            serve_score (float): Minimum similarity of the best hit for a query to be served locally.
+            max_age_seconds (float): Age after which an indexed result is no longer returned.
+            persist_every (int): Number of added results after which the index is written to disk.
+        """
+        self.index_dir = Path(index_dir)
+        self.index_path = self.index_dir / "index.faiss"
+        self.metadata_path = self.index_dir / "metadata.jsonl"
+        self.embedder = HashingEmbedder(dim)
+        self.min_score = min_score
+        self.serve_score = serve_score
+        self.max_age_seconds = max_age_seconds
+        self.persist_every = persist_every
+        self.queries_total = 0
+        self.queries_served_locally = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """Memory-map the persisted index and read its metadata, if any."""
+        import faiss
+
+        self.metadata: List[Dict[str, Any]] = []
+        self.base = None
+        if self.index_path.exists() and self.metadata_path.exists():
+            self.base = faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+            with open(self.metadata_path, "r", encoding="utf-8") as f:
+                self.metadata = [json.loads(line) for line in f if line.strip()]
+            # Metadata is written before the index: drop rows whose vectors never made it to disk.
+            # The next persist rewrites the whole file, so they are not matched to new vectors.
+            self.metadata = self.metadata[: self.base.ntotal]
+        self.delta = faiss.IndexFlatIP(self.embedder.dim)
+        self._persisted_count = len(self.metadata)
+        self._added_at = {item["url"]: item["added_at"] for item in self.metadata}
+
+    @property
+    def base_count(self) -> int:
+        return self.base.ntotal if self.base is not None else 0
+
+    def _is_expired(self, added_at: float) -> bool:
+        return time.time() - added_at > self.max_age_seconds
+
+    def add(self, results: List[Dict[str, Any]]) -> int:
+        """
+        Embed and index condensed results whose URL is not indexed yet, or only with expired content.
+
+        Args:
+            results (List[Dict[str, Any]]): Condensed results from `condense_tavily_response`.
+        Returns:
+            int: The number of results added.
+        """
+        with self._lock:
+            now = time.time()
+            new_results = []
+            for result in results:
+                added_at = self._added_at.get(result["url"])
+                if added_at is None or self._is_expired(added_at):
+                    self._added_at[result["url"]] = now
+                    new_results.append({**result, "added_at": now})
+            if not new_results:
+                return 0
+            texts = [f"{r['query']} {r['title']}" for r in new_results]
+            self.delta.add(self.embedder.embed(texts))
+            self.metadata.extend(new_results)
+            if len(self.metadata) - self._persisted_count >= self.persist_every:
+                self._persist()
+            return len(new_results)
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Return the unexpired indexed results most similar to a query, above `min_score`.
+
+        Args:
+            query (str): The search query.
+            k (int): Maximum number of results.
+        Returns:
+            List[Dict[str, Any]]: Result metadata with a `similarity` field, best first.
+        """
+        vector = self.embedder.embed([query])
+        with self._lock:
+            hits = []
+            # Over-fetch so expired results do not crowd out fresh ones
+            for index, offset in ((self.base, 0), (self.delta, self.base_count)):
+                if index is None or index.ntotal == 0:
+                    continue
+                scores, ids = index.search(vector, min(4 * k, index.ntotal))
+                hits.extend((float(s), int(i) + offset) for s, i in zip(scores[0], ids[0]) if i >= 0)
+            hits.sort(reverse=True)
+            fresh = [
+                {**self.metadata[i], "similarity": round(s, 4)}
+                for s, i in hits
+                if s >= self.min_score and not self._is_expired(self.metadata[i]["added_at"])
+            ]
+            return fresh[:k]
+
+    def lookup(self, query: str, k: int = 5) -> Tuple[bool, List[Dict[str, Any]]]:
+        """
+        Search the index and record whether local recall was sufficient for the query.
+
+        A query is served locally when its best hit reaches `serve_score`, i.e. a close enough
+        query was searched recently.
+
+        Returns:
+            Tuple[bool, List[Dict[str, Any]]]: Whether the query is served locally, and the hits.
+        """
+        hits = self.search(query, k)
+        served = bool(hits) and hits[0]["similarity"] >= self.serve_score
+        with self._lock:
+            self.queries_total += 1
+            self.queries_served_locally += int(served)
+        return served, hits
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size and the share of queries served without calling Tavily."""
+        total = self.queries_total
+        return {
+            "indexed_results": len(self.metadata),
+            "queries_total": total,
+            "queries_served_locally": self.queries_served_locally,
+            "local_hit_rate": round(self.queries_served_locally / total, 4) if total else 0.0,
+        }
+
+    def persist(self) -> None:
+        """Write all indexed results to disk."""
+        with self._lock:
+            self._persist()
+
+    def _persist(self) -> None:
+        import faiss
+
+        if len(self.metadata) == self._persisted_count:
+            return
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+        # Fold the memory-mapped base and the delta into a new flat index
+        merged = faiss.IndexFlatIP(self.embedder.dim)
+        if self.base_count:
+            merged.add(self.base.reconstruct_n(0, self.base_count))
+        merged.add(self.delta.reconstruct_n(0, self.delta.ntotal))
+
+        # Atomically replace the metadata first, then the index file
+        tmp_metadata_path = self.metadata_path.with_suffix(".tmp")
+        with open(tmp_metadata_path, "w", encoding="utf-8") as f:
+            for item in self.metadata:
+                f.write(json.dumps(item) + "\n")
+        os.replace(tmp_metadata_path, self.metadata_path)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        faiss.write_index(merged, str(tmp_path))
+        os.replace(tmp_path, self.index_path)
+
+        self.base = faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        self.delta = faiss.IndexFlatIP(self.embedder.dim)
+        self._persisted_count = len(self.metadata)
+
+
+_local_index: Optional[LocalSearchIndex] = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalSearchIndex:
+    """
+    Return the process-wide local search index.
+
+    The location and thresholds are read from the LOCAL_INDEX_DIR, LOCAL_INDEX_MIN_SCORE,
+    LOCAL_INDEX_SERVE_SCORE, LOCAL_INDEX_MAX_AGE_SECONDS and LOCAL_INDEX_PERSIST_EVERY
+    environment variables.
+    """
+    global _local_index
+    with _local_index_lock:
+        if _local_index is None:
+            _local_index = LocalSearchIndex(
+                index_dir=os.getenv("LOCAL_INDEX_DIR", "./local_index"),
+                min_score=float(os.getenv("LOCAL_INDEX_MIN_SCORE", "0.2")),
+                serve_score=float(os.getenv("LOCAL_INDEX_SERVE_SCORE", "0.6")),
+                max_age_seconds=float(os.getenv("LOCAL_INDEX_MAX_AGE_SECONDS", str(7 * 86400))),
+                persist_every=int(os.getenv("LOCAL_INDEX_PERSIST_EVERY", "50")),
+            )
+    return _local_index
+
+
+def persist_local_index() -> None:
+    """Write the process-wide local index to disk, if it was used. Call it at application shutdown."""
+    with _local_index_lock:
+        index = _local_index
+    if index is not None:
+        index.persist()
+
+
+_tavily_client: Optional[AsyncTavilyClient] = None
+_tavily_http_client: Optional[httpx.AsyncClient] = None
+_tavily_api_key: Optional[str] = None
+
+
+def get_tavily_client() -> AsyncTavilyClient:
+    """
+    Return the process-wide Tavily client, so searches reuse one pool of keep-alive connections
+    instead of opening a new pool, and paying a new TLS handshake, on every call.
+
+    The client is rebuilt if TAVILY_API_KEY changes. Its traffic is recorded to or replayed from
+    the cassette when CASSETTE_MODE is set (see `get_cassette`).
+    """
+    global _tavily_client, _tavily_http_client, _tavily_api_key
+    api_key = os.getenv("TAVILY_API_KEY")
+    if _tavily_client is None or api_key != _tavily_api_key:
+        # The Tavily client only sets its auth header on a fresh HTTP client
+        _tavily_http_client = httpx.AsyncClient(
+            base_url="https://api.tavily.com",
+            timeout=httpx.Timeout(float(os.getenv("TAVILY_TIMEOUT", "60"))),
+            transport=cassette_transport(httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_keepalive_connections=int(os.getenv("TAVILY_MAX_KEEPALIVE", "10"))),
+            )),
+        )
+        _tavily_client = AsyncTavilyClient(api_key=api_key, client=_tavily_http_client)
+        _tavily_api_key = api_key
+    return _tavily_client
+
+
+async def close_tavily_client() -> None:
+    """Close the process-wide Tavily client's connections, if it was created. Call it at application shutdown."""
+    global _tavily_client, _tavily_http_client
+    if _tavily_http_client is not None:
+        await _tavily_http_client.aclose()
+    _tavily_client = None
+    _tavily_http_client = None
+
+
+async def preconnect_tavily() -> None:
+    """Open a keep-alive connection to the Tavily API, so the first search skips the TLS handshake."""
+    get_tavily_client()
+    await _tavily_http_client.head("/")
@@ -1,28 +1,283 @@
-from fastapi import FastAPI, HTTPException
-from typing import List, Dict, Any
+import time
+_IMPORT_STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Dict, Any, Optional, Awaitable, Literal
+import asyncio
 from openai import BaseModel
 import json
-from graph import run_graph
+import logging
+import os
+from graph import run_graph, stream_graph, warm_up
+from langgraph_agent.agent_workflows.sessions import close_session_store
+from langgraph_agent.tools.tools import persist_local_index, close_tavily_client
+from langgraph_agent.tools.blob_store import get_blob_store
+from langgraph_agent.tools.page_fetch import close_page_fetcher
+from langgraph_agent.agent_workflows.http_pool import close_model_http_client, model_http_pool_metrics
+from langgraph_agent.agent_workflows.deadlines import DeadlineExceeded
+from langgraph_agent.agent_workflows.model_router import get_model_router
+from langgraph_agent.agent_workflows.prompt_cache import get_prompt_cache_stats
+from langgraph_agent.agent_workflows.usage import get_usage_totals
+from langgraph_agent.agent_workflows.query_expansion import get_query_expansion_stats
+from langgraph_agent.agent_workflows.direct_answer import get_race_stats
+from langgraph_agent.tools.search_effort import get_search_effort_stats
+from langgraph_agent.tools.query_memo import get_query_memo_totals
+from gen_utils.admission import Overloaded, get_admission_controller
+from gen_utils.job_queue import JobWorkerPool, Retry, close_job_queue, get_job_queue
+from gen_utils.profiling import PROFILE_HEADER, profile_request, profiling_requested
+from gen_utils.cassettes import cassette_stats
+from gen_utils.log_queue import Payload, configure_service_logging, stop_queue_logging
+from contextlib import AsyncExitStack, asynccontextmanager
 import uvicorn
 
-app = FastAPI()
+# Time spent importing the application, see `python -m benchmarks.import_time`
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED_AT
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Not ready until start-up work is done
+    app.state.ready = False
+    app.state.first_request_seconds = None
+    started_at = time.perf_counter()
+    # Format and write log records on a listener thread, never on the event loop
+    if os.getenv("LOG_QUEUE_ENABLED", "true").lower() == "true":
+        configure_service_logging()
+    # Resolve secrets, compile the graph and open connections before reporting ready
+    if os.getenv("WARMUP_ENABLED", "true").lower() == "true":
+        app.state.warmup_report = await warm_up()
+    else:
+        app.state.warmup_report = None
+    app.state.warmup_seconds = time.perf_counter() - started_at
+    # Run queued search jobs in the background, see POST /search/jobs
+    app.state.job_workers = None
+    if os.getenv("JOB_WORKERS_ENABLED", "true").lower() == "true":
+        job_queue = await get_job_queue()
+        await job_queue.cleanup()
+        app.state.job_workers = JobWorkerPool(
+            job_queue,
+            run_search_job,
+            concurrency=int(os.getenv("JOB_WORKER_CONCURRENCY", "2")),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "1")),
+        )
+        app.state.job_workers.start()
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    # Running jobs go back to the queue and resume after the restart
+    if app.state.job_workers is not None:
+        await app.state.job_workers.stop()
+    await close_job_queue()
+    # Close the pooled Tavily, page fetch and model connections
+    await close_tavily_client()
+    await close_page_fetcher()
+    await close_model_http_client()
+    # Close the session checkpointer's SQLite connection on shutdown
+    await close_session_store()
+    # Flush local index results not yet written to disk
+    persist_local_index()
+    # Write out the queued log records
+    stop_queue_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 def read_root():
     return {"message": "Hello from FastAPI on your VM!"}
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once start-up is complete, 503 before then and during shutdown."""
+    is_ready = getattr(app.state, "ready", False)
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "ready": is_ready,
+            "import_seconds": round(IMPORT_SECONDS, 3),
+            "warmup_seconds": round(getattr(app.state, "warmup_seconds", 0.0), 3) if is_ready else None,
+            "warmup": getattr(app.state, "warmup_report", None),
+            "first_request_seconds": getattr(app.state, "first_request_seconds", None),
+        },
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Service metrics."""
+    return {
+        "model_http_pool": model_http_pool_metrics(),
+        "admission": get_admission_controller().metrics(),
+        "model_tiers": get_model_router().metrics(),
+        "prompt_cache": get_prompt_cache_stats().metrics(),
+        "query_expansion": get_query_expansion_stats().metrics(),
+        "direct_answer_race": get_race_stats().metrics(),
+        "search_effort": get_search_effort_stats().metrics(),
+        "query_memo": get_query_memo_totals().metrics(),
+        "usage": get_usage_totals().metrics(),
+        "cassette": cassette_stats(),
+        "tool_blobs": get_blob_store().stats(),
+        "jobs": await (await get_job_queue()).stats(),
+    }
+
 class ChatRequest(BaseModel):
     question: str
+    # Pass a thread_id to open a session; reuse it to ask follow-up questions
+    thread_id: Optional[str] = None
+    # Time budget in seconds, SEARCH_DEADLINE_SECONDS if omitted
+    timeout_seconds: Optional[float] = None
+    # "interactive" or "batch": batch requests are queued behind interactive ones
+    priority: Literal["interactive", "batch"] = "interactive"
+    # Add the request's tokens, Tavily credits and wall time to the /search response
+    include_usage: bool = False
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client goes away before its request is answered."""
+
+
+async def run_until_disconnected(http_request: Request, awaitable: Awaitable[Any], poll_interval: float = 0.5) -> Any:
+    """
+    Await a request's work, cancelling it if the client disconnects in the meantime.
+
+    Args:
+        http_request (Request): The incoming request.
+        awaitable (Awaitable): The work answering it.
+        poll_interval (float): Seconds between two disconnection checks.
+    Raises:
+        ClientDisconnected: If the client disconnected. The work has been cancelled.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        task.cancel()
 
 @app.post("/search")
-async def chat_endpoint(request: ChatRequest):
-    result = await run_graph(request.question)
-    print(json.dumps(result["final_answer"], indent=4))
-    with open("result.json", "w") as f:
-        json.dump(result["final_answer"], f, indent=4)
+async def chat_endpoint(request: ChatRequest, http_request: Request):
+    started_at = time.perf_counter()
+    # Admins can profile a slow question, see `profile_request`
+    profiled = profiling_requested(http_request.headers.get(PROFILE_HEADER))
+    async def admitted_run_graph():
+        # Wait for an execution slot, or be shed when the service is overloaded
+        async with get_admission_controller().admit(request.priority):
+            if not profiled:
+                return await run_graph(request.question, request.thread_id, request.timeout_seconds, request.include_usage)
+            async with profile_request("/search") as profile:
+                result = await run_graph(request.question, request.thread_id, request.timeout_seconds, request.include_usage)
+            return {**result, "profile": {**profile.summary(), "files": profile.files}}
+
+    try:
+        result = await run_until_disconnected(http_request, admitted_run_graph())
+    except Overloaded as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected:
+        logging.getLogger(__name__).info("Client disconnected, search cancelled")
+        # Nobody is listening: 499 is the conventional "client closed request" status
+        return Response(status_code=499)
+    # Report the first request's latency, to check that warm-up removed the cold start
+    if getattr(app.state, "first_request_seconds", 0) is None:
+        app.state.first_request_seconds = round(time.perf_counter() - started_at, 3)
+        logging.getLogger(__name__).info("First request latency: %.3fs", app.state.first_request_seconds)
+    # Rendered as JSON on the log listener thread, for sampled records only
+    logging.getLogger(__name__).debug("search final_answer=%s", Payload(result["final_answer"], as_json=True))
+    await asyncio.to_thread(write_result, result["final_answer"])
     return {"response": result}
 
 
+def write_result(final_answer: Dict[str, Any]) -> None:
+    """Write the last final answer to result.json."""
+    with open("result.json", "w") as f:
+        json.dump(final_answer, f, indent=4)
+
+
+def format_event(event: Dict[str, Any], sse: bool) -> str:
+    """Serialize a stream event as a server-sent event or as an NDJSON line."""
+    data = json.dumps(event)
+    return f"event: {event['event']}\ndata: {data}\n\n" if sse else data + "\n"
+
+@app.post("/search/stream")
+async def stream_endpoint(request: ChatRequest, http_request: Request):
+    """
+    Streaming variant of /search: the answer's text and sources are sent while the model writes them.
+
+    Events are NDJSON lines, or server-sent events when the client accepts text/event-stream. Each
+    carries `elapsed_seconds` since the request arrived. A deadline reached mid-stream is reported
+    as an "error" event with status 504.
+    """
+    started_at = time.perf_counter()
+    # Hold an execution slot until the stream ends; shed before the stream starts
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(get_admission_controller().admit(request.priority))
+    except Overloaded as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": str(e.retry_after)})
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+
+    async def events():
+        try:
+            async for event in stream_graph(request.question, request.thread_id, request.timeout_seconds):
+                event["elapsed_seconds"] = round(time.perf_counter() - started_at, 3)
+                yield format_event(event, sse)
+        except DeadlineExceeded as e:
+            yield format_event({"event": "error", "status": 504, "detail": str(e)}, sse)
+        finally:
+            # Also runs when the client disconnects, which cancels the workflow
+            await slot.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream" if sse else "application/x-ndjson")
+
+
+class JobRequest(BaseModel):
+    question: str
+    thread_id: Optional[str] = None
+    # Time budget in seconds once the job runs, JOB_DEADLINE_SECONDS (default 900) if omitted
+    timeout_seconds: Optional[float] = None
+
+
+async def run_search_job(job: Dict[str, Any]) -> Dict:
+    """Run a queued search job. Jobs are batch work: they yield to interactive requests."""
+    timeout_seconds = job["timeout_seconds"]
+    if timeout_seconds is None:
+        timeout_seconds = float(os.getenv("JOB_DEADLINE_SECONDS", "900"))
+    try:
+        async with get_admission_controller().admit("batch"):
+            return await run_graph(job["question"], job["thread_id"], timeout_seconds)
+    except Overloaded as e:
+        # Try again later rather than failing the job
+        raise Retry(e.retry_after)
+
+@app.post("/search/jobs", status_code=202)
+async def create_search_job(request: JobRequest):
+    """Queue a search and return its job id; poll GET /search/jobs/{job_id} for the result."""
+    job_id = await (await get_job_queue()).enqueue(request.question, request.thread_id, request.timeout_seconds)
+    return {"job_id": job_id, "status": "queued", "status_url": f"/search/jobs/{job_id}"}
+
+@app.get("/search/jobs/{job_id}")
+async def get_search_job(job_id: str):
+    """Status of a search job, with its result once it succeeded or its error once it failed."""
+    job = await (await get_job_queue()).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "response": job["result"],
+        "error": job["error"],
+    }
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",  # String reference instead of app object
@@ -0,0 +1,170 @@
+import asyncio
+
+import httpx
+import pytest
+
+import main
+from gen_utils import admission
+from gen_utils.admission import AdmissionController, Overloaded
+
+
+async def hold(controller, priority, seconds, log=None, name=None):
+    async with controller.admit(priority):
+        if log is not None:
+            log.append(name)
+        await asyncio.sleep(seconds)
+
+
+def test_in_flight_executions_are_bounded():
+    async def main_():
+        controller = AdmissionController(max_in_flight=2, max_queue=10)
+        running, peak = 0, 0
+
+        async def work():
+            nonlocal running, peak
+            async with controller.admit():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.05)
+                running -= 1
+
+        await asyncio.gather(*(work() for _ in range(6)))
+        return peak, controller.metrics()
+
+    peak, metrics = asyncio.run(main_())
+    assert peak == 2
+    assert metrics["admitted_total"]["interactive"] == 6
+    assert metrics["in_flight"] == {"interactive": 0, "batch": 0}
+    assert metrics["queue_wait_seconds"]["max"] > 0
+
+
+def test_interactive_requests_are_admitted_before_batch_ones():
+    async def main_():
+        controller = AdmissionController(max_in_flight=1, max_queue=10)
+        log = []
+        first = asyncio.create_task(hold(controller, "interactive", 0.1, log, "first"))
+        await asyncio.sleep(0.01)
+        batch = asyncio.create_task(hold(controller, "batch", 0, log, "batch"))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(hold(controller, "interactive", 0, log, "interactive"))
+        await asyncio.gather(first, batch, interactive)
+        return log
+
+    assert asyncio.run(main_()) == ["first", "interactive", "batch"]
+
+
+def test_batch_requests_cannot_take_every_slot():
+    async def main_():
+        controller = AdmissionController(max_in_flight=4, max_queue=10, batch_max_in_flight=2)
+        batch = [asyncio.create_task(hold(controller, "batch", 0.2)) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        metrics = controller.metrics()
+        # An interactive request is admitted at once, despite the queued batch requests
+        await asyncio.wait_for(controller.acquire("interactive"), timeout=0.05)
+        controller.release("interactive")
+        await asyncio.gather(*batch)
+        return metrics
+
+    metrics = asyncio.run(main_())
+    assert metrics["in_flight"]["batch"] == 2
+    assert metrics["queue_depth"]["batch"] == 2
+
+
+def test_requests_are_shed_when_the_queue_is_full_or_too_slow():
+    async def main_():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, max_queue_wait={"interactive": 0.1})
+        busy = asyncio.create_task(hold(controller, "interactive", 0.3))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(controller.acquire("interactive"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as full:
+            await controller.acquire("interactive")
+        with pytest.raises(Overloaded) as timed_out:
+            await queued
+        await busy
+        return full.value, timed_out.value, controller.metrics()
+
+    full, timed_out, metrics = asyncio.run(main_())
+    assert full.reason == "queue_full" and full.retry_after >= 1
+    assert timed_out.reason == "queue_timeout"
+    assert metrics["rejected_total"] == {"queue_full": 1, "queue_timeout": 1}
+
+
+def test_requests_are_shed_on_estimated_wait():
+    async def main_():
+        controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_wait={"interactive": 0.3})
+        # Record an execution time of about 0.2s
+        await hold(controller, "interactive", 0.2)
+        busy = asyncio.create_task(hold(controller, "interactive", 0.2))
+        await asyncio.sleep(0.01)
+        # One waiter fits (estimated 0.2s), the next would wait about 0.4s
+        queued = asyncio.create_task(hold(controller, "interactive", 0))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire("interactive")
+        await asyncio.gather(busy, queued)
+        return shed.value
+
+    assert asyncio.run(main_()).reason == "estimated_wait"
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    async def main_():
+        controller = AdmissionController(max_in_flight=1, max_queue=10)
+        busy = asyncio.create_task(hold(controller, "interactive", 0.05))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(controller.acquire("interactive"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await busy
+        await asyncio.wait_for(controller.acquire("interactive"), timeout=0.05)
+        controller.release("interactive")
+        return controller.metrics()
+
+    metrics = asyncio.run(main_())
+    assert metrics["in_flight"]["interactive"] == 0
+    assert metrics["queue_depth"]["interactive"] == 0
+
+
+def test_search_returns_503_with_retry_after_when_overloaded(monkeypatch):
+    async def slow_run_graph(question, thread_id=None, timeout_seconds=None, include_usage=False):
+        await asyncio.sleep(0.2)
+        return {"final_answer": {"response": question, "sources": []}}
+
+    monkeypatch.setattr(main, "run_graph", slow_run_graph)
+    monkeypatch.setattr(admission, "_admission_controller", AdmissionController(max_in_flight=1, max_queue=0))
+    monkeypatch.chdir("/tmp")
+
+    async def main_():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                client.post("/search", json={"question": "first"}),
+                client.post("/search", json={"question": "second", "priority": "batch"}),
+            )
+
+    first, second = asyncio.run(main_())
+    assert first.status_code == 200
+    assert second.status_code == 503
+    assert int(second.headers["Retry-After"]) >= 1
+
+
+def test_a_slot_granted_as_the_wait_times_out_is_kept(monkeypatch):
+    async def main_():
+        controller = AdmissionController(max_in_flight=1, max_queue=10)
+        await controller.acquire()
+
+        async def granted_then_timed_out(future, timeout):
+            # The running request finishes and hands its slot over just as the wait times out
+            controller.release("interactive")
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(admission.asyncio, "wait_for", granted_then_timed_out)
+        await controller.acquire()
+        in_flight = controller.metrics()["in_flight"]["interactive"]
+        controller.release("interactive")
+        return in_flight, controller.metrics()
+
+    in_flight, metrics = asyncio.run(main_())
+    assert in_flight == 1
+    assert metrics["in_flight"]["interactive"] == 0 and "queue_timeout" not in metrics["rejected_total"]
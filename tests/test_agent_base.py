@@ -0,0 +1,80 @@
+import asyncio
+import time
+from typing import Annotated, Any
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import MessagesState, add_messages
+from pydantic import BaseModel
+
+from langgraph_agent.agent_workflows.LangGraphAgent import LangGraphAgentSystem
+
+MODEL_LATENCY = 0.2
+
+
+class Weather(BaseModel):
+    summary: str
+
+
+class State(MessagesState):
+    messages: Annotated[list, add_messages]
+    final_response: Any
+
+
+class StubAgent(LangGraphAgentSystem):
+    """The base agent with stub models that take MODEL_LATENCY seconds per call."""
+
+    def initialize_model(self):
+        async def model_with_tools(messages):
+            await asyncio.sleep(MODEL_LATENCY)
+            if any(isinstance(m, ToolMessage) for m in messages):
+                return AIMessage(content="It is sunny in SF.")
+            return AIMessage(content="", tool_calls=[{"name": "get_weather", "args": {"city": "sf"}, "id": "call-1"}])
+
+        async def model_with_structured_output(messages):
+            return Weather(summary=messages[-1].content)
+
+        self.model_with_tools = RunnableLambda(model_with_tools)
+        self.model_with_structured_output = RunnableLambda(model_with_structured_output)
+
+
+def make_agent():
+    return StubAgent({"input_prompt": "What's the weather in SF?", "agent_prompt": "You are helpful.", "agent_state": State})
+
+
+def test_run_calls_the_tool_and_responds():
+    answer = asyncio.run(make_agent().run())
+    assert "75 degrees" in answer["final_response"].summary
+
+
+def test_concurrent_runs_do_not_block_the_event_loop():
+    async def main():
+        started_at = time.perf_counter()
+        answers = await asyncio.gather(*(make_agent().run() for _ in range(5)))
+        return answers, time.perf_counter() - started_at
+
+    answers, elapsed = asyncio.run(main())
+    assert len(answers) == 5
+    # Two model calls per run: sequential runs would take 5 * 2 * MODEL_LATENCY
+    assert elapsed < 4 * MODEL_LATENCY
+
+
+def test_sync_shim_runs_on_the_background_loop():
+    answer = make_agent().run_sync()
+    assert "75 degrees" in answer["final_response"].summary
+    # The shim can be used repeatedly from sync code
+    assert make_agent().run_sync()["final_response"] == answer["final_response"]
+
+
+def test_sync_shim_refuses_to_block_a_running_loop():
+    async def main():
+        with pytest.raises(RuntimeError):
+            make_agent().run_sync()
+
+    asyncio.run(main())
+
+
+def test_stream_sync_yields_node_updates():
+    nodes = [node for chunk in make_agent().stream_sync() for node in chunk]
+    assert nodes == ["agent", "tools", "agent", "respond"]
@@ -0,0 +1,166 @@
+import asyncio
+import gc
+import os
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+import graph
+from langgraph_agent.agent_workflows import SearchAgent
+from langgraph_agent.tools import blob_store
+from langgraph_agent.tools.blob_store import BlobStore, blob_ref, materialize_tool_messages
+
+RESULT_CHARS = 20_000
+RESULTS_PER_QUERY = 5
+
+
+def test_blobs_are_deduplicated_and_spill_to_disk(tmp_path):
+    store = BlobStore(str(tmp_path), max_memory_bytes=250, max_disk_bytes=250)
+    first = store.put("a" * 100)
+    assert store.put("a" * 100) == first
+    second = store.put("b" * 100)
+    third = store.put("c" * 100)
+    stats = store.stats()
+    assert stats["dedup_hits"] == 1
+    # The least recently used blob spilled to disk
+    assert stats["memory_blobs"] == 2 and stats["disk_blobs"] == 1 and stats["spilled"] == 1
+    assert store.get(first) == "a" * 100 and store.stats()["disk_hits"] == 1
+
+    # Another process finds the spilled blob by key
+    assert BlobStore(str(tmp_path)).get(first) == "a" * 100
+
+    # Beyond the disk budget the oldest spilled blobs are deleted
+    for char in "defg":
+        store.put(char * 100)
+    assert store.stats()["disk_bytes"] <= 250
+    assert store.get(first) is None
+    assert store.get(store.put("h" * 100)) == "h" * 100
+    assert {second, third} - {None}
+
+
+def test_blobs_spilled_by_earlier_processes_count_against_the_disk_budget(tmp_path):
+    store = BlobStore(str(tmp_path), max_memory_bytes=100, max_disk_bytes=10_000)
+    keys = [store.put(char * 100) for char in "abcd"]
+    assert store.stats()["disk_blobs"] == 3
+    # Spilled in order, a second apart
+    for age, key in enumerate(reversed(keys[:3])):
+        os.utime(tmp_path / key[:2] / key, (time.time() - age, time.time() - age))
+
+    # A restart finds the spilled blobs, and deletes the oldest beyond its budget
+    restarted = BlobStore(str(tmp_path), max_memory_bytes=100, max_disk_bytes=250)
+    assert restarted.stats()["disk_blobs"] == 2 and restarted.stats()["disk_bytes"] == 200
+    assert restarted.get(keys[0]) is None and restarted.get(keys[2]) == "c" * 100
+    # New spills evict the earlier process's blobs too
+    for char in "efg":
+        restarted.put(char * 100)
+    assert restarted.stats()["disk_bytes"] <= 250
+    assert sum(1 for path in tmp_path.glob("??/*")) == restarted.stats()["disk_blobs"]
+
+
+def test_materialize_restores_full_results_without_touching_the_state(tmp_path):
+    store = BlobStore(str(tmp_path))
+    full = "full results " * 100
+    key = store.put(full)
+    messages = [
+        HumanMessage(content="question"),
+        ToolMessage(content="condensed", tool_call_id="call-1", artifact=blob_ref(key, full)),
+        ToolMessage(content="evicted view", tool_call_id="call-2", artifact={"blob_key": "0" * 64, "bytes": 10}),
+    ]
+    materialized = materialize_tool_messages(messages, store)
+    assert [m.content for m in materialized] == ["question", full, "evicted view"]
+    assert messages[1].content == "condensed"
+
+
+class LargeTavily:
+    """Returns large, distinct results, as Tavily does with raw content."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def search(self, query):
+        self.calls += 1
+        return {"query": query, "results": [
+            {
+                "url": f"https://example.com/{self.calls}/{n}",
+                "title": f"{query} {n}",
+                "content": " ".join(f"w{self.calls}x{n}x{i}" for i in range(RESULT_CHARS // 6))[:RESULT_CHARS],
+                "score": 0.5,
+            }
+            for n in range(RESULTS_PER_QUERY)
+        ]}
+
+
+class EmptyIndex:
+    def lookup(self, query):
+        return False, []
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def make_agent(answer_input_chars):
+    async def search_model(messages):
+        searches = sum(isinstance(m, ToolMessage) for m in messages)
+        if searches == 3:
+            return AIMessage(content="agent_respond")
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": [f"q{searches}a", f"q{searches}b"]}, "id": f"call-{searches}"}])
+
+    async def respond_model(messages):
+        answer_input_chars.append(sum(len(m.content) for m in messages))
+        return graph.ExampleStructuredOutput(response="answer", sources=[])
+
+    agent = SearchAgent.SearchAgent({
+        "agent_state": graph.AgentState,
+        "structured_output_class": graph.ExampleStructuredOutput,
+        "search_agent_prompt": "Search the web.",
+        "input_prompt": "question",
+        "model_tier": "reasoning",
+    })
+    agent.create_tools()
+    agent.search_model_with_tools = RunnableLambda(search_model)
+    agent.model_with_structured_output = RunnableLambda(respond_model)
+    agent.graph = agent.build_graph()
+    return agent
+
+
+def test_per_request_memory_is_bounded(monkeypatch, tmp_path):
+    store = BlobStore(str(tmp_path), max_memory_bytes=RESULT_CHARS * RESULTS_PER_QUERY)
+    monkeypatch.setattr(blob_store, "_blob_store", store)
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+    # A first request pays the one-off imports and caches, which are not per-request memory
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: LargeTavily())
+    asyncio.run(make_agent([]).create_workflow())
+
+    tavily = LargeTavily()
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: tavily)
+    answer_input_chars = []
+    agent = make_agent(answer_input_chars)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        answer = asyncio.run(agent.create_workflow())
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    payload = tavily.calls * RESULTS_PER_QUERY * RESULT_CHARS
+    state_chars = sum(len(m.content) for m in answer["messages"])
+    print(f"payload {payload} B, state {state_chars} chars, retained {after - before} B, peak {peak - before} B")
+    assert tavily.calls == 6
+    # The final answer was written from the full results...
+    assert answer_input_chars[0] > payload
+    # ...while the graph state only holds condensed views
+    assert state_chars < 0.05 * payload
+    # Once answered, the request retains its state and the blobs within the store's memory budget
+    largest_blob = 2 * RESULTS_PER_QUERY * RESULT_CHARS * 1.1
+    assert after - before < largest_blob + 0.1 * payload
+    assert store.stats()["spilled"] > 0
+    # Peak: the full results of the request, materialized once for the answer, plus working copies
+    assert peak - before < 8 * payload
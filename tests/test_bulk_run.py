@@ -0,0 +1,121 @@
+import asyncio
+import csv
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import bulk_run
+from bulk_run import read_questions, result_writer, run_bulk
+
+
+class FakeGraph:
+    """Stands in for `graph.run_graph`, tracking how many questions run at once."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.questions = []
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, question, timeout_seconds=None, include_usage=False):
+        self.questions.append(question)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if question in self.fail:
+                raise TimeoutError("deadline")
+            return {
+                "final_answer": {"response": f"answer to {question}", "sources": ["https://example.com"]},
+                "usage": {"llm": {"input_tokens": 100, "output_tokens": 10}, "tavily": {"queries": 3}},
+            }
+        finally:
+            self.running -= 1
+
+
+def write_questions(path, count):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "question"])
+        writer.writeheader()
+        writer.writerows({"id": f"q{n}", "question": f"question {n}"} for n in range(count))
+
+
+def run(input_path, output_path, **kwargs):
+    return asyncio.run(run_bulk(read_questions(str(input_path), id_column="id"), result_writer(str(output_path)), **kwargs))
+
+
+def test_questions_are_answered_concurrently_in_chunks(monkeypatch, tmp_path):
+    fake = FakeGraph(fail={"question 3"})
+    monkeypatch.setattr(bulk_run, "run_graph", fake)
+    write_questions(tmp_path / "questions.csv", 10)
+    writes = []
+    writer_class = bulk_run.JsonlResultWriter
+    monkeypatch.setattr(writer_class, "write", lambda self, results, write=writer_class.write: (writes.append(len(results)), write(self, results)))
+
+    summary = run(tmp_path / "questions.csv", tmp_path / "answers.jsonl", concurrency=3, chunk_size=4)
+    assert fake.max_running == 3
+    assert writes == [4, 4, 2]
+    rows = [json.loads(line) for line in (tmp_path / "answers.jsonl").read_text().splitlines()]
+    assert sorted(row["row"] for row in rows) == list(range(10))
+    failed = next(row for row in rows if row["row"] == 3)
+    assert failed["status"] == "error" and failed["error"] == "TimeoutError: deadline" and failed["id"] == "q3"
+    answered = next(row for row in rows if row["row"] == 0)
+    assert answered["response"] == "answer to question 0" and answered["input_tokens"] == 100
+    assert summary["ok"] == 9 and summary["errors"] == 1 and summary["rows_per_second"] > 0
+    assert summary["input_tokens"] == 900 and summary["latency_seconds_p50"] >= 0.01
+
+
+def test_a_rerun_resumes_after_the_answered_rows(monkeypatch, tmp_path):
+    write_questions(tmp_path / "questions.csv", 6)
+    # An interrupted run: two rows answered, one failed, and a line cut mid-write
+    with open(tmp_path / "answers.jsonl", "w") as f:
+        f.write(json.dumps({"row": 0, "status": "ok"}) + "\n")
+        f.write(json.dumps({"row": 4, "status": "ok"}) + "\n")
+        f.write(json.dumps({"row": 1, "status": "error"}) + "\n")
+        f.write('{"row": 2, "sta')
+    fake = FakeGraph()
+    monkeypatch.setattr(bulk_run, "run_graph", fake)
+
+    summary = run(tmp_path / "questions.csv", tmp_path / "answers.jsonl", concurrency=2, chunk_size=10)
+    assert sorted(fake.questions) == ["question 1", "question 2", "question 3", "question 5"]
+    assert summary["skipped"] == 2 and summary["ok"] == 4
+    assert result_writer(str(tmp_path / "answers.jsonl")).completed_rows() == set(range(6))
+
+
+@pytest.mark.parametrize("output_name", ["answers.csv", "answers.parquet"])
+def test_parquet_input_and_csv_or_parquet_output(monkeypatch, tmp_path, output_name):
+    monkeypatch.setattr(bulk_run, "run_graph", FakeGraph())
+    pq.write_table(pa.table({"id": [10, 11, 12], "question": ["a", "b", ""]}), tmp_path / "questions.parquet")
+    output = tmp_path / output_name
+
+    summary = run(tmp_path / "questions.parquet", output, concurrency=2, chunk_size=2)
+    # The empty question is an error row, without a graph run
+    assert summary["ok"] == 2 and summary["errors"] == 1
+    if output_name.endswith(".csv"):
+        rows = list(csv.DictReader(open(output)))
+        assert json.loads(next(row for row in rows if row["id"] == "10")["sources"]) == ["https://example.com"]
+    else:
+        assert len(list(output.glob("part-*.parquet"))) == 2
+        table = pq.read_table(output).to_pylist()
+        assert sorted(row["id"] for row in table) == ["10", "11", "12"]
+    # Everything answered: a rerun has nothing left to do except the failed row
+    summary = run(tmp_path / "questions.parquet", output, concurrency=2, chunk_size=2)
+    assert summary["skipped"] == 2 and summary["errors"] == 1
+
+
+def test_writers_must_implement_reading_and_writing(tmp_path):
+    class ReadOnlyWriter(bulk_run.ResultWriter):
+        def read_existing(self):
+            return iter(())
+
+    with pytest.raises(TypeError):
+        ReadOnlyWriter(str(tmp_path / "answers.txt"))
+
+
+def test_unsupported_files_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        result_writer(str(tmp_path / "answers.xlsx"))
+    with pytest.raises(ValueError):
+        list(read_questions(str(tmp_path / "questions.txt")))
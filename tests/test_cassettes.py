@@ -0,0 +1,153 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import graph
+from gen_utils import cassettes
+from gen_utils.cassettes import Cassette, CassetteMiss, CassetteTransport
+from langgraph_agent.agent_workflows import SearchAgent, http_pool
+from langgraph_agent.structured_output.registry import structured_output_registry
+from langgraph_agent.tools import tools
+
+SSE_BODY = 'data: {"n": 1}\n\ndata: {"n": 2}\n\ndata: [DONE]\n\n'
+
+
+async def upstream(request):
+    await asyncio.sleep(0.05)
+    if request.url.path == "/stream":
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=SSE_BODY)
+    body = json.loads(request.content)
+    return httpx.Response(200, headers={"content-type": "application/json", "set-cookie": "secret"},
+                          json={"query": body["query"], "results": [{"url": f"https://example.com/{body['query']}"}]})
+
+
+def test_recorded_interactions_are_replayed(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+
+    async def record():
+        transport = CassetteTransport(Cassette(str(path), "record"), httpx.MockTransport(upstream))
+        async with httpx.AsyncClient(transport=transport, base_url="https://api.tavily.com") as client:
+            first = await client.post("/search", json={"query": "eggs", "api_key": "tvly-secret"})
+            await client.post("/search", json={"query": "tomato"})
+            await client.post("/stream", content=b"{}")
+        return first.json()
+
+    recorded = asyncio.run(record())
+    lines = path.read_text()
+    assert "tvly-secret" not in lines and "set-cookie" not in lines
+    assert len(lines.splitlines()) == 3
+
+    async def replay(latency_scale, queries):
+        cassette = Cassette(str(path), "replay", latency_scale=latency_scale)
+        transport = CassetteTransport(cassette)
+        results, chunks = [], []
+        async with httpx.AsyncClient(transport=transport, base_url="https://api.tavily.com") as client:
+            started_at = time.perf_counter()
+            for query in queries:
+                results.append((await client.post("/search", json={"query": query})).json())
+            async with client.stream("POST", "/stream", content=b"{}") as response:
+                chunks = [chunk async for chunk in response.aiter_text()]
+            seconds = time.perf_counter() - started_at
+        return results, chunks, seconds, cassette.stats()
+
+    # Identical requests get their own recording, without network and without delay
+    results, chunks, seconds, stats = asyncio.run(replay(0, ["eggs", "tomato"]))
+    assert results[0] == recorded and results[1]["query"] == "tomato"
+    assert "".join(chunks) == SSE_BODY and len(chunks) == 3
+    assert seconds < 0.05 and stats["exact"] == 3
+
+    # The recorded latency is reproduced, or scaled
+    _, _, seconds, _ = asyncio.run(replay(1, ["eggs", "tomato"]))
+    assert seconds >= 0.15
+    _, _, scaled_seconds, _ = asyncio.run(replay(0.3, ["eggs", "tomato"]))
+    assert scaled_seconds < 0.6 * seconds
+
+    # A changed request is served the next unused recording of its endpoint, until none is left
+    results, _, _, stats = asyncio.run(replay(0, ["eggs", "cabbage"]))
+    assert results[1]["query"] == "tomato" and stats["fallback"] == 1
+    with pytest.raises(CassetteMiss):
+        asyncio.run(replay(0, ["cabbage", "kale", "leek"]))
+
+
+def chat_completion(message):
+    return {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "o3",
+        "choices": [{"index": 0, "message": {"role": "assistant", **message}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1500, "completion_tokens": 40, "total_tokens": 1540},
+    }
+
+
+class EmptyIndex:
+    def lookup(self, query):
+        return False, []
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def test_the_full_graph_runs_offline_from_a_cassette(monkeypatch, tmp_path):
+    calls = []
+
+    async def azure_and_tavily(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.02)
+        if request.url.host == "api.tavily.com":
+            return httpx.Response(200, json={"query": "q", "results": [
+                {"url": "https://example.com/eggs", "title": "Eggs", "content": "Beat the eggs.", "score": 0.9},
+            ]})
+        body = json.loads(request.content)
+        if "response_format" in body:
+            answer = {"response": "Beat the eggs.", "sources": ["https://example.com/eggs"]}
+            return httpx.Response(200, json=chat_completion({"content": json.dumps(answer)}))
+        if any(message["role"] == "tool" for message in body["messages"]):
+            return httpx.Response(200, json=chat_completion({"content": "agent_respond"}))
+        tool_call = {"id": "call-1", "type": "function", "function": {"name": "web_search", "arguments": json.dumps({"query": ["eggs"]})}}
+        return httpx.Response(200, json=chat_completion({"content": None, "tool_calls": [tool_call]}))
+
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://cassette.openai.azure.com")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT_NAME", "o3")
+    monkeypatch.delenv("AZURE_OPENAI_FAST_DEPLOYMENT_NAME", raising=False)
+    monkeypatch.setenv("TAVILY_API_KEY", "tvly-test")
+    monkeypatch.setenv("CASSETTE_PATH", str(tmp_path / "upstream.jsonl"))
+    monkeypatch.setenv("CASSETTE_LATENCY_SCALE", "0")
+    monkeypatch.setattr(SearchAgent, "retrieve_secret", lambda secret_name, project_id: {})
+    monkeypatch.setattr(SearchAgent, "_tracer_provider", object())
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+
+    def run(mode):
+        monkeypatch.setenv("CASSETTE_MODE", mode)
+        # Fresh upstream clients and graph, built for this cassette mode
+        monkeypatch.setattr(cassettes, "_cassette", None)
+        monkeypatch.setattr(http_pool, "_model_http_client", None)
+        monkeypatch.setattr(tools, "_tavily_client", None)
+        monkeypatch.setattr(SearchAgent, "_compiled_graphs", {})
+        monkeypatch.setattr(structured_output_registry, "_bindings", {})
+        agent = SearchAgent.SearchAgent({
+            "agent_state": graph.AgentState,
+            "structured_output_class": graph.ExampleStructuredOutput,
+            "search_agent_prompt": "Search the web.",
+            "input_prompt": "How to cook eggs?",
+            "model_tier": "reasoning",
+        })
+        answer = asyncio.run(agent.create_workflow())
+        return answer["final_response"], agent.usage.summary(), cassettes.cassette_stats()
+
+    # Record against the (mock) upstream services
+    monkeypatch.setattr(httpx, "AsyncHTTPTransport", lambda **kwargs: httpx.MockTransport(azure_and_tavily))
+    recorded_answer, recorded_usage, stats = run("record")
+    assert stats["recorded"] == 4 and len(calls) == 4
+
+    # Replay with the network unavailable
+    monkeypatch.setattr(httpx, "AsyncHTTPTransport", lambda **kwargs: httpx.MockTransport(lambda request: pytest.fail("network used")))
+    answer, usage, stats = run("replay")
+    assert answer == recorded_answer and answer.sources == ["https://example.com/eggs"]
+    assert stats["exact"] == 4 and len(calls) == 4
+    # Production-like token counts are reproduced
+    assert usage["llm"]["input_tokens"] == recorded_usage["llm"]["input_tokens"] == 3 * 1500
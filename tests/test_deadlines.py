@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+import graph
+import main
+from langgraph_agent.agent_workflows import SearchAgent
+from langgraph_agent.agent_workflows.deadlines import DeadlineExceeded, new_deadline, time_left, with_deadline
+
+TAVILY_LATENCY = 0.2
+
+
+class SlowTavily:
+    def __init__(self):
+        self.queries = []
+
+    async def search(self, query):
+        await asyncio.sleep(TAVILY_LATENCY)
+        self.queries.append(query)
+        return {"query": query, "results": [{"url": f"https://example.com/{len(self.queries)}", "title": query, "content": "eggs " * 20, "score": 0.5}]}
+
+
+class EmptyIndex:
+    def lookup(self, query):
+        return False, []
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def tavily(monkeypatch):
+    client = SlowTavily()
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: client)
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+    return client
+
+
+def make_agent(timeout_seconds, respond_reserve, respond_latency=0.0, cancelled=None):
+    async def search_model(messages):
+        # Never satisfied: always asks for more searches
+        await asyncio.sleep(0.05)
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": ["a", "b", "c"]}, "id": f"call-{len(messages)}"}])
+
+    async def structured_model(messages):
+        try:
+            await asyncio.sleep(respond_latency)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        tool_messages = [m for m in messages if isinstance(m, ToolMessage)]
+        return graph.ExampleStructuredOutput(response=f"{len(tool_messages)} searches", sources=[])
+
+    agent = SearchAgent.SearchAgent({
+        "agent_state": graph.AgentState,
+        "structured_output_class": graph.ExampleStructuredOutput,
+        "search_agent_prompt": "Search the web.",
+        "input_prompt": "How to cook eggs?",
+        "deadline": new_deadline(timeout_seconds),
+        "respond_reserve": respond_reserve,
+    })
+    agent.create_tools()
+    agent.search_model_with_tools = RunnableLambda(search_model)
+    agent.model_with_structured_output = RunnableLambda(structured_model)
+    agent.graph = agent.build_graph()
+    return agent
+
+
+def test_short_deadline_returns_a_best_effort_answer(tavily):
+    async def main_():
+        agent = make_agent(timeout_seconds=1.5, respond_reserve=0.5)
+        started_at = time.perf_counter()
+        answer = await agent.create_workflow()
+        return answer, time.perf_counter() - started_at
+
+    answer, elapsed = asyncio.run(main_())
+    assert elapsed < 1.5
+    assert answer["messages"][-1].content == SearchAgent.BEST_EFFORT_MESSAGE
+    assert answer["final_response"].response.endswith("searches")
+    # Searching stopped early: the remaining queries were skipped, not sent
+    assert any("skipped_queries" in m.content for m in answer["messages"] if isinstance(m, ToolMessage))
+    assert len(tavily.queries) < 1.0 / TAVILY_LATENCY
+
+
+def test_missed_deadline_cancels_the_outstanding_work(tavily):
+    cancelled = []
+
+    async def main_():
+        agent = make_agent(timeout_seconds=0.6, respond_reserve=0.5, respond_latency=10.0, cancelled=cancelled)
+        started_at = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            await agent.create_workflow()
+        return time.perf_counter() - started_at
+
+    elapsed = asyncio.run(main_())
+    assert elapsed < 1.0
+    assert cancelled == [True]
+
+
+def test_no_deadline_means_no_timeout():
+    config = {"configurable": {}}
+    assert time_left(config) is None
+    assert asyncio.run(with_deadline(asyncio.sleep(0, result="done"), config)) == "done"
+    assert new_deadline(0) is None
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after):
+        self.disconnect_at = time.monotonic() + disconnect_after
+
+    async def is_disconnected(self):
+        return time.monotonic() >= self.disconnect_at
+
+
+def test_client_disconnect_cancels_the_search():
+    cancelled = []
+
+    async def search():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main_():
+        with pytest.raises(main.ClientDisconnected):
+            await main.run_until_disconnected(FakeRequest(0.1), search(), poll_interval=0.05)
+        # Let the cancelled task finish
+        await asyncio.sleep(0)
+
+    asyncio.run(main_())
+    assert cancelled == [True]
@@ -0,0 +1,56 @@
+import copy
+
+from benchmarks.bench_dedup import build_corpus
+from langgraph_agent.tools.dedup import dedup_responses, dedup_results
+
+
+def test_mirrors_are_merged_and_distinct_results_kept():
+    responses = build_corpus(copies=0)
+    deduped = dedup_responses(responses)
+
+    kept = {r["url"]: r for response in deduped for r in response["results"]}
+    assert set(kept) == {
+        "https://www.chinasichuanfood.com/steamed-eggs/",
+        "https://www.recipetineats.com/chinese-tomato-egg-stir-fry/",
+        "https://en.wikipedia.org/wiki/Tea_egg",
+        "https://www.seriouseats.com/egg-fried-rice",
+        "https://www.healthline.com/nutrition/century-egg",
+    }
+    assert kept["https://www.chinasichuanfood.com/steamed-eggs/"]["sources"] == [
+        "https://www.chinasichuanfood.com/steamed-eggs/",
+        "https://recipes.example-syndicate.com/chinese-steamed-eggs",
+        "https://mirror.example-recipes.net/steamed-eggs",
+    ]
+    assert kept["https://en.wikipedia.org/wiki/Tea_egg"]["sources"] == [
+        "https://en.wikipedia.org/wiki/Tea_egg",
+        "https://en.m.wikipedia.org/wiki/Tea_egg",
+    ]
+    assert kept["https://www.seriouseats.com/egg-fried-rice"]["sources"] == ["https://www.seriouseats.com/egg-fried-rice"]
+
+
+def test_representatives_stay_in_their_own_response():
+    responses = build_corpus(copies=0)
+    deduped = dedup_responses(responses)
+
+    assert [response["query"] for response in deduped] == [response["query"] for response in responses]
+    for original, response in zip(responses, deduped):
+        original_urls = {r["url"] for r in original["results"]}
+        assert {r["url"] for r in response["results"]} <= original_urls
+    # The highest scoring member represents each cluster
+    assert [r["url"] for r in deduped[2]["results"]] == ["https://www.healthline.com/nutrition/century-egg"]
+
+
+def test_edited_mirrors_are_merged():
+    responses = build_corpus(copies=2)
+    deduped = dedup_responses(responses)
+    assert sum(len(response["results"]) for response in deduped) == 5
+    assert sum(len(r["sources"]) for response in deduped for r in response["results"]) == 27
+
+
+def test_empty_results_are_never_merged():
+    results = [
+        {"url": "a", "title": "", "content": "", "score": 0.5},
+        {"url": "b", "title": None, "content": "  ", "score": 0.4},
+    ]
+    deduped = dedup_results(copy.deepcopy(results))
+    assert [(r["url"], r["sources"]) for r in deduped] == [("a", ["a"]), ("b", ["b"])]
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+import graph
+from langgraph_agent.agent_workflows import SearchAgent, direct_answer
+from langgraph_agent.agent_workflows.direct_answer import RaceStats, answered_directly, direct_answer_class, race
+
+
+class SlowTavily:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = 0
+        self.cancelled = 0
+
+    async def search(self, query):
+        self.started += 1
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {"query": query, "results": [{"url": "https://example.com/eggs", "title": "t", "content": "c", "score": 0.5}]}
+
+
+class EmptyIndex:
+    def lookup(self, query):
+        return False, []
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def run_race(monkeypatch, confidence, direct_seconds=0.01, search_seconds=0.3):
+    tavily = SlowTavily(search_seconds)
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: tavily)
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+    stats = RaceStats()
+    monkeypatch.setattr(direct_answer, "_race_stats", stats)
+    direct_class = direct_answer_class(graph.ExampleStructuredOutput)
+
+    async def search_model(messages):
+        if any(isinstance(m, ToolMessage) for m in messages):
+            return AIMessage(content="agent_respond")
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": ["eggs"]}, "id": "call-1"}])
+
+    async def respond_model(messages):
+        return graph.ExampleStructuredOutput(response="searched answer", sources=["https://example.com/eggs"])
+
+    async def direct_model(messages):
+        await asyncio.sleep(direct_seconds)
+        return direct_class(answer=graph.ExampleStructuredOutput(response="direct answer", sources=[]), confidence=confidence)
+
+    agent = SearchAgent.SearchAgent({
+        "agent_state": graph.AgentState,
+        "structured_output_class": graph.ExampleStructuredOutput,
+        "search_agent_prompt": "Search the web.",
+        "direct_answer_prompt": "Answer from your own knowledge.",
+        "input_prompt": "What is the boiling point of water at sea level?",
+        "model_tier": "reasoning",
+        "direct_answer_race": True,
+    })
+    agent.create_tools()
+    agent.search_model_with_tools = RunnableLambda(search_model)
+    agent.model_with_structured_output = RunnableLambda(respond_model)
+    agent.model_with_direct_answer = RunnableLambda(direct_model)
+    agent.graph = agent.build_graph()
+    answer = asyncio.run(agent.create_workflow())
+    return answer, tavily, stats
+
+
+def test_a_confident_direct_answer_wins_and_cancels_the_search(monkeypatch):
+    answer, tavily, stats = run_race(monkeypatch, confidence=0.95)
+    assert answer["final_response"].response == "direct answer"
+    assert answered_directly(answer)
+    # The search was under way, and was cancelled instead of running to completion
+    assert tavily.started == 1 and tavily.cancelled == 1
+    assert stats.metrics()["outcomes"] == {"direct": 1}
+
+
+def test_an_unconfident_direct_answer_falls_back_to_the_search(monkeypatch):
+    answer, tavily, stats = run_race(monkeypatch, confidence=0.4)
+    assert answer["final_response"].response == "searched answer"
+    assert not answered_directly(answer)
+    assert tavily.cancelled == 0
+    assert stats.metrics()["outcomes"] == {"low_confidence": 1}
+
+
+def test_the_search_wins_when_it_finishes_first(monkeypatch):
+    answer, _, stats = run_race(monkeypatch, confidence=0.99, direct_seconds=0.3, search_seconds=0.01)
+    assert answer["final_response"].response == "searched answer"
+    assert stats.metrics()["outcomes"] == {"search_first": 1}
+
+
+def test_race_errors_and_stats():
+    async def slow(value, seconds):
+        await asyncio.sleep(seconds)
+        return value
+
+    async def broken():
+        raise ValueError("unparseable")
+
+    # A failing direct answer leaves the request to the search branch
+    outcome, result = asyncio.run(race(slow("searched", 0.02), broken(), 0.5))
+    assert (outcome, result) == ("direct_error", "searched")
+
+    async def failing_search():
+        raise TimeoutError
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(race(failing_search(), slow(None, 1), 0.5))
+
+    stats = RaceStats()
+    stats.record("direct", 0.5)
+    stats.record("low_confidence", 4.0)
+    stats.record("search_first", 2.0)
+    metrics = stats.metrics()
+    assert metrics["races"] == 3 and metrics["win_rate"] == 0.333
+    # One win saved the average search (3 s) minus its own 0.5 s
+    assert metrics["search_seconds_avg"] == 3.0 and metrics["estimated_seconds_saved"] == 2.5
@@ -0,0 +1,67 @@
+import asyncio
+
+from benchmarks.bench_model_http_pool import MockOpenAIServer, make_model
+from langgraph_agent.agent_workflows import SearchAgent, http_pool
+from langgraph_agent.agent_workflows.http_pool import close_model_http_client, create_model_http_client, get_model_http_client
+from langgraph_agent.structured_output.registry import structured_output_registry
+
+
+def test_models_share_keep_alive_connections():
+    async def main(url):
+        client = create_model_http_client()
+        try:
+            models = [make_model(url, client), make_model(url, client)]
+            for _ in range(3):
+                for model in models:
+                    response = await model.ainvoke("hello")
+                    assert response.content == "mock answer"
+            return client.pool_metrics()
+        finally:
+            await client.aclose()
+
+    with MockOpenAIServer() as server:
+        metrics = asyncio.run(main(server.url))
+        assert server.connections_accepted == 1
+
+    assert metrics["requests_total"] == 6
+    assert metrics["connections_opened"] == 1
+    assert metrics["requests_in_flight"] == 0
+    assert metrics["connection_reuse_ratio"] == round(5 / 6, 3)
+    assert metrics["pool_connections"] == 1
+    assert metrics["pool_idle_connections"] == 1
+
+
+def test_concurrent_requests_are_bounded_by_the_pool():
+    async def main(url):
+        client = create_model_http_client(max_connections=2, max_keepalive_connections=2)
+        try:
+            model = make_model(url, client)
+            await asyncio.gather(*(model.ainvoke("hello") for _ in range(6)))
+            return client.pool_metrics()
+        finally:
+            await client.aclose()
+
+    with MockOpenAIServer(connect_latency=0.05) as server:
+        metrics = asyncio.run(main(server.url))
+        assert server.connections_accepted <= 2
+
+    assert metrics["requests_total"] == 6
+    assert metrics["connections_opened"] <= 2
+    assert metrics["errors_total"] == 0
+
+
+def test_closing_the_shared_client_drops_the_models_bound_to_it(monkeypatch):
+    monkeypatch.setattr(http_pool, "_model_http_client", None)
+    monkeypatch.setattr(SearchAgent, "_compiled_graphs", {("key",): "graph"})
+    monkeypatch.setattr(structured_output_registry, "_bindings", {("key",): "binding"})
+
+    async def main():
+        client = get_model_http_client()
+        await close_model_http_client()
+        return client, get_model_http_client()
+
+    client, replacement = asyncio.run(main())
+    assert client.is_closed and replacement is not client
+    # A second start-up in the process rebuilds its graphs and bindings on the new client
+    assert SearchAgent._compiled_graphs == {} and structured_output_registry._bindings == {}
+    asyncio.run(close_model_http_client())
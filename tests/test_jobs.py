@@ -0,0 +1,180 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from gen_utils import admission
+from gen_utils.admission import AdmissionController
+from gen_utils.job_queue import JobWorkerPool, Retry, SearchJobQueue
+
+
+def test_jobs_are_claimed_once_and_completed(tmp_path):
+    async def main_():
+        queue = await SearchJobQueue.open(str(tmp_path / "jobs.sqlite"))
+        first = await queue.enqueue("first question", timeout_seconds=30)
+        second = await queue.enqueue("second question", thread_id="t1")
+        claimed = await queue.claim("worker-a")
+        other = await queue.claim("worker-b")
+        nothing = await queue.claim("worker-c")
+        await queue.complete(claimed["id"], "worker-a", {"final_answer": {"response": "done"}})
+        # Only the worker holding a job may finish it
+        await queue.fail(other["id"], "worker-a", "not mine")
+        jobs = await queue.get(first), await queue.get(second)
+        stats = await queue.stats()
+        await queue.aclose()
+        return claimed, other, nothing, jobs, stats
+
+    claimed, other, nothing, (first, second), stats = asyncio.run(main_())
+    assert claimed["question"] == "first question" and claimed["timeout_seconds"] == 30
+    assert other["thread_id"] == "t1"
+    assert nothing is None
+    assert first["status"] == "succeeded" and first["result"] == {"final_answer": {"response": "done"}}
+    assert second["status"] == "running" and second["worker_id"] == "worker-b"
+    assert stats == {"queued": 0, "running": 1, "succeeded": 1, "failed": 0}
+
+
+def test_jobs_survive_a_restart_and_abandoned_jobs_are_retried(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite")
+
+    async def main_():
+        queue = await SearchJobQueue.open(db_path, lease_seconds=0.05, max_attempts=2)
+        job_id = await queue.enqueue("question")
+        await queue.claim("dead-worker")
+        await queue.aclose()
+
+        # After the restart the lease has expired: the job is claimed again
+        queue = await SearchJobQueue.open(db_path, lease_seconds=0.05, max_attempts=2)
+        await asyncio.sleep(0.1)
+        retried = await queue.claim("new-worker")
+        # The dead worker's late result is ignored
+        await queue.complete(job_id, "dead-worker", {"stale": True})
+        await asyncio.sleep(0.1)
+        # Abandoned twice: failed instead of claimed a third time
+        third = await queue.claim("another-worker")
+        job = await queue.get(job_id)
+        await queue.aclose()
+        return retried, third, job
+
+    retried, third, job = asyncio.run(main_())
+    assert retried["attempts"] == 2 and retried["worker_id"] == "new-worker"
+    assert third is None
+    assert job["status"] == "failed" and job["result"] is None
+
+
+def test_workers_sharing_the_file_never_claim_the_same_job(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite")
+
+    async def main_():
+        queues = [await SearchJobQueue.open(db_path) for _ in range(3)]
+        for n in range(20):
+            await queues[0].enqueue(f"question {n}")
+
+        async def drain(queue, worker_id):
+            claimed = []
+            while (job := await queue.claim(worker_id)) is not None:
+                claimed.append(job["id"])
+            return claimed
+
+        results = await asyncio.gather(*(drain(queue, f"worker-{n}") for n, queue in enumerate(queues)))
+        for queue in queues:
+            await queue.aclose()
+        return results
+
+    claimed = [job_id for result in asyncio.run(main_()) for job_id in result]
+    assert len(claimed) == 20 and len(set(claimed)) == 20
+
+
+def test_worker_pool_runs_retries_and_fails_jobs(tmp_path):
+    async def main_():
+        queue = await SearchJobQueue.open(str(tmp_path / "jobs.sqlite"))
+        calls = {}
+
+        async def handler(job):
+            calls[job["question"]] = calls.get(job["question"], 0) + 1
+            if job["question"] == "overloaded" and calls["overloaded"] == 1:
+                raise Retry(0)
+            if job["question"] == "broken":
+                raise ValueError("bad question")
+            return {"answer": job["question"]}
+
+        ids = {question: await queue.enqueue(question) for question in ("fine", "overloaded", "broken")}
+        pool = JobWorkerPool(queue, handler, concurrency=2, poll_interval=0.01)
+        pool.start()
+        for _ in range(200):
+            if (await queue.stats())["queued"] == 0 and (await queue.stats())["running"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        jobs = {question: await queue.get(job_id) for question, job_id in ids.items()}
+        await queue.aclose()
+        return jobs, calls
+
+    jobs, calls = asyncio.run(main_())
+    assert jobs["fine"]["status"] == "succeeded" and jobs["fine"]["result"] == {"answer": "fine"}
+    # A retried job does not use up an attempt
+    assert jobs["overloaded"]["status"] == "succeeded" and jobs["overloaded"]["attempts"] == 1
+    assert calls["overloaded"] == 2
+    assert jobs["broken"]["status"] == "failed" and jobs["broken"]["error"] == "ValueError: bad question"
+
+
+def test_stopping_the_pool_requeues_running_jobs(tmp_path):
+    async def main_():
+        queue = await SearchJobQueue.open(str(tmp_path / "jobs.sqlite"))
+        started = asyncio.Event()
+
+        async def handler(job):
+            started.set()
+            await asyncio.sleep(10)
+
+        job_id = await queue.enqueue("long question")
+        pool = JobWorkerPool(queue, handler, concurrency=1, poll_interval=0.01)
+        pool.start()
+        await asyncio.wait_for(started.wait(), timeout=1)
+        await pool.stop()
+        job = await queue.get(job_id)
+        await queue.aclose()
+        return job
+
+    job = asyncio.run(main_())
+    assert job["status"] == "queued" and job["attempts"] == 0 and job["worker_id"] is None
+
+
+def test_job_endpoints(monkeypatch, tmp_path):
+    async def fake_run_graph(question, thread_id=None, timeout_seconds=None):
+        await asyncio.sleep(0.05)
+        return {"final_answer": {"response": question, "timeout_seconds": timeout_seconds}}
+
+    monkeypatch.setattr(main, "run_graph", fake_run_graph)
+    monkeypatch.setattr(admission, "_admission_controller", AdmissionController())
+    monkeypatch.setenv("WARMUP_ENABLED", "false")
+    monkeypatch.setenv("JOB_DB_PATH", str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setenv("JOB_POLL_INTERVAL", "0.01")
+    monkeypatch.setenv("JOB_DEADLINE_SECONDS", "300")
+
+    with TestClient(main.app) as client:
+        response = client.post("/search/jobs", json={"question": "What is new?"})
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] == "queued" and job["status_url"] == f"/search/jobs/{job['job_id']}"
+
+        deadline = time.monotonic() + 5
+        while (body := client.get(job["status_url"]).json())["status"] != "succeeded":
+            assert body["status"] in ("queued", "running") and time.monotonic() < deadline
+            time.sleep(0.02)
+        assert body["response"] == {"final_answer": {"response": "What is new?", "timeout_seconds": 300.0}}
+        assert body["attempts"] == 1 and body["error"] is None
+
+        assert client.get("/search/jobs/unknown").status_code == 404
+        assert client.get("/metrics").json()["jobs"]["succeeded"] == 1
+
+
+def test_job_workers_can_be_disabled(monkeypatch, tmp_path):
+    monkeypatch.setenv("WARMUP_ENABLED", "false")
+    monkeypatch.setenv("JOB_WORKERS_ENABLED", "false")
+    monkeypatch.setenv("JOB_DB_PATH", str(tmp_path / "jobs.sqlite"))
+    with TestClient(main.app) as client:
+        # Jobs are still accepted; another process on the node runs them
+        assert client.post("/search/jobs", json={"question": "q"}).status_code == 202
+        assert main.app.state.job_workers is None
+        assert client.get("/metrics").json()["jobs"]["queued"] == 1
@@ -0,0 +1,72 @@
+import json
+import time
+from pathlib import Path
+
+from langgraph_agent.tools.tools import LocalSearchIndex, condense_tavily_response
+
+FIXTURE_PATH = Path(__file__).parent.parent / "benchmarks" / "fixtures" / "search_results.json"
+
+
+def load_fixture():
+    with open(FIXTURE_PATH, "r") as f:
+        return json.load(f)
+
+
+def build_index(index_dir, responses, **kwargs):
+    index = LocalSearchIndex(str(index_dir), **kwargs)
+    for response in responses:
+        index.add(condense_tavily_response(response))
+    return index
+
+
+def test_past_queries_are_served_locally(tmp_path):
+    responses = load_fixture()
+    index = build_index(tmp_path, responses)
+
+    for response in responses:
+        served, hits = index.lookup(response["query"])
+        assert served, response["query"]
+        assert hits[0]["query"] == response["query"]
+
+    for query in ["best restaurants in toronto", "how long to steam eggs"]:
+        served, _ = index.lookup(query)
+        assert not served, query
+
+    assert index.stats()["local_hit_rate"] == 0.6
+
+
+def test_persist_and_reload(tmp_path):
+    responses = load_fixture()
+    index = build_index(tmp_path, responses, persist_every=4)
+    index.persist()
+
+    reloaded = LocalSearchIndex(str(tmp_path))
+    assert len(reloaded.metadata) == reloaded.base_count == len(index.metadata)
+    served, hits = reloaded.lookup("chinese egg recipes")
+    assert served and hits[0]["query"] == "chinese egg recipes"
+
+
+def test_stale_metadata_tail_is_not_matched_to_new_vectors(tmp_path):
+    responses = load_fixture()
+    index = build_index(tmp_path, responses[:1])
+    index.persist()
+
+    # Simulate a crash after the metadata was written but before the index was
+    with open(tmp_path / "metadata.jsonl", "a") as f:
+        f.write(json.dumps({"query": "stale", "url": "https://stale.example", "title": "", "content": "", "score": 0, "added_at": time.time()}) + "\n")
+
+    reloaded = build_index(tmp_path, responses[1:])
+    reloaded.persist()
+    again = LocalSearchIndex(str(tmp_path))
+    assert "https://stale.example" not in {item["url"] for item in again.metadata}
+    assert again.base_count == len(again.metadata)
+
+
+def test_expired_results_are_not_returned(tmp_path):
+    index = build_index(tmp_path, load_fixture(), max_age_seconds=60)
+    assert index.search("chinese egg recipes")
+
+    for item in index.metadata:
+        item["added_at"] -= 120
+    assert index.search("chinese egg recipes") == []
+    assert not index.lookup("chinese egg recipes")[0]
@@ -0,0 +1,93 @@
+import logging
+import threading
+
+from langchain_core.messages import AIMessage
+
+from gen_utils.log_queue import Payload, effective_handlers, install_queue_logging, stop_queue_logging
+from gen_utils.parsing_utils import get_logger_filepath
+from langgraph_agent.agent_workflows import SearchAgent
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+        self.threads.add(threading.current_thread().name)
+
+
+class Rendered:
+    """A payload value recording the thread that renders it."""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread().name)
+        return "rendered"
+
+
+def queued_logger(name, **kwargs):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+    install_queue_logging(logger, **kwargs)
+    return logger, handler
+
+
+def test_records_are_formatted_off_the_calling_thread():
+    logger, handler = queued_logger("test_log_queue.lazy", sample_every=1)
+    value = Rendered()
+    try:
+        logger.info("turn message=%s", Payload(value))
+        # Installing twice keeps a single queue
+        assert install_queue_logging(logger) is None
+    finally:
+        stop_queue_logging()
+    assert handler.lines == ["turn message=rendered"]
+    assert value.threads and threading.current_thread().name not in value.threads + list(handler.threads)
+    # The logger has its handler back
+    assert logger.handlers == [handler]
+
+
+def test_payloads_are_sampled_and_truncated():
+    logger, handler = queued_logger("test_log_queue.sampled", sample_every=3, max_chars=10)
+    try:
+        for n in range(6):
+            logger.debug("search final_answer=%s", Payload({"response": "x" * 50, "n": n}, as_json=True))
+        logger.debug("other=%s", Payload("short"))
+    finally:
+        stop_queue_logging()
+    assert handler.lines[0] == 'search final_answer={"response... (74 chars)'
+    assert handler.lines[1:3] == ["search final_answer=<not sampled>"] * 2
+    assert handler.lines[3].startswith("search final_answer={") and handler.lines[4].endswith("<not sampled>")
+    # Each message template is sampled on its own
+    assert handler.lines[6] == "other=short"
+
+
+def test_file_handlers_behind_the_queue_are_found(tmp_path):
+    logger = logging.getLogger("test_log_queue.file")
+    file_handler = logging.FileHandler(tmp_path / "run.log")
+    logger.addHandler(file_handler)
+    install_queue_logging(logger)
+    try:
+        assert effective_handlers(logger) == [file_handler]
+        assert get_logger_filepath(logger) == str(tmp_path / "run.log")
+    finally:
+        stop_queue_logging()
+        logger.removeHandler(file_handler)
+        file_handler.close()
+
+
+def test_routing_logs_instead_of_printing(capsys, caplog):
+    agent = SearchAgent.SearchAgent({})
+    message = AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": ["eggs"]}, "id": "call-1"}])
+    with caplog.at_level(logging.DEBUG, logger=SearchAgent.__name__):
+        assert agent.search_should_continue({"messages": [message]}) == "search_tools"
+    assert capsys.readouterr().out == ""
+    assert "search_agent route=search_tools" in caplog.text
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+import graph
+from langgraph_agent.agent_workflows import SearchAgent, model_router
+from langgraph_agent.agent_workflows.model_router import ModelRouter, RouterConfig, classify_question
+from langgraph_agent.structured_output.registry import structured_output_registry
+
+
+@pytest.mark.parametrize("question, tier", [
+    ("What is the capital of France?", "fast"),
+    ("Who was the first person on the moon?", "fast"),
+    ("How to cook eggs in Chinese way", "fast"),
+    ("Compare the pros and cons of PostgreSQL versus MySQL for analytics", "reasoning"),
+    ("Why did inflation rise in 2022 and what should we expect next year?", "reasoning"),
+    ("Explain the impact of interest rates on housing prices", "reasoning"),
+])
+def test_questions_are_classified_by_complexity(question, tier):
+    assert classify_question(question, RouterConfig()).tier == tier
+
+
+def test_thresholds_are_configurable():
+    question = "Explain photosynthesis"
+    assert classify_question(question, RouterConfig(complexity_threshold=2)).tier == "reasoning"
+    assert classify_question(question, RouterConfig(complexity_threshold=5)).tier == "fast"
+    long_question = " ".join(["word"] * 30)
+    decision = classify_question(long_question, RouterConfig(long_question_words=10, complexity_threshold=2))
+    assert decision.tier == "reasoning" and decision.signals == ["very_long"]
+
+
+def test_routing_needs_a_fast_deployment(monkeypatch):
+    monkeypatch.delenv("AZURE_OPENAI_FAST_DEPLOYMENT_NAME", raising=False)
+    router = ModelRouter(RouterConfig.from_env())
+    assert router.route("What is the capital of France?").tier == "reasoning"
+
+    monkeypatch.setenv("AZURE_OPENAI_FAST_DEPLOYMENT_NAME", "gpt-4o")
+    router = ModelRouter(RouterConfig.from_env())
+    assert router.route("What is the capital of France?").tier == "fast"
+    assert router.metrics()["tiers"]["fast"]["routed_total"] == 1
+
+
+def test_initialize_model_builds_one_model_per_tier(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT_NAME", "o3")
+    monkeypatch.setenv("AZURE_OPENAI_FAST_DEPLOYMENT_NAME", "gpt-4o")
+    monkeypatch.setattr(SearchAgent, "retrieve_secret", lambda secret_name, project_id: {})
+    monkeypatch.setattr(SearchAgent, "_tracer_provider", object())
+
+    agent = SearchAgent.SearchAgent({"structured_output_class": graph.ExampleStructuredOutput})
+    agent.create_tools()
+    agent.initialize_model()
+
+    assert agent.tier_models["reasoning"]["model"].deployment_name == "o3"
+    assert agent.tier_models["reasoning"]["model"].openai_api_version == "2024-12-01-preview"
+    assert agent.tier_models["fast"]["model"].deployment_name == "gpt-4o"
+    assert agent.tier_models["fast"]["model"].openai_api_version == "2024-08-01-preview"
+    assert agent.model is agent.tier_models["reasoning"]["model"]
+
+
+def test_structured_output_bindings_follow_a_rotated_key(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "old-key")
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT_NAME", "o3")
+    monkeypatch.delenv("AZURE_OPENAI_FAST_DEPLOYMENT_NAME", raising=False)
+    monkeypatch.setattr(SearchAgent, "retrieve_secret", lambda secret_name, project_id: {})
+    monkeypatch.setattr(SearchAgent, "_tracer_provider", object())
+    monkeypatch.setattr(structured_output_registry, "_bindings", {})
+
+    def respond_binding():
+        agent = SearchAgent.SearchAgent({"structured_output_class": graph.ExampleStructuredOutput})
+        agent.create_tools()
+        agent.initialize_model()
+        return agent.tier_models["reasoning"]["respond"]
+
+    first = respond_binding()
+    assert respond_binding() is first
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "new-key")
+    assert respond_binding() is not first
+
+
+def make_tier_models(calls, tier):
+    async def search_model(messages):
+        calls.append((tier, "search"))
+        if any(isinstance(m, ToolMessage) for m in messages):
+            return AIMessage(content="agent_respond", usage_metadata={"input_tokens": 100, "output_tokens": 5, "total_tokens": 105})
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": ["q"]}, "id": "call-1"}])
+
+    async def respond_model(messages):
+        calls.append((tier, "respond"))
+        raw = AIMessage(content="{}", usage_metadata={"input_tokens": 200, "output_tokens": 20, "total_tokens": 220})
+        return {"raw": raw, "parsed": graph.ExampleStructuredOutput(response=tier, sources=[]), "parsing_error": None}
+
+    return {"search": RunnableLambda(search_model), "respond": RunnableLambda(respond_model)}
+
+
+@pytest.mark.parametrize("question, fast_respond, expected", [
+    ("What is the capital of France?", False, {("fast", "search"), ("fast", "respond")}),
+    ("Compare the pros and cons of solar versus wind power", False, {("reasoning", "search"), ("reasoning", "respond")}),
+    ("Compare the pros and cons of solar versus wind power", True, {("reasoning", "search"), ("fast", "respond")}),
+])
+def test_search_agent_uses_the_routed_tier(monkeypatch, question, fast_respond, expected):
+    class OneResultTavily:
+        async def search(self, query):
+            return {"query": query, "results": [{"url": "https://example.com", "title": "t", "content": "c", "score": 0.5}]}
+
+    class EmptyIndex:
+        def lookup(self, query):
+            return False, []
+
+        def add(self, results):
+            return 0
+
+        def stats(self):
+            return {}
+
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: OneResultTavily())
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+    router = ModelRouter(RouterConfig(enabled=True, fast_respond=fast_respond))
+    monkeypatch.setattr(model_router, "_model_router", router)
+
+    calls = []
+    agent = SearchAgent.SearchAgent({
+        "agent_state": graph.AgentState,
+        "structured_output_class": graph.ExampleStructuredOutput,
+        "search_agent_prompt": "Search the web.",
+        "input_prompt": question,
+    })
+    agent.create_tools()
+    agent.tier_models = {tier: make_tier_models(calls, tier) for tier in ("fast", "reasoning")}
+    agent.graph = agent.build_graph()
+    answer = asyncio.run(agent.create_workflow())
+
+    assert set(calls) == expected
+    search_tier = "fast" if ("fast", "search") in calls else "reasoning"
+    respond_tier = "fast" if ("fast", "respond") in calls else "reasoning"
+    # The stub structured-output models answer with their tier
+    assert answer["final_response"].response == respond_tier
+    metrics = router.metrics()["tiers"]
+    assert metrics[search_tier]["search"]["calls"] == 2
+    assert metrics[search_tier]["search"]["latency_seconds_p50"] is not None
+    assert metrics[respond_tier]["respond"]["calls"] == 1
+    assert metrics[respond_tier]["input_tokens"] >= 200
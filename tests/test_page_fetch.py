@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from langgraph_agent.tools.page_fetch import PageFetcher, close_page_fetcher, get_page_fetcher
+
+ARTICLE = (
+    "<html><head><title>Steamed eggs</title><script>var tracking = 1;</script></head><body>"
+    "<nav>Home Recipes About Contact Subscribe today</nav>"
+    "<article><h1>Chinese steamed eggs</h1>"
+    "<p>Beat four eggs with warm water and a pinch of salt until smooth.</p>"
+    "<p>Short.</p>"
+    "<p>Steam over low heat for about twelve minutes until just set.</p></article>"
+    "<footer>Copyright 2024 all rights reserved by the publisher</footer></body></html>"
+)
+ETAG = '"v1"'
+
+
+class StaticHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/slow":
+            time.sleep(1.0)
+        if self.path == "/etag" and self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        body = (ARTICLE * 200 if self.path == "/large" else ARTICLE).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/etag":
+            self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StaticHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def fetch(urls, **kwargs):
+    async def main():
+        fetcher = PageFetcher(**kwargs)
+        try:
+            results = []
+            for batch in urls:
+                results.append(await fetcher.fetch_many(batch))
+            return results
+        finally:
+            await fetcher.aclose()
+    return asyncio.run(main())
+
+
+def test_extracts_main_content(base_url):
+    [[page]] = fetch([[f"{base_url}/page"]])
+    assert page["title"] == "Steamed eggs"
+    assert page["content"].splitlines() == [
+        "Chinese steamed eggs",
+        "Beat four eggs with warm water and a pinch of salt until smooth.",
+        "Steam over low heat for about twelve minutes until just set.",
+    ]
+    assert not page["truncated"]
+
+
+def test_byte_cap_truncates(base_url):
+    [[page]] = fetch([[f"{base_url}/large"]], max_bytes=4096)
+    assert page["truncated"]
+    assert 0 < len(page["content"]) < 4096
+
+
+def test_timeout(base_url):
+    start = time.monotonic()
+    [[slow, fast]] = fetch([[f"{base_url}/slow", f"{base_url}/page"]], timeout=0.2)
+    assert "timed out" in slow["error"]
+    assert fast["content"]
+    assert time.monotonic() - start < 0.9
+
+
+def test_etag_revalidation(base_url):
+    StaticHandler.requests_seen.clear()
+    [[first], [second]] = fetch([[f"{base_url}/etag"], [f"{base_url}/etag"]])
+    assert not first["from_cache"]
+    assert second["from_cache"]
+    assert second["content"] == first["content"]
+    assert StaticHandler.requests_seen == [("/etag", None), ("/etag", ETAG)]
+
+
+def test_shared_fetcher_is_closed_and_recreated(base_url):
+    async def main():
+        fetcher = get_page_fetcher()
+        [page] = await fetcher.fetch_many([f"{base_url}/page"])
+        await close_page_fetcher()
+        # A later request, e.g. after a second start-up, gets a new fetcher
+        replacement = get_page_fetcher()
+        await close_page_fetcher()
+        return fetcher, page, replacement
+
+    fetcher, page, replacement = asyncio.run(main())
+    assert page["content"]
+    assert fetcher.client.is_closed and replacement is not fetcher
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+import main
+from gen_utils import admission
+from gen_utils.admission import AdmissionController
+from gen_utils.profiling import PROFILE_HEADER, profile_request, profiling_requested
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def upstream_call():
+    await asyncio.sleep(0.1)
+
+
+async def workload():
+    busy_wait(0.1)
+    await asyncio.gather(upstream_call(), upstream_call())
+
+
+def test_profiling_is_admin_only(monkeypatch):
+    monkeypatch.delenv("PROFILE_ADMIN_TOKEN", raising=False)
+    assert not profiling_requested("secret")
+    monkeypatch.setenv("PROFILE_ADMIN_TOKEN", "secret")
+    assert profiling_requested("secret")
+    assert not profiling_requested("guess") and not profiling_requested(None)
+
+
+def test_profile_has_a_flame_graph_and_a_task_timeline(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILES_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_SAMPLE_INTERVAL", "0.002")
+
+    async def main_():
+        loop = asyncio.get_running_loop()
+        async with profile_request("test") as profile:
+            await workload()
+        # Tasks created outside the profiled block are not recorded
+        await asyncio.gather(upstream_call())
+        return profile, loop.get_task_factory()
+
+    profile, task_factory = asyncio.run(main_())
+    assert task_factory is None
+
+    folded = (tmp_path / f"{profile.profile_id}.folded").read_text()
+    weights = {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in folded.splitlines()}
+    busy = sum(weight for stack, weight in weights.items() if "busy_wait" in stack)
+    summary = json.loads((tmp_path / f"{profile.profile_id}.json").read_text())
+    # The busy half of the request weighs about half of the sampled time
+    assert summary["samples"] > 0 and 0.3 < busy / sum(weights.values()) < 0.7
+    # The loop spent the sleeps idle, waiting in its selector
+    assert 0.2 < summary["loop_idle_ratio"] < 0.8
+
+    timeline = json.loads((tmp_path / f"{profile.profile_id}.timeline.json").read_text())
+    tasks = [event for event in timeline["traceEvents"] if event["tid"] > 0]
+    assert [event["name"] for event in tasks] == ["upstream_call", "upstream_call"]
+    # Concurrent tasks are on separate lanes
+    assert tasks[0]["tid"] != tasks[1]["tid"]
+    assert all(event["dur"] >= 100_000 and event["args"]["state"] == "done" for event in tasks)
+    assert summary["tasks"] == 2 and set(profile.files) == {"flamegraph", "timeline", "summary"}
+
+
+def test_search_is_profiled_on_request(monkeypatch, tmp_path):
+    async def fake_run_graph(question, thread_id=None, timeout_seconds=None, include_usage=False):
+        await workload()
+        return {"final_answer": {"response": question, "sources": []}}
+
+    monkeypatch.setattr(main, "run_graph", fake_run_graph)
+    monkeypatch.setattr(admission, "_admission_controller", AdmissionController())
+    monkeypatch.setenv("PROFILE_ADMIN_TOKEN", "secret")
+    monkeypatch.setenv("PROFILES_DIR", str(tmp_path / "profiles"))
+    monkeypatch.chdir(tmp_path)
+
+    async def main_():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            plain = await client.post("/search", json={"question": "eggs"})
+            guessed = await client.post("/search", json={"question": "eggs"}, headers={PROFILE_HEADER: "guess"})
+            profiled = await client.post("/search", json={"question": "eggs"}, headers={PROFILE_HEADER: "secret"})
+        return plain.json(), guessed.json(), profiled.json()
+
+    plain, guessed, profiled = asyncio.run(main_())
+    assert "profile" not in plain["response"] and "profile" not in guessed["response"]
+    profile = profiled["response"]["profile"]
+    assert profile["samples"] > 0
+    # Only the profiled request wrote a profile
+    assert sorted(path.name for path in (tmp_path / "profiles").iterdir()) == sorted(
+        profile["profile_id"] + suffix for suffix in (".folded", ".json", ".timeline.json")
+    )
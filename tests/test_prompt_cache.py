@@ -0,0 +1,88 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+import graph
+from langgraph_agent.agent_workflows import SearchAgent, prompt_cache
+from langgraph_agent.agent_workflows.prompt_cache import PromptCacheStats, assemble_messages, static_prefix
+
+
+class OneResultTavily:
+    async def search(self, query):
+        return {"query": query, "results": [{"url": "https://example.com", "title": "t", "content": "c", "score": 0.5}]}
+
+
+class EmptyIndex:
+    def lookup(self, query):
+        return False, []
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def test_static_prefix_leads_and_legacy_system_messages_are_dropped():
+    prefix = static_prefix("You search the web.", (("human", "example question"), ("ai", "example answer")))
+    assert prefix is static_prefix("You search the web.", (("human", "example question"), ("ai", "example answer")))
+    conversation = [HumanMessage(content="question"), SystemMessage(content="You search the web."), AIMessage(content="answer")]
+    messages = assemble_messages(prefix, conversation)
+    assert [type(m).__name__ for m in messages] == ["SystemMessage", "HumanMessage", "AIMessage", "HumanMessage", "AIMessage"]
+    assert [m.content for m in messages[3:]] == ["question", "answer"]
+
+
+def test_model_calls_share_an_identical_prefix_across_requests(monkeypatch):
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: OneResultTavily())
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+    stats = PromptCacheStats()
+    monkeypatch.setattr(prompt_cache, "_prompt_cache_stats", stats)
+    sent = []
+
+    async def search_model(messages):
+        sent.append(messages)
+        # The provider caches what an earlier call already sent
+        usage = {"input_tokens": 1200, "output_tokens": 10, "total_tokens": 1210,
+                 "input_token_details": {"cache_read": 1024 if len(sent) > 1 else 0}}
+        if any(isinstance(m, ToolMessage) for m in messages):
+            return AIMessage(content="agent_respond", usage_metadata=usage)
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": ["q"]}, "id": f"call-{len(sent)}"}], usage_metadata=usage)
+
+    async def respond_model(messages):
+        sent.append(messages)
+        return graph.ExampleStructuredOutput(response="answer", sources=[])
+
+    async def run(question):
+        agent = SearchAgent.SearchAgent({
+            "agent_state": graph.AgentState,
+            "structured_output_class": graph.ExampleStructuredOutput,
+            "search_agent_prompt": "Search the web.",
+            "few_shot_messages": [("human", "example question"), ("ai", "example answer")],
+            "input_prompt": question,
+            "model_tier": "reasoning",
+        })
+        agent.create_tools()
+        agent.search_model_with_tools = RunnableLambda(search_model)
+        agent.model_with_structured_output = RunnableLambda(respond_model)
+        agent.graph = agent.build_graph()
+        return await agent.create_workflow()
+
+    async def main_():
+        return [await run("How to cook eggs?"), await run("What is the tallest building?")]
+
+    answers = asyncio.run(main_())
+    # 2 search turns and 1 structured-output pass per request
+    assert len(sent) == 6
+    prefixes = {tuple((type(m), m.content) for m in messages[:3]) for messages in sent}
+    assert prefixes == {((SystemMessage, "Search the web."), (HumanMessage, "example question"), (AIMessage, "example answer"))}
+    assert all(sum(isinstance(m, SystemMessage) for m in messages) == 1 for messages in sent)
+    assert sent[0][3].content == "How to cook eggs?" and sent[3][3].content == "What is the tallest building?"
+    # The graph state holds the conversation only
+    assert not any(isinstance(m, SystemMessage) for answer in answers for m in answer["messages"])
+
+    metrics = stats.metrics()["search"]
+    assert metrics["calls"] == 4
+    assert metrics["hit_rate"] == 0.75
+    assert metrics["cached_tokens"] == 3 * 1024 and metrics["input_tokens"] == 4 * 1200
+    assert metrics["estimated_seconds_saved"] is not None
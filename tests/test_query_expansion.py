@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+import graph
+from langgraph_agent.agent_workflows import SearchAgent, query_expansion
+from langgraph_agent.agent_workflows.query_expansion import QueryExpansionStats, expand_question, keywords
+
+
+@pytest.mark.parametrize("question, queries", [
+    ("where are nice restaurants in toronto",
+     ["where are nice restaurants in toronto", "nice restaurants toronto", "best restaurants toronto"]),
+    ("How to cook eggs in Chinese way?",
+     ["How to cook eggs in Chinese way", "cook eggs Chinese", "cook eggs in Chinese way step by step guide"]),
+    ("When is the next solar eclipse?",
+     ["When is the next solar eclipse", "next solar eclipse", "next solar eclipse date"]),
+])
+def test_simple_questions_are_expanded_locally(question, queries):
+    plan = expand_question(question)
+    assert plan.fallback_reason is None
+    assert plan.queries == queries
+
+
+@pytest.mark.parametrize("question, reason", [
+    ("Compare the pros and cons of PostgreSQL versus MySQL", "complex"),
+    ("Why did inflation rise in 2022?", "complex"),
+    (" ".join(["word"] * 20), "too_long"),
+    ("What is it?", "no_keywords"),
+])
+def test_other_questions_fall_back_to_the_model(question, reason):
+    assert expand_question(question).fallback_reason == reason
+
+
+def test_keywords_keep_order_and_case():
+    assert keywords("What is the GDP of the USA in 2024, and the GDP of Canada?") == ["GDP", "USA", "2024", "Canada"]
+
+
+class RecordingTavily:
+    def __init__(self):
+        self.queries = []
+
+    async def search(self, query):
+        self.queries.append(query)
+        return {"query": query, "results": [{"url": "https://example.com", "title": "t", "content": "c", "score": 0.5}]}
+
+
+class EmptyIndex:
+    def lookup(self, query):
+        return False, []
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def test_the_first_model_call_is_skipped_for_simple_questions(monkeypatch):
+    tavily = RecordingTavily()
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: tavily)
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+    stats = QueryExpansionStats()
+    monkeypatch.setattr(query_expansion, "_query_expansion_stats", stats)
+    model_calls = []
+
+    async def search_model(messages):
+        model_calls.append(messages)
+        await asyncio.sleep(0.05)
+        if any(isinstance(m, ToolMessage) for m in messages):
+            return AIMessage(content="agent_respond")
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": ["model query"]}, "id": "call-1"}])
+
+    async def respond_model(messages):
+        return graph.ExampleStructuredOutput(response="answer", sources=[])
+
+    def run(question):
+        agent = SearchAgent.SearchAgent({
+            "agent_state": graph.AgentState,
+            "structured_output_class": graph.ExampleStructuredOutput,
+            "search_agent_prompt": "Search the web.",
+            "input_prompt": question,
+            "model_tier": "reasoning",
+            "query_expansion": True,
+        })
+        agent.create_tools()
+        agent.search_model_with_tools = RunnableLambda(search_model)
+        agent.model_with_structured_output = RunnableLambda(respond_model)
+        agent.graph = agent.build_graph()
+        return asyncio.run(agent.create_workflow())
+
+    answer = run("How to cook eggs?")
+    # One model call, after the search, instead of two
+    assert len(model_calls) == 1
+    assert tavily.queries == ["How to cook eggs", "cook eggs step by step guide", "cook eggs overview"]
+    assert answer["final_response"].response == "answer"
+
+    run("Why do eggs turn green when boiled?")
+    assert len(model_calls) == 3 and tavily.queries[-1] == "model query"
+
+    metrics = stats.metrics()
+    assert metrics["local"] == 1 and metrics["fallback"] == 1 and metrics["fallback_rate"] == 0.5
+    assert metrics["fallback_reasons"] == {"complex": 1}
+    assert metrics["model_first_hop_seconds_avg"] >= 0.05 and metrics["estimated_seconds_saved"] >= 0.04
+
+    # Follow-up questions depend on the conversation: the model writes their queries
+    agent = SearchAgent.SearchAgent({"query_expansion": True})
+    state = {"messages": [HumanMessage(content="How to cook eggs?"), AIMessage(content="Boil them."), HumanMessage(content="And rice?")]}
+    assert agent.local_first_hop(state) is None
+    assert stats.metrics()["fallback_reasons"]["follow_up"] == 1
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+import graph
+from langgraph_agent.agent_workflows import SearchAgent
+from langgraph_agent.tools import query_memo
+from langgraph_agent.tools.query_memo import QueryMemo, QueryMemoTotals, normalize_query
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Eggs recipe", "recipe for eggs?"),
+    ("how to cook eggs", "cook the egg"),
+    ("best restaurants in Toronto", "Toronto best restaurant"),
+])
+def test_trivial_rewordings_normalize_equal(first, second):
+    assert normalize_query(first) == normalize_query(second)
+
+
+def test_different_queries_normalize_differently():
+    assert normalize_query("eggs recipe") != normalize_query("eggs nutrition")
+    assert normalize_query("glass") == "glass"
+
+
+class UrlTavily:
+    """Two results per query: one page of its own and a page shared by every query."""
+
+    def __init__(self):
+        self.queries = []
+
+    async def search(self, query, **kwargs):
+        self.queries.append(query)
+        return {"query": query, "results": [
+            {"url": f"https://example.com/{query.replace(' ', '-')}", "title": query, "content": f"All about {query}. " * 20, "score": 0.9},
+            {"url": "https://example.com/eggs-guide", "title": "Egg guide", "content": "The complete egg guide. " * 20, "score": 0.8},
+        ]}
+
+
+class EmptyIndex:
+    def lookup(self, query):
+        return False, []
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def test_repeated_queries_and_urls_are_suppressed(monkeypatch):
+    tavily = UrlTavily()
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: tavily)
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+    totals = QueryMemoTotals()
+    monkeypatch.setattr(query_memo, "_query_memo_totals", totals)
+    turns = [["eggs recipe"], ["Recipe for eggs", "egg omelette"]]
+
+    async def search_model(messages):
+        searches = sum(isinstance(m, ToolMessage) for m in messages)
+        if searches == len(turns):
+            return AIMessage(content="agent_respond")
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": turns[searches]}, "id": f"call-{searches}"}])
+
+    async def respond_model(messages):
+        return graph.ExampleStructuredOutput(response="answer", sources=[])
+
+    agent = SearchAgent.SearchAgent({
+        "agent_state": graph.AgentState,
+        "structured_output_class": graph.ExampleStructuredOutput,
+        "search_agent_prompt": "Search the web.",
+        "input_prompt": "How to cook eggs?",
+        "model_tier": "reasoning",
+        "query_memo": True,
+    })
+    agent.create_tools()
+    agent.search_model_with_tools = RunnableLambda(search_model)
+    agent.model_with_structured_output = RunnableLambda(respond_model)
+    agent.graph = agent.build_graph()
+    answer = asyncio.run(agent.create_workflow())
+
+    # The reworded repeat is served from the first response: Tavily saw each query once
+    assert tavily.queries == ["eggs recipe", "egg omelette"]
+    second_search = [m for m in answer["messages"] if isinstance(m, ToolMessage)][1].content
+    assert "already provided by an earlier search" in second_search
+    assert "All about egg omelette" in second_search and "All about eggs recipe" not in second_search
+    summary = agent.query_memo.summary()
+    # The repeat's two results; the omelette search's copy of the shared guide was deduplicated first
+    assert summary["suppressed_calls"] == 1 and summary["suppressed_results"] == 2
+    assert summary["suppressed_tokens"] > 300
+    assert totals.metrics() == {"requests": 1, **summary}
+
+
+def test_memoized_responses_are_copies():
+    memo = QueryMemo()
+    response = {"query": "eggs", "results": [{"url": "https://example.com/eggs", "content": "c"}]}
+    memo.store("eggs", response)
+    served = memo.lookup("Eggs?")
+    assert served["query"] == "Eggs?" and served["served_from"] == "query_memo"
+    memo.mark_provided([response])
+    assert memo.mark_provided([served])[0]["results"][0]["already_provided"]
+    assert response["results"][0] == {"url": "https://example.com/eggs", "content": "c"}
+    assert memo.lookup("tomatoes") is None
+
+
+def test_the_memo_only_serves_later_search_calls(monkeypatch):
+    tavily = UrlTavily()
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: tavily)
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+    monkeypatch.setattr(query_memo, "_query_memo_totals", QueryMemoTotals())
+
+    async def search_model(messages):
+        if sum(isinstance(m, ToolMessage) for m in messages) == 2:
+            return AIMessage(content="agent_respond")
+        # The model's own follow-up search repeats a query of the first, locally written, call
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": ["capital of France"]}, "id": "call-1"}])
+
+    async def respond_model(messages):
+        return graph.ExampleStructuredOutput(response="Paris", sources=[])
+
+    agent = SearchAgent.SearchAgent({
+        "agent_state": graph.AgentState,
+        "structured_output_class": graph.ExampleStructuredOutput,
+        "search_agent_prompt": "Search the web.",
+        "input_prompt": "What is the capital of France?",
+        "model_tier": "reasoning",
+        "query_expansion": True,
+        "search_effort": True,
+        "query_memo": True,
+    })
+    agent.create_tools()
+    agent.search_model_with_tools = RunnableLambda(search_model)
+    agent.model_with_structured_output = RunnableLambda(respond_model)
+    agent.graph = agent.build_graph()
+    asyncio.run(agent.create_workflow())
+
+    # The expanded queries all differ once normalized, and the light level searched two of them
+    queries = [normalize_query(q) for q in tavily.queries]
+    assert len(tavily.queries) == 2 and len(set(queries)) == 2
+    # Only the later call's repeat was served from the memo
+    assert normalize_query("capital of France") in queries
+    assert agent.query_memo.summary()["suppressed_calls"] == 1
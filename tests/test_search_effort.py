@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from langgraph_agent.agent_workflows import SearchAgent
+from langgraph_agent.agent_workflows.usage import RequestUsage
+from langgraph_agent.tools import search_effort
+from langgraph_agent.tools.search_effort import EFFORT_LEVELS, EffortConfig, EffortController, SearchEffortStats
+
+
+def response(query, scores):
+    return {"query": query, "results": [{"url": f"https://example.com/{query}/{n}", "title": "t", "content": "c", "score": score}
+                                        for n, score in enumerate(scores)]}
+
+
+class ScriptedTavily:
+    """Answers each query with the scores scripted for its search depth."""
+
+    def __init__(self, basic, advanced=None):
+        self.basic = basic
+        self.advanced = advanced or basic
+        self.calls = []
+
+    async def search(self, query, **kwargs):
+        self.calls.append((query, kwargs.get("search_depth"), kwargs.get("max_results"), kwargs.get("include_raw_content")))
+        scores = (self.advanced if kwargs.get("search_depth") == "advanced" else self.basic).get(query, [])
+        found = response(query, scores[:kwargs.get("max_results") or 5])
+        if kwargs.get("include_raw_content"):
+            for result in found["results"]:
+                result["raw_content"] = "x" * 10000
+        return found
+
+
+class EmptyIndex:
+    def lookup(self, query):
+        return False, []
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def run_search(monkeypatch, tavily, queries, effort=True):
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: tavily)
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+    stats = SearchEffortStats()
+    monkeypatch.setattr(search_effort, "_search_effort_stats", stats)
+    usage = RequestUsage()
+    call = {"type": "tool_call", "name": "web_search", "args": {"query": queries}, "id": "call-1"}
+    message = asyncio.run(SearchAgent.web_search.ainvoke(call, config={"configurable": {"search_effort": effort, "usage": usage}}))
+    return message, stats.metrics(), usage.summary()["tavily"]
+
+
+def test_easy_questions_stop_at_the_cheapest_level(monkeypatch):
+    tavily = ScriptedTavily({"a": [0.9, 0.8, 0.7], "b": [0.9], "c": [0.9]})
+    message, metrics, tavily_usage = run_search(monkeypatch, tavily, ["a", "b", "c"])
+    # Two queries, three results each, basic depth: the third query is never sent
+    assert tavily.calls == [("a", "basic", 3, False), ("b", "basic", 3, False)]
+    assert "Query: c" not in message.content
+    assert metrics["levels"]["light"]["searches"] == 2 and metrics["levels"]["light"]["final_level_calls"] == 1
+    assert metrics["escalations"] == 0 and metrics["insufficient_coverage"] == 0
+    assert tavily_usage["credits"] == 2
+
+
+def test_weak_results_escalate_to_more_queries_and_advanced_depth(monkeypatch):
+    tavily = ScriptedTavily({"a": [0.3], "b": [0.2], "c": [0.9]}, advanced={"a": [0.8, 0.7], "b": [0.3]})
+    _, metrics, tavily_usage = run_search(monkeypatch, tavily, ["a", "b", "c"])
+    assert tavily.calls == [
+        # light: the first two queries
+        ("a", "basic", 3, False), ("b", "basic", 3, False),
+        # standard: the third query, and the weak ones with more results
+        ("c", "basic", 5, False), ("a", "basic", 5, False), ("b", "basic", 5, False),
+        # deep: the still weak queries at advanced depth, which covers the question
+        ("a", "advanced", 5, False), ("b", "advanced", 5, False),
+    ]
+    assert metrics["levels"]["deep"]["final_level_calls"] == 1 and metrics["escalations"] == 2
+    assert tavily_usage["queries"] == 7 and tavily_usage["credits"] == 5 + 2 * 2
+
+
+def test_raw_content_is_the_last_resort_and_trimmed(monkeypatch):
+    monkeypatch.setenv("SEARCH_EFFORT_RAW_CONTENT_CHARS", "100")
+    tavily = ScriptedTavily({"a": [0.1]})
+    message, metrics, _ = run_search(monkeypatch, tavily, ["a"])
+    assert [call[1:] for call in tavily.calls] == [("basic", 3, False), ("basic", 5, False), ("advanced", 5, False), ("advanced", 5, True)]
+    assert metrics["levels"]["full"]["final_level_calls"] == 1 and metrics["insufficient_coverage"] == 1
+    blob = SearchAgent.get_blob_store().get(message.artifact["blob_key"])
+    assert "x" * 100 in blob and "x" * 101 not in blob
+
+
+def test_max_level_and_disabled_controller(monkeypatch):
+    monkeypatch.setenv("SEARCH_EFFORT_MAX_LEVEL", "standard")
+    tavily = ScriptedTavily({"a": [0.1]})
+    run_search(monkeypatch, tavily, ["a"])
+    assert [call[1] for call in tavily.calls] == ["basic", "basic"]
+
+    # Without the controller every query is searched with Tavily's defaults
+    tavily = ScriptedTavily({"a": [0.1]})
+    _, metrics, _ = run_search(monkeypatch, tavily, ["a", "b", "c"], effort=False)
+    assert tavily.calls == [("a", None, None, None), ("b", None, None, None), ("c", None, None, None)]
+    assert metrics["calls"] == 0
+
+
+@pytest.mark.parametrize("scores, sufficient", [
+    ({"a": [0.9, 0.9], "b": [0.9]}, True),
+    # Three relevant URLs, but only one of three queries covered
+    ({"a": [0.9, 0.9, 0.9], "b": [0.1], "c": []}, False),
+    ({"a": [0.4, 0.4, 0.4], "b": [0.4]}, False),
+])
+def test_coverage(scores, sufficient):
+    controller = EffortController(list(scores), EffortConfig())
+    for query, query_scores in scores.items():
+        controller.record(query, response(query, query_scores), EFFORT_LEVELS[0])
+    assert controller.coverage().sufficient(controller.config) is sufficient
@@ -0,0 +1,81 @@
+import asyncio
+from typing import Annotated, List
+
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, MessagesState, StateGraph, add_messages
+from pydantic import BaseModel
+
+from langgraph_agent.agent_workflows import sessions
+from langgraph_agent.agent_workflows.sessions import SessionStore, close_session_store, get_session_store
+
+
+class Answer(BaseModel):
+    response: str
+    sources: List[str]
+
+
+class State(MessagesState):
+    messages: Annotated[list, add_messages]
+    final_response: Answer
+
+
+async def answer_node(state):
+    return {"messages": [AIMessage(content="answer " * 3)], "final_response": Answer(response="r", sources=["u"])}
+
+
+def build_graph(store: SessionStore):
+    workflow = StateGraph(State)
+    workflow.add_node("agent", answer_node)
+    workflow.set_entry_point("agent")
+    workflow.add_edge("agent", END)
+    return workflow.compile(checkpointer=store.checkpointer)
+
+
+async def run_turn(store: SessionStore, graph, thread_id: str, question: str):
+    async with store.thread_lock(thread_id):
+        graph_input = await store.prepare_input(graph, thread_id, question)
+        answer = await graph.ainvoke(graph_input, {"configurable": {"thread_id": thread_id}}, durability="exit")
+        await store.finish_turn(thread_id)
+        return answer
+
+
+def run_session(monkeypatch, tmp_path, backend: str):
+    monkeypatch.setenv("CHECKPOINT_BACKEND", backend)
+    monkeypatch.setenv("CHECKPOINT_DB_PATH", str(tmp_path / "checkpoints.sqlite"))
+    monkeypatch.setenv("CHECKPOINT_MAX_HISTORY_CHARS", "60")
+    monkeypatch.setenv("LANGGRAPH_STRICT_MSGPACK", "true")
+    monkeypatch.setattr(sessions, "_session_store", None)
+
+    async def main():
+        store = await get_session_store(allowed_types=[Answer])
+        graph = build_graph(store)
+        try:
+            answers = await asyncio.gather(*(run_turn(store, graph, "t1", f"question {i}") for i in range(4)))
+            checkpoints = [c async for c in store.checkpointer.alist({"configurable": {"thread_id": "t1"}})]
+            store.ttl_seconds = -1
+            expired = await store.cleanup_expired()
+            remaining = await store.checkpointer.aget_tuple({"configurable": {"thread_id": "t1"}})
+        finally:
+            await close_session_store()
+        return answers, checkpoints, expired, remaining
+
+    return asyncio.run(main())
+
+
+def check_session(answers, checkpoints, expired, remaining):
+    # Turns are serialized and follow-ups see the conversation, trimmed to whole turns
+    assert [m.content for m in answers[1]["messages"]][::2] == ["question 0", "question 1"]
+    assert [m.content for m in answers[3]["messages"]][::2] == ["question 2", "question 3"]
+    assert isinstance(answers[3]["final_response"], Answer)
+    # Only the latest checkpoint is kept, and expired threads are deleted
+    assert len(checkpoints) == 1
+    assert expired == 1
+    assert remaining is None
+
+
+def test_sqlite_session(monkeypatch, tmp_path):
+    check_session(*run_session(monkeypatch, tmp_path, "sqlite"))
+
+
+def test_memory_session(monkeypatch, tmp_path):
+    check_session(*run_session(monkeypatch, tmp_path, "memory"))
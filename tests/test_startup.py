@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.import_time import profile_imports
+
+
+def test_deferred_dependencies_are_not_imported_at_startup():
+    rows, imported_deferred = profile_imports("main")
+    assert imported_deferred == []
+    assert any(name == "main" for name, _, _ in rows)
+
+
+def test_ready_reports_warmup_completion(monkeypatch, tmp_path):
+    # The warm-up itself is covered in test_warmup.py
+    monkeypatch.setenv("WARMUP_ENABLED", "false")
+    monkeypatch.setenv("JOB_DB_PATH", str(tmp_path / "jobs.sqlite"))
+    client = TestClient(main.app)
+    # Outside the lifespan the service is not ready
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+    with TestClient(main.app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["ready"] is True
+        assert body["import_seconds"] > 0
+        assert body["warmup_seconds"] >= 0
+
+
+def test_metrics_report_the_model_http_pool(monkeypatch, tmp_path):
+    monkeypatch.setenv("WARMUP_ENABLED", "false")
+    monkeypatch.setenv("JOB_DB_PATH", str(tmp_path / "jobs.sqlite"))
+    with TestClient(main.app) as client:
+        metrics = client.get("/metrics").json()
+    assert "model_http_pool" in metrics
+    assert metrics["jobs"]["queued"] == 0
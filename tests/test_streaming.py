@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import httpx
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda, RunnableParallel
+
+import graph
+import main
+from gen_utils import admission
+from gen_utils.admission import AdmissionController
+from langgraph_agent.agent_workflows import SearchAgent
+from langgraph_agent.agent_workflows.deadlines import DeadlineExceeded
+from langgraph_agent.structured_output.streaming import StructuredOutputStream
+
+ANSWER = {
+    "response": 'Beat the eggs, then stir-fry them with "tomato" and a pinch of sugar.',
+    "sources": ["https://example.com/eggs", "https://example.com/tomato"],
+}
+
+
+def test_partial_output_is_emitted_as_soon_as_it_is_complete():
+    text = json.dumps(ANSWER)
+    stream = StructuredOutputStream(graph.ExampleStructuredOutput)
+    events = []
+    for start in range(0, len(text), 4):
+        events.extend((start, event) for event in stream.feed(text[start:start + 4]))
+
+    response = "".join(event["text"] for _, event in events if event["event"] == "delta")
+    assert response == ANSWER["response"]
+    items = [(position, event) for position, event in events if event["event"] == "item"]
+    assert [event["value"] for _, event in items] == ANSWER["sources"]
+    # The first source is emitted once its closing quote arrived, before the rest of the output
+    first_source_end = text.index(ANSWER["sources"][0]) + len(ANSWER["sources"][0]) + 1
+    assert items[0][0] <= first_source_end < items[1][0]
+    assert [event["field"] for _, event in events if event["event"] == "field_done"] == ["response", "sources"]
+    assert stream.finish() == {"event": "final", "output": ANSWER}
+
+
+class OneResultTavily:
+    async def search(self, query, **kwargs):
+        return {"query": query, "results": [{"url": "https://example.com/eggs", "title": "t", "content": "c", "score": 0.5}]}
+
+
+class EmptyIndex:
+    def lookup(self, query):
+        return False, []
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def test_stream_graph_streams_the_structured_output(monkeypatch):
+    async def search_model(messages):
+        if any(isinstance(m, ToolMessage) for m in messages):
+            return AIMessage(content="agent_respond")
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": ["eggs"]}, "id": "call-1"}])
+
+    def parse(output):
+        return {"raw": output["raw"], "parsed": graph.ExampleStructuredOutput.model_validate_json(output["raw"].content), "parsing_error": None}
+
+    class StubSearchAgent(SearchAgent.SearchAgent):
+        def get_graph(self):
+            self.search_model_with_tools = RunnableLambda(search_model)
+            # A chat model streaming the JSON output token by token, as the structured-output pass does
+            streaming_model = GenericFakeChatModel(messages=iter([AIMessage(content=json.dumps(ANSWER))]))
+            self.model_with_structured_output = RunnableParallel(raw=streaming_model) | RunnableLambda(parse)
+            return self.build_graph()
+
+    monkeypatch.setattr(graph, "SearchAgent", StubSearchAgent)
+    monkeypatch.setattr(graph, "retrieve_secret", lambda secret_name, project_id: {})
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: OneResultTavily())
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: EmptyIndex())
+
+    async def main_():
+        return [event async for event in graph.stream_graph("How to cook eggs?")]
+
+    events = asyncio.run(main_())
+    kinds = [event["event"] for event in events]
+    assert kinds[:3] == ["node", "node", "node"]
+    assert kinds.count("delta") > 1
+    assert kinds[-1] == "final" and events[-1]["final_answer"] == ANSWER
+    # Partial events precede the final answer
+    assert "".join(event["text"] for event in events if event["event"] == "delta") == ANSWER["response"]
+    assert [event["value"] for event in events if event["event"] == "item"] == ANSWER["sources"]
+
+
+def test_stream_endpoint_serves_ndjson_and_sse(monkeypatch):
+    async def fake_stream_graph(question, thread_id=None, timeout_seconds=None):
+        yield {"event": "node", "node": "search_agent"}
+        yield {"event": "delta", "field": "response", "text": question}
+        if timeout_seconds == 0.01:
+            raise DeadlineExceeded("Deadline exceeded after 0.0s")
+        yield {"event": "final", "final_answer": {"response": question, "sources": []}}
+
+    monkeypatch.setattr(main, "stream_graph", fake_stream_graph)
+    controller = AdmissionController()
+    monkeypatch.setattr(admission, "_admission_controller", controller)
+
+    async def main_():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            ndjson = await client.post("/search/stream", json={"question": "eggs"})
+            sse = await client.post("/search/stream", json={"question": "eggs"}, headers={"Accept": "text/event-stream"})
+            late = await client.post("/search/stream", json={"question": "eggs", "timeout_seconds": 0.01})
+        return ndjson, sse, late
+
+    ndjson, sse, late = asyncio.run(main_())
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [event["event"] for event in events] == ["node", "delta", "final"]
+    assert all(event["elapsed_seconds"] >= 0 for event in events)
+
+    assert sse.headers["content-type"].startswith("text/event-stream")
+    blocks = sse.text.strip().split("\n\n")
+    assert blocks[-1].startswith("event: final\ndata: ")
+    assert json.loads(blocks[-1].split("data: ", 1)[1])["final_answer"]["response"] == "eggs"
+
+    late_events = [json.loads(line) for line in late.text.splitlines()]
+    assert late_events[-1]["event"] == "error" and late_events[-1]["status"] == 504
+    # Every stream released its execution slot
+    assert controller.metrics()["in_flight"] == {"interactive": 0, "batch": 0}
+    assert controller.metrics()["admitted_total"]["interactive"] == 3
@@ -0,0 +1,62 @@
+import warnings
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from langgraph_agent.structured_output.registry import StructuredOutputRegistry
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from langgraph_agent.structured_output import structured_outputs
+
+
+class Answer(BaseModel):
+    response: str
+    sources: List[str]
+
+
+class FakeChatModel:
+    def __init__(self):
+        self.bindings = 0
+
+    def with_structured_output(self, model, **kwargs):
+        self.bindings += 1
+        return ("bound", model, kwargs)
+
+
+def test_register_module_and_lookup_by_title():
+    registry = StructuredOutputRegistry()
+    compiled = registry.register_module(structured_outputs)
+    assert len(compiled) == len(registry) > 30
+    assert registry.get("Biometric Language").model is structured_outputs.BiometricLanguage
+    assert registry.get(structured_outputs.BiometricLanguage) is registry.get("Biometric Language")
+
+
+def test_validators_are_precompiled():
+    registry = StructuredOutputRegistry()
+    compiled = registry.register(Answer)
+    assert compiled.json_schema["title"] == "Answer"
+    assert compiled.validate({"response": "r", "sources": ["u"]}) == Answer(response="r", sources=["u"])
+    assert compiled.validate_json('{"response": "r", "sources": []}').sources == []
+
+
+def test_binding_is_cached_per_chat_model_key():
+    registry = StructuredOutputRegistry()
+    first, second = FakeChatModel(), FakeChatModel()
+    bound = registry.bind(first, Answer, chat_model_key="deployment")
+    assert registry.bind(second, Answer, chat_model_key="deployment") is bound
+    assert registry.bind(second, Answer, chat_model_key="other") is not bound
+    assert (first.bindings, second.bindings) == (1, 1)
+
+
+def test_conflicting_titles_are_rejected():
+    registry = StructuredOutputRegistry()
+    registry.register(Answer)
+
+    class Other(BaseModel):
+        model_config = {"title": "Answer"}
+        value: str
+
+    with pytest.raises(ValueError):
+        registry.register(Other)
@@ -0,0 +1,100 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+import graph
+from langgraph_agent.agent_workflows import SearchAgent, usage as usage_module
+from langgraph_agent.agent_workflows.usage import RequestUsage, UsageTotals
+
+
+class CreditReportingTavily:
+    async def search(self, query):
+        return {"query": query, "results": [{"url": "https://example.com", "title": "t", "content": "c", "score": 0.5}],
+                "usage": {"credits": 2}}
+
+
+class OneLocalHitIndex:
+    """Serves the query "cached" locally, misses every other one."""
+
+    def lookup(self, query):
+        return (True, [{"url": "https://example.com/cached", "title": "t", "content": "c"}]) if query == "cached" else (False, [])
+
+    def add(self, results):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def test_request_usage_totals_and_cost(monkeypatch):
+    monkeypatch.setenv("MODEL_PRICE_REASONING_INPUT", "2")
+    monkeypatch.setenv("MODEL_PRICE_REASONING_CACHED_INPUT", "0.5")
+    monkeypatch.setenv("MODEL_PRICE_REASONING_OUTPUT", "8")
+    monkeypatch.setenv("TAVILY_PRICE_PER_CREDIT", "0.008")
+    monkeypatch.delenv("MODEL_PRICE_FAST_INPUT", raising=False)
+    usage = RequestUsage()
+    usage.record_llm("search", "reasoning", 1.0, {"input_tokens": 1_000_000, "output_tokens": 100_000,
+                                                  "input_token_details": {"cache_read": 400_000}})
+    usage.record_llm("respond", "fast", 0.5, {"input_tokens": 500, "output_tokens": 50})
+    usage.record_search(0.25, {"results": []})
+    usage.record_search(0.0)
+
+    summary = usage.summary()
+    assert summary["llm"]["calls"] == 2 and summary["llm"]["input_tokens"] == 1_000_500
+    assert summary["llm"]["by_stage"]["search"]["reasoning"]["cached_tokens"] == 400_000
+    assert summary["tavily"] == {"queries": 1, "served_locally": 1, "credits": 1, "seconds": 0.25}
+    # 600k uncached and 400k cached input tokens, 100k output tokens; the fast tier has no price
+    assert summary["estimated_cost_usd"] == round(1.2 + 0.2 + 0.8 + 0.008, 6)
+
+    monkeypatch.delenv("TAVILY_PRICE_PER_CREDIT")
+    monkeypatch.delenv("MODEL_PRICE_REASONING_INPUT")
+    assert RequestUsage().summary()["estimated_cost_usd"] is None
+
+
+def test_every_model_call_and_search_of_a_request_is_metered(monkeypatch):
+    monkeypatch.setattr(SearchAgent, "get_tavily_client", lambda: CreditReportingTavily())
+    monkeypatch.setattr(SearchAgent, "get_local_index", lambda: OneLocalHitIndex())
+    totals = UsageTotals()
+    monkeypatch.setattr(usage_module, "_usage_totals", totals)
+
+    async def search_model(messages):
+        turns = sum(isinstance(m, ToolMessage) for m in messages)
+        usage = {"input_tokens": 1000 + 100 * turns, "output_tokens": 20, "total_tokens": 1020 + 100 * turns,
+                 "input_token_details": {"cache_read": 512 if turns else 0}}
+        if turns == 2:
+            return AIMessage(content="agent_respond", usage_metadata=usage)
+        return AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": ["cached", f"q{turns}"]}, "id": f"call-{turns}"}],
+                         usage_metadata=usage)
+
+    async def respond_model(messages):
+        raw = AIMessage(content="{}", usage_metadata={"input_tokens": 3000, "output_tokens": 200, "total_tokens": 3200})
+        return {"raw": raw, "parsed": graph.ExampleStructuredOutput(response="answer", sources=[]), "parsing_error": None}
+
+    agent = SearchAgent.SearchAgent({
+        "agent_state": graph.AgentState,
+        "structured_output_class": graph.ExampleStructuredOutput,
+        "search_agent_prompt": "Search the web.",
+        "input_prompt": "How to cook eggs?",
+        "model_tier": "reasoning",
+    })
+    agent.create_tools()
+    agent.search_model_with_tools = RunnableLambda(search_model)
+    agent.model_with_structured_output = RunnableLambda(respond_model)
+    agent.graph = agent.build_graph()
+    asyncio.run(agent.create_workflow())
+
+    summary = agent.usage.summary()
+    search = summary["llm"]["by_stage"]["search"]["reasoning"]
+    assert search["calls"] == 3 and search["input_tokens"] == 3300 and search["cached_tokens"] == 1024
+    assert summary["llm"]["by_stage"]["respond"]["reasoning"]["output_tokens"] == 200
+    assert summary["llm"]["calls"] == 4 and summary["llm"]["output_tokens"] == 260
+    # Two searches of two queries, one of which the local index serves each time
+    assert summary["tavily"]["queries"] == 2 and summary["tavily"]["served_locally"] == 2
+    assert summary["tavily"]["credits"] == 4
+
+    metrics = totals.metrics()
+    assert metrics["requests"] == 1
+    assert metrics["llm"]["search"]["reasoning"]["input_tokens"] == 3300
+    assert metrics["tavily"]["credits"] == 4
+    assert metrics["per_request"]["search_turns"] == {"avg": 3, "max": 3}
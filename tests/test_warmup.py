@@ -0,0 +1,82 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import graph
+from langgraph_agent.agent_workflows import SearchAgent, sessions
+from langgraph_agent.tools import page_fetch
+
+
+class MockAzureHandler(BaseHTTPRequestHandler):
+    paths_seen = []
+
+    def do_GET(self):
+        self.paths_seen.append(self.path)
+        body = json.dumps({"object": "list", "data": []}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def offline_service(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockAzureHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    secrets_fetched = []
+    fake_retrieve_secret = lambda secret_name, project_id: secrets_fetched.append(secret_name) or {}
+
+    async def fake_preconnect_tavily():
+        pass
+
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT_NAME", "test-deployment")
+    monkeypatch.setenv("CHECKPOINT_BACKEND", "memory")
+    monkeypatch.setattr(graph, "retrieve_secret", fake_retrieve_secret)
+    monkeypatch.setattr(SearchAgent, "retrieve_secret", fake_retrieve_secret)
+    monkeypatch.setattr(graph, "preconnect_tavily", fake_preconnect_tavily)
+    monkeypatch.setattr(SearchAgent, "_tracer_provider", object())
+    monkeypatch.setattr(SearchAgent, "_compiled_graphs", {})
+    monkeypatch.setattr(sessions, "_session_store", None)
+    monkeypatch.setattr(page_fetch, "_page_fetcher", None)
+    yield secrets_fetched
+    server.shutdown()
+
+
+def test_warm_up_runs_every_step(offline_service):
+    report = asyncio.run(graph.warm_up())
+
+    assert report["errors"] == {}
+    assert list(report["steps"]) == ["secrets", "compile", "connections", "synthetic_invocation"]
+    assert report["total_seconds"] >= sum(report["steps"].values()) - 0.01
+    assert {"generalized-parser-des", "des-o3"} <= set(offline_service)
+    # One graph without and one with a checkpointer
+    assert len(SearchAgent._compiled_graphs) == 2
+    # The model's connection was opened against the endpoint
+    assert any("/models" in path for path in MockAzureHandler.paths_seen)
+
+
+def test_requests_reuse_the_compiled_graph(offline_service):
+    async def main():
+        agents = []
+        for _ in range(2):
+            agent = SearchAgent.SearchAgent(await graph.build_input_dict("question"))
+            agent.create_tools()
+            agents.append(agent)
+        return agents, [agent.get_graph() for agent in agents]
+
+    agents, graphs = asyncio.run(main())
+    assert graphs[0] is graphs[1]
+    assert len(SearchAgent._compiled_graphs) == 1
+    # Only the first agent initialized a model
+    assert hasattr(agents[0], "model") and not hasattr(agents[1], "model")
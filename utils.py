@@ -13,6 +13,7 @@ import sys
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 from typing import List
+from gen_utils.log_queue import LOG_DATE_FORMAT, LOG_FORMAT, install_queue_logging
 
 
 def setup_logger(
@@ -20,7 +21,8 @@ def setup_logger(
     log_file: str = "logging/app.log",
     level: int = logging.INFO,
     max_bytes: int = 10_000_000,  # 10 MB
-    backup_count: int = 5
+    backup_count: int = 5,
+    queued: bool = False
 ) -> logging.Logger:
     """
     Set up a logger that writes to both console and a rotating log file.
@@ -31,6 +33,8 @@ def setup_logger(
         level (int): Logging level (e.g., logging.INFO).
         max_bytes (int): Max size in bytes before rotating.
         backup_count (int): Number of backup files to keep.
+        queued (bool): Format and write the records on a listener thread, behind a queue, so
+            logging never blocks the caller (see `gen_utils.log_queue.install_queue_logging`).
 
     Returns:
         logging.Logger: Configured logger instance.
@@ -38,10 +42,7 @@ def setup_logger(
     os.makedirs("logging", exist_ok=True)  # Ensure the logging directory exists
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    formatter = logging.Formatter(
-        "[%(asctime)s] [%(levelname)s] %(name)s - %(message)s",
-        "%Y-%m-%d %H:%M:%S"
-    )
+    formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
 
     # File handler
     file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
@@ -55,6 +56,8 @@ def setup_logger(
     if not logger.handlers:
         logger.addHandler(file_handler)
         logger.addHandler(console_handler)
+        if queued:
+            install_queue_logging(logger)
 
     return logger
 